@@ -14,6 +14,7 @@ from app.core.database import Base
 # Importar todos los modelos para que SQLAlchemy los reconozca
 from app.models.user import User
 from app.models.vehicle import Vehicle, VehicleImage
+from app.models.job_state import JobState
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
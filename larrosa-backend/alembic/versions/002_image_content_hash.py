@@ -0,0 +1,27 @@
+"""Add content hash columns to vehicle_images
+
+Revision ID: 002_image_content_hash
+Revises: 001_initial
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002_image_content_hash'
+down_revision = '001_initial'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('vehicle_images', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('vehicle_images', sa.Column('perceptual_hash', sa.String(length=16), nullable=True))
+    op.create_index(op.f('ix_vehicle_images_content_hash'), 'vehicle_images', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_vehicle_images_content_hash'), table_name='vehicle_images')
+    op.drop_column('vehicle_images', 'perceptual_hash')
+    op.drop_column('vehicle_images', 'content_hash')
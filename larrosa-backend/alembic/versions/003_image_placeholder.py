@@ -0,0 +1,23 @@
+"""Add placeholder column to vehicle_images
+
+Revision ID: 003_image_placeholder
+Revises: 002_image_content_hash
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003_image_placeholder'
+down_revision = '002_image_content_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('vehicle_images', sa.Column('placeholder', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('vehicle_images', 'placeholder')
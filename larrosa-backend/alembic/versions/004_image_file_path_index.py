@@ -0,0 +1,23 @@
+"""Index vehicle_images.file_path for storage reconciliation
+
+Revision ID: 004_image_file_path_index
+Revises: 003_image_placeholder
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_image_file_path_index'
+down_revision = '003_image_placeholder'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_vehicle_images_file_path'), 'vehicle_images', ['file_path'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_vehicle_images_file_path'), table_name='vehicle_images')
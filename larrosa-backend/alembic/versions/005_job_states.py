@@ -0,0 +1,29 @@
+"""Job state table for resumable batch jobs (kept out of public storage)
+
+Revision ID: 005_job_states
+Revises: 004_image_file_path_index
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_job_states'
+down_revision = '004_image_file_path_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'job_states',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('job_states')
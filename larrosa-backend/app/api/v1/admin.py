@@ -0,0 +1,158 @@
+# app/api/v1/admin.py - RUTAS DE OPERACIÓN PARA ADMINISTRADORES
+
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.core.auth import get_current_superuser
+from app.core.loop_monitor import loop_monitor
+from app.core.memory_profiler import GROUP_BY, memory_profiler
+from app.core.password_hasher import password_hasher
+from app.core.rate_limit import rate_limiter
+from app.core.request_profiler import request_profiler
+from app.core.revocation import revocation_store
+from app.core.security import token_cache
+from app.core.user_cache import user_cache
+from app.models.user import User
+from app.services.storage_reconciler import storage_reconciler
+
+router = APIRouter()
+
+# ===== STORAGE =====
+
+@router.get("/storage/usage")
+def get_storage_usage(
+    cursor: Optional[str] = Query(None, description="Última clave de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Listado paginado del storage con resumen de uso - REQUIERE ADMIN"""
+    return storage_reconciler.usage_page(db=db, cursor=cursor or "", limit=limit)
+
+@router.post("/storage/reconcile")
+def reconcile_storage(
+    delete: bool = Query(False, description="Borrar los huérfanos encontrados"),
+    include_inactive: bool = Query(False, description="Tratar imágenes de vehículos dados de baja como huérfanas"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Ejecutar un lote incremental de reconciliación - REQUIERE ADMIN"""
+    return storage_reconciler.run_batch(
+        db=db,
+        delete=delete,
+        include_inactive=include_inactive
+    )
+
+# ===== AUTENTICACIÓN =====
+
+@router.get("/auth/stats")
+def get_auth_stats(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Estado del pool de bcrypt, caches de tokens/usuarios y revocaciones - REQUIERE ADMIN"""
+    return {
+        "bcrypt": password_hasher.stats(),
+        "token_cache": token_cache.stats(),
+        "revocation": revocation_store.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "user_cache": user_cache.stats()
+    }
+
+# ===== PERFILADO =====
+
+@router.get("/profiles")
+def list_profiles(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Perfiles guardados por este worker, el más reciente primero - REQUIERE ADMIN"""
+    return request_profiler.summaries()
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(
+    profile_id: str,
+    format: str = Query("text", pattern="^(text|collapsed)$", description="text o collapsed (flamegraph)"),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Perfil como reporte de texto o pilas "folded" para flamegraph.pl/speedscope - REQUIERE ADMIN"""
+    result = request_profiler.get(profile_id)
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Perfil no encontrado (puede haberlo atendido otro worker)"
+        )
+    return result.collapsed() if format == "collapsed" else result.text()
+
+# ===== EVENT LOOP =====
+
+@router.get("/event-loop")
+def get_event_loop_stats(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Lag del event loop y bloqueos detectados en este worker - REQUIERE ADMIN"""
+    return {"pid": os.getpid(), **loop_monitor.stats()}
+
+# ===== MEMORIA =====
+# Todo es por worker: la respuesta incluye el pid que la atendió
+
+GROUP_BY_PATTERN = f"^({'|'.join(GROUP_BY)})$"
+
+@router.get("/memory/stats")
+def get_memory_stats(
+    objects: bool = Query(False, description="Contar imágenes PIL, buffers y sesiones vivas (recorre el heap)"),
+    current_user: User = Depends(get_current_superuser)
+):
+    """RSS, pausas del GC, estado de tracemalloc e historial de muestras - REQUIERE ADMIN"""
+    return memory_profiler.stats(objects=objects)
+
+@router.post("/memory/tracemalloc/start")
+def start_tracemalloc(
+    frames: int = Query(1, ge=1, le=50, description="Frames guardados por asignación"),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Empezar a trazar asignaciones en este worker - REQUIERE ADMIN"""
+    return memory_profiler.start(frames)
+
+@router.post("/memory/tracemalloc/stop")
+def stop_tracemalloc(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Dejar de trazar y descartar los snapshots - REQUIERE ADMIN"""
+    return memory_profiler.stop()
+
+@router.post("/memory/snapshots")
+def take_memory_snapshot(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Tomar un snapshot de tracemalloc - REQUIERE ADMIN"""
+    return memory_profiler.take_snapshot()
+
+@router.get("/memory/snapshots")
+def list_memory_snapshots(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Snapshots guardados en este worker - REQUIERE ADMIN"""
+    return memory_profiler.snapshot_list()
+
+@router.get("/memory/snapshots/diff")
+def diff_memory_snapshots(
+    base: str = Query(..., description="Snapshot anterior"),
+    current: str = Query(..., description="Snapshot posterior"),
+    group_by: str = Query("lineno", pattern=GROUP_BY_PATTERN),
+    limit: int = Query(25, ge=1, le=500),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Ubicaciones que más crecieron entre dos snapshots - REQUIERE ADMIN"""
+    return memory_profiler.diff(base, current, group_by, limit)
+
+@router.get("/memory/snapshots/{snapshot_id}/top")
+def get_memory_top(
+    snapshot_id: str,
+    group_by: str = Query("lineno", pattern=GROUP_BY_PATTERN),
+    limit: int = Query(25, ge=1, le=500),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Top N de memoria retenida por archivo:línea - REQUIERE ADMIN"""
+    return memory_profiler.top(snapshot_id, group_by, limit)
@@ -1,36 +1,65 @@
 # app/api/v1/auth.py - RUTAS DE AUTENTICACIÓN CORREGIDAS
 
+import logging
 from datetime import timedelta
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.core.database import get_db
-from app.core.auth import get_current_user, get_current_active_user, get_current_superuser
-from app.core.security import verify_password, get_password_hash, create_access_token
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.auth import get_current_user, get_current_active_user, get_current_superuser, resolve_user, security
+from app.core.security import create_access_token, create_refresh_token, revoke_token
+from app.core.security import verify_token as verify_jwt  # la ruta /verify-token usa el mismo nombre
+from app.core.password_hasher import password_hasher
+from app.core.rate_limit import check_login_rate
 from app.models.user import User
-from app.schemas.user import User as UserSchema, UserCreate, Token, UserLogin
+from app.schemas.user import User as UserSchema, UserCreate, Token, UserLogin, RefreshTokenRequest, LogoutRequest
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+# Las consultas van al threadpool de Starlette y bcrypt a su pool propio,
+# así los logins no bloquean el event loop ni compiten con el catálogo
+
+def _find_login_user(db: Session, login: str) -> Optional[User]:
+    """Buscar usuario por username o email"""
+    return db.query(User).filter(
+        (User.username == login) | (User.email == login)
+    ).first()
+
+def _update_password_hash(db: Session, user: User, new_hash: str) -> None:
+    """Guardar el hash re-calculado con el BCRYPT_ROUNDS actual"""
+    user.hashed_password = new_hash
+    db.commit()
+    db.refresh(user)
+
+async def _check_password(db: Session, user: User, password: str) -> bool:
+    valid, new_hash = await password_hasher.verify(password, user.hashed_password)
+    if valid and new_hash:
+        await run_in_threadpool(_update_password_hash, db, user, new_hash)
+    return valid
+
 @router.post("/login", response_model=Token)
-def login_oauth2(
+async def login_oauth2(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
     """
     Login con OAuth2 (compatible con Swagger UI)
     """
-    print(f"🔐 Intento de login OAuth2: {form_data.username}")
+    logger.info("🔐 Intento de login OAuth2: %s", form_data.username)
+    await check_login_rate(request, form_data.username)
     
     # Buscar usuario por username o email
-    user = db.query(User).filter(
-        (User.username == form_data.username) | (User.email == form_data.username)
-    ).first()
+    user = await run_in_threadpool(_find_login_user, db, form_data.username)
     
     if not user:
-        print(f"❌ Usuario no encontrado: {form_data.username}")
+        logger.warning("❌ Usuario no encontrado: %s", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
@@ -38,8 +67,8 @@ def login_oauth2(
         )
     
     # Verificar contraseña
-    if not verify_password(form_data.password, user.hashed_password):
-        print(f"❌ Contraseña incorrecta para: {form_data.username}")
+    if not await _check_password(db, user, form_data.password):
+        logger.warning("❌ Contraseña incorrecta para: %s", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
@@ -48,7 +77,7 @@ def login_oauth2(
     
     # Verificar que el usuario esté activo
     if not user.is_active:
-        print(f"❌ Usuario inactivo: {form_data.username}")
+        logger.warning("❌ Usuario inactivo: %s", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Usuario inactivo"
@@ -61,7 +90,7 @@ def login_oauth2(
         expires_delta=access_token_expires
     )
     
-    print(f"✅ Login exitoso para: {user.username}")
+    logger.info("✅ Login exitoso para: %s", user.username)
     
     # Crear objeto User para respuesta
     user_response = UserSchema(
@@ -76,35 +105,36 @@ def login_oauth2(
     
     return Token(
         access_token=access_token,
+        refresh_token=create_refresh_token(user.username),
         token_type="bearer",
         user=user_response
     )
 
 @router.post("/login-json", response_model=Token)
-def login_json(
+async def login_json(
+    request: Request,
     user_credentials: UserLogin,
     db: Session = Depends(get_db)
 ):
     """
     Login con JSON (para frontend)
     """
-    print(f"🔐 Intento de login JSON: {user_credentials.username}")
+    logger.info("🔐 Intento de login JSON: %s", user_credentials.username)
+    await check_login_rate(request, user_credentials.username)
     
     # Buscar usuario por username o email
-    user = db.query(User).filter(
-        (User.username == user_credentials.username) | (User.email == user_credentials.username)
-    ).first()
+    user = await run_in_threadpool(_find_login_user, db, user_credentials.username)
     
     if not user:
-        print(f"❌ Usuario no encontrado: {user_credentials.username}")
+        logger.warning("❌ Usuario no encontrado: %s", user_credentials.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
         )
     
     # Verificar contraseña
-    if not verify_password(user_credentials.password, user.hashed_password):
-        print(f"❌ Contraseña incorrecta para: {user_credentials.username}")
+    if not await _check_password(db, user, user_credentials.password):
+        logger.warning("❌ Contraseña incorrecta para: %s", user_credentials.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
@@ -112,7 +142,7 @@ def login_json(
     
     # Verificar que el usuario esté activo
     if not user.is_active:
-        print(f"❌ Usuario inactivo: {user_credentials.username}")
+        logger.warning("❌ Usuario inactivo: %s", user_credentials.username)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Usuario inactivo"
@@ -125,7 +155,7 @@ def login_json(
         expires_delta=access_token_expires
     )
     
-    print(f"✅ Login exitoso para: {user.username}")
+    logger.info("✅ Login exitoso para: %s", user.username)
     
     # Crear objeto User para respuesta
     user_response = UserSchema(
@@ -140,6 +170,7 @@ def login_json(
     
     return Token(
         access_token=access_token,
+        refresh_token=create_refresh_token(user.username),
         token_type="bearer",
         user=user_response
     )
@@ -178,13 +209,38 @@ def verify_token(
     }
 
 @router.post("/refresh", response_model=Token)
-def refresh_token(
-    current_user: User = Depends(get_current_active_user),
+async def refresh_token(
+    request: RefreshTokenRequest,
     db: Session = Depends(get_db)
 ):
     """
-    Refrescar token de acceso
+    Canjear un refresh token por un par nuevo (rotación: el usado queda revocado)
     """
+    payload = verify_jwt(request.refresh_token, token_type="refresh_token")
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido, expirado o ya utilizado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    current_user = await resolve_user(db, payload["sub"], payload.get("iat"))
+    if current_user is None or not current_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado o inactivo",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Reclamar el token antes de emitir: si dos /refresh llegan a la vez con
+    # el mismo token, solo el que lo revoca primero obtiene un par nuevo
+    if not await run_in_threadpool(revoke_token, payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido, expirado o ya utilizado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
     # Crear nuevo token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -204,21 +260,35 @@ def refresh_token(
     
     return Token(
         access_token=access_token,
+        refresh_token=create_refresh_token(current_user.username),
         token_type="bearer",
         user=user_response
     )
 
 @router.post("/logout")
 def logout(
+    request: Optional[LogoutRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Logout (en JWT el logout es del lado del cliente)
+    Logout: revoca el token de acceso actual y, si se envía, el refresh token
     """
+    revoked = 0
+    
+    payload = verify_jwt(credentials.credentials)
+    if payload is not None and revoke_token(payload):
+        revoked += 1
+    
+    if request is not None and request.refresh_token:
+        refresh_payload = verify_jwt(request.refresh_token, token_type="refresh_token")
+        if refresh_payload is not None and refresh_payload.get("sub") == current_user.username:
+            if revoke_token(refresh_payload):
+                revoked += 1
+    
     return {
         "message": "Logout exitoso",
-        "detail": "El token seguirá siendo válido hasta su expiración. "
-                 "Asegúrate de eliminarlo del cliente."
+        "revoked_tokens": revoked
     }
 
 # Ruta de prueba que requiere autenticación
@@ -251,43 +321,48 @@ def admin_only_route(
     }
 
 @router.post("/register", response_model=UserSchema)
-def register(
+async def register(
     user_data: UserCreate,
     db: Session = Depends(get_db)
 ):
     """
     Registrar nuevo usuario (solo para testing - remover en producción)
     """
-    # Verificar que no exista el username
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El nombre de usuario ya existe"
-        )
+    def check_available():
+        # Verificar que no exista el username
+        if db.query(User).filter(User.username == user_data.username).first():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El nombre de usuario ya existe"
+            )
+        
+        # Verificar que no exista el email
+        if db.query(User).filter(User.email == user_data.email).first():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El email ya está registrado"
+            )
     
-    # Verificar que no exista el email
-    existing_email = db.query(User).filter(User.email == user_data.email).first()
-    if existing_email:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El email ya está registrado"
+    def create_user(hashed_password: str) -> User:
+        db_user = User(
+            username=user_data.username,
+            email=user_data.email,
+            hashed_password=hashed_password,
+            full_name=user_data.full_name,
+            is_active=user_data.is_active,
+            is_superuser=False  # Usuarios registrados no son admin por defecto
         )
+        
+        db.add(db_user)
+        db.commit()
+        db.refresh(db_user)
+        return db_user
     
-    # Crear usuario
-    hashed_password = get_password_hash(user_data.password)
-    db_user = User(
-        username=user_data.username,
-        email=user_data.email,
-        hashed_password=hashed_password,
-        full_name=user_data.full_name,
-        is_active=user_data.is_active,
-        is_superuser=False  # Usuarios registrados no son admin por defecto
-    )
+    await run_in_threadpool(check_available)
     
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    # Crear usuario
+    hashed_password = await password_hasher.hash(user_data.password)
+    db_user = await run_in_threadpool(create_user, hashed_password)
     
     return UserSchema(
         id=db_user.id,
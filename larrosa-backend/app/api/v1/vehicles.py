@@ -1,20 +1,30 @@
 # app/api/v1/vehicles.py - RUTAS DE VEHÍCULOS CORREGIDAS
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.auth import get_current_user, get_current_active_user, get_current_superuser
+from app.core.config import settings
+from app.core.rate_limit import client_ip, rate_limiter
 from app.crud.vehicle import vehicle_crud
 from app.services.image_service import image_service
+from app.services.sprite_service import sprite_service, MAX_SPRITE_VEHICLES
 from app.schemas.vehicle import (
     Vehicle, VehicleCreate, VehicleUpdate, 
-    VehicleListResponse, VehicleStats
+    VehicleListResponse, VehicleStats,
+    VehicleImage as VehicleImageSchema,
+    VehicleImagePresignRequest, VehicleImageRegister,
+    VehicleImagesUpdate, VehicleSprite
 )
 from app.models.user import User
+from app.models.vehicle import VehicleImage
 import json
+import logging
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # ===== RUTAS PÚBLICAS (SIN AUTENTICACIÓN) =====
@@ -36,7 +46,7 @@ def get_vehicles(
 ):
     """Obtener lista de vehículos con filtros - PÚBLICO"""
     
-    print(f"🔍 Buscando vehículos: skip={skip}, limit={limit}, search='{search}', type='{vehicle_type}'")
+    logger.debug("🔍 Buscando vehículos: skip=%s, limit=%s, search='%s', type='%s'", skip, limit, search, vehicle_type)
     
     vehicles = vehicle_crud.get_vehicles(
         db=db,
@@ -66,7 +76,7 @@ def get_vehicles(
         is_featured=is_featured
     )
     
-    print(f"✅ Encontrados {len(vehicles)} vehículos de {total} total")
+    logger.debug("✅ Encontrados %s vehículos de %s total", len(vehicles), total)
     
     return VehicleListResponse(
         vehicles=vehicles,
@@ -82,28 +92,54 @@ def get_featured_vehicles(
     db: Session = Depends(get_db)
 ):
     """Obtener vehículos destacados - PÚBLICO"""
-    print(f"⭐ Obteniendo {limit} vehículos destacados")
+    logger.debug("⭐ Obteniendo %s vehículos destacados", limit)
     vehicles = vehicle_crud.get_featured_vehicles(db=db, limit=limit)
-    print(f"✅ Encontrados {len(vehicles)} vehículos destacados")
+    logger.debug("✅ Encontrados %s vehículos destacados", len(vehicles))
     return vehicles
 
 @router.get("/stats", response_model=VehicleStats)
 def get_vehicle_stats(db: Session = Depends(get_db)):
     """Obtener estadísticas de vehículos - PÚBLICO"""
-    print("📊 Obteniendo estadísticas de vehículos")
+    logger.debug("📊 Obteniendo estadísticas de vehículos")
     stats = vehicle_crud.get_vehicle_stats(db=db)
-    print(f"✅ Stats: {stats}")
+    logger.debug("✅ Stats: %s", stats)
     return VehicleStats(**stats)
 
+@router.get("/sprites", response_model=VehicleSprite)
+async def get_vehicles_sprite(
+    request: Request,
+    ids: List[int] = Query(..., description="IDs de vehículos en el orden del listado"),
+    db: Session = Depends(get_db)
+):
+    """Sprite con los thumbnails principales de una página de vehículos - PÚBLICO
+    
+    Devuelve la URL del sprite y la posición de cada vehículo, para cargar
+    la grilla completa en una o dos peticiones. Limitado por IP, y los
+    sprites nuevos tienen además un tope global por minuto (429 si se pasa).
+    """
+    await rate_limiter.enforce(
+        f"sprites:ip:{client_ip(request)}",
+        settings.SPRITE_IP_BURST,
+        settings.SPRITE_IP_PER_MINUTE
+    )
+    
+    if len(ids) > MAX_SPRITE_VEHICLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {MAX_SPRITE_VEHICLES} vehículos por sprite"
+        )
+    
+    return await sprite_service.get_sprite(db, ids)
+
 @router.get("/{vehicle_id}", response_model=Vehicle)
 def get_vehicle(vehicle_id: int, db: Session = Depends(get_db)):
     """Obtener vehículo por ID - PÚBLICO"""
-    print(f"🚛 Obteniendo vehículo ID: {vehicle_id}")
+    logger.debug("🚛 Obteniendo vehículo ID: %s", vehicle_id)
     vehicle = vehicle_crud.get_vehicle(db=db, vehicle_id=vehicle_id)
     if not vehicle:
-        print(f"❌ Vehículo {vehicle_id} no encontrado")
+        logger.debug("❌ Vehículo %s no encontrado", vehicle_id)
         raise HTTPException(status_code=404, detail="Vehículo no encontrado")
-    print(f"✅ Vehículo encontrado: {vehicle.full_name}")
+    logger.debug("✅ Vehículo encontrado: %s", vehicle.full_name)
     return vehicle
 
 # ===== RUTAS PROTEGIDAS (REQUIEREN AUTENTICACIÓN) =====
@@ -119,18 +155,18 @@ async def create_vehicle(
 ):
     """Crear nuevo vehículo con imágenes - REQUIERE ADMIN"""
     
-    print(f"🔐 Usuario {current_user.username} creando vehículo")
+    logger.info("🔐 Usuario %s creando vehículo", current_user.username)
     
     try:
         # Parsear datos del vehículo
         vehicle_dict = json.loads(vehicle_data)
         vehicle = VehicleCreate(**vehicle_dict)
-        print(f"📝 Datos del vehículo: {vehicle.brand} {vehicle.model}")
+        logger.debug("📝 Datos del vehículo: %s %s", vehicle.brand, vehicle.model)
     except json.JSONDecodeError as e:
-        print(f"❌ Error parseando JSON: {e}")
+        logger.warning("❌ Error parseando JSON: %s", e)
         raise HTTPException(status_code=400, detail="Datos de vehículo inválidos")
     except Exception as e:
-        print(f"❌ Error en validación: {e}")
+        logger.warning("❌ Error en validación: %s", e)
         raise HTTPException(status_code=400, detail=f"Error en validación: {str(e)}")
     
     # Crear vehículo
@@ -140,26 +176,26 @@ async def create_vehicle(
             vehicle=vehicle, 
             created_by=current_user.id
         )
-        print(f"✅ Vehículo creado con ID: {db_vehicle.id}")
+        logger.info("✅ Vehículo creado con ID: %s", db_vehicle.id)
     except Exception as e:
-        print(f"❌ Error creando vehículo: {e}")
+        logger.error("❌ Error creando vehículo: %s", e)
         raise HTTPException(status_code=500, detail=f"Error creando vehículo: {str(e)}")
     
     # Subir imágenes si las hay
     if images and len(images) > 0 and images[0].filename:
         try:
-            print(f"📸 Subiendo {len(images)} imágenes")
+            logger.debug("📸 Subiendo %s imágenes", len(images))
             saved_images = await image_service.save_vehicle_images(
                 db=db,
                 vehicle_id=db_vehicle.id,
                 files=images,
                 user_id=current_user.id
             )
-            print(f"✅ {len(saved_images)} imágenes guardadas")
+            logger.debug("✅ %s imágenes guardadas", len(saved_images))
             # Refrescar para obtener las imágenes
             db.refresh(db_vehicle)
         except Exception as e:
-            print(f"⚠️ Error subiendo imágenes: {str(e)}")
+            logger.warning("⚠️ Error subiendo imágenes: %s", e)
             # No fallar por las imágenes, solo loggear
     
     return db_vehicle
@@ -173,7 +209,7 @@ def update_vehicle(
 ):
     """Actualizar vehículo - REQUIERE ADMIN"""
     
-    print(f"🔐 Usuario {current_user.username} actualizando vehículo {vehicle_id}")
+    logger.info("🔐 Usuario %s actualizando vehículo %s", current_user.username, vehicle_id)
     
     db_vehicle = vehicle_crud.update_vehicle(
         db=db, 
@@ -182,10 +218,10 @@ def update_vehicle(
     )
     
     if not db_vehicle:
-        print(f"❌ Vehículo {vehicle_id} no encontrado para actualizar")
+        logger.warning("❌ Vehículo %s no encontrado para actualizar", vehicle_id)
         raise HTTPException(status_code=404, detail="Vehículo no encontrado")
     
-    print(f"✅ Vehículo {vehicle_id} actualizado")
+    logger.info("✅ Vehículo %s actualizado", vehicle_id)
     return db_vehicle
 
 @router.delete("/{vehicle_id}")
@@ -196,15 +232,15 @@ def delete_vehicle(
 ):
     """Eliminar vehículo - REQUIERE ADMIN"""
     
-    print(f"🔐 Usuario {current_user.username} eliminando vehículo {vehicle_id}")
+    logger.info("🔐 Usuario %s eliminando vehículo %s", current_user.username, vehicle_id)
     
     success = vehicle_crud.delete_vehicle(db=db, vehicle_id=vehicle_id)
     
     if not success:
-        print(f"❌ Vehículo {vehicle_id} no encontrado para eliminar")
+        logger.warning("❌ Vehículo %s no encontrado para eliminar", vehicle_id)
         raise HTTPException(status_code=404, detail="Vehículo no encontrado")
     
-    print(f"✅ Vehículo {vehicle_id} eliminado")
+    logger.info("✅ Vehículo %s eliminado", vehicle_id)
     return {"message": "Vehículo eliminado correctamente"}
 
 # ===== RUTAS DE GESTIÓN DE IMÁGENES =====
@@ -218,7 +254,7 @@ async def upload_vehicle_images(
 ):
     """Subir imágenes a un vehículo existente - REQUIERE ADMIN"""
     
-    print(f"🔐 Usuario {current_user.username} subiendo imágenes a vehículo {vehicle_id}")
+    logger.info("🔐 Usuario %s subiendo imágenes a vehículo %s", current_user.username, vehicle_id)
     
     # Verificar que el vehículo existe
     vehicle = vehicle_crud.get_vehicle(db=db, vehicle_id=vehicle_id)
@@ -233,7 +269,7 @@ async def upload_vehicle_images(
             user_id=current_user.id
         )
         
-        print(f"✅ {len(saved_images)} imágenes subidas")
+        logger.info("✅ %s imágenes subidas", len(saved_images))
         
         return {
             "message": f"Se subieron {len(saved_images)} imágenes correctamente",
@@ -241,9 +277,51 @@ async def upload_vehicle_images(
         }
         
     except Exception as e:
-        print(f"❌ Error subiendo imágenes: {e}")
+        logger.error("❌ Error subiendo imágenes: %s", e)
         raise HTTPException(status_code=500, detail=f"Error subiendo imágenes: {str(e)}")
 
+@router.post("/{vehicle_id}/images/presign")
+def presign_vehicle_image_upload(
+    vehicle_id: int,
+    upload: VehicleImagePresignRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Obtener URL firmada para subir una imagen directo al storage - REQUIERE ADMIN"""
+    
+    vehicle = vehicle_crud.get_vehicle(db=db, vehicle_id=vehicle_id)
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Vehículo no encontrado")
+    
+    return image_service.create_presigned_upload(
+        filename=upload.filename,
+        content_type=upload.content_type,
+        content_hash=upload.content_hash,
+        file_size=upload.file_size
+    )
+
+@router.post("/{vehicle_id}/images/register", response_model=VehicleImageSchema)
+async def register_vehicle_image(
+    vehicle_id: int,
+    image: VehicleImageRegister,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Registrar una imagen ya subida al storage con la URL firmada - REQUIERE ADMIN"""
+    
+    vehicle = vehicle_crud.get_vehicle(db=db, vehicle_id=vehicle_id)
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Vehículo no encontrado")
+    
+    return await image_service.register_uploaded_image(
+        db=db,
+        vehicle_id=vehicle_id,
+        key=image.key,
+        original_filename=image.original_filename,
+        mime_type=image.content_type,
+        alt_text=image.alt_text
+    )
+
 @router.delete("/{vehicle_id}/images/{image_id}")
 def delete_vehicle_image(
     vehicle_id: int,
@@ -253,15 +331,101 @@ def delete_vehicle_image(
 ):
     """Eliminar imagen de vehículo - REQUIERE ADMIN"""
     
-    print(f"🔐 Usuario {current_user.username} eliminando imagen {image_id} del vehículo {vehicle_id}")
+    logger.info("🔐 Usuario %s eliminando imagen %s del vehículo %s", current_user.username, image_id, vehicle_id)
     
     success = image_service.delete_image(db=db, image_id=image_id)
     if not success:
         raise HTTPException(status_code=404, detail="Imagen no encontrada")
     
-    print(f"✅ Imagen {image_id} eliminada")
+    logger.info("✅ Imagen %s eliminada", image_id)
     return {"message": "Imagen eliminada correctamente"}
 
+@router.patch("/{vehicle_id}/images")
+def update_vehicle_images_order(
+    vehicle_id: int,
+    order: VehicleImagesUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Aplicar nuevo orden y foto principal de la galería en una sola sentencia - REQUIERE ADMIN"""
+    
+    image_orders = [
+        {"image_id": item.id, "order": item.display_order}
+        for item in order.images
+    ]
+    
+    # El orden debe cubrir toda la galería; con una lista parcial las filas
+    # omitidas conservarían su is_primary y podrían quedar dos principales
+    requested_ids = [item["image_id"] for item in image_orders]
+    vehicle_image_ids = {
+        image_id for (image_id,) in db.query(VehicleImage.id).filter(
+            VehicleImage.vehicle_id == vehicle_id
+        )
+    }
+    if len(set(requested_ids)) != len(requested_ids) or set(requested_ids) != vehicle_image_ids:
+        raise HTTPException(
+            status_code=400,
+            detail="El orden debe incluir todas las imágenes del vehículo, una vez cada una"
+        )
+    if order.primary_image_id is not None and order.primary_image_id not in vehicle_image_ids:
+        raise HTTPException(status_code=400, detail="La imagen principal no pertenece al vehículo")
+    
+    try:
+        updated = image_service.update_images_order(
+            db=db,
+            vehicle_id=vehicle_id,
+            image_orders=image_orders,
+            primary_image_id=order.primary_image_id
+        )
+        
+        # Si alguna imagen no pertenece al vehículo no se aplica nada
+        if updated >= 0 and updated != len(image_orders):
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail="Alguna imagen no existe o no pertenece al vehículo"
+            )
+        
+        db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error reordenando imágenes: {str(e)}")
+    
+    return {
+        "message": "Orden de imágenes actualizado",
+        "vehicle_id": vehicle_id,
+        "updated": updated
+    }
+
+@router.get("/{vehicle_id}/images/near-duplicates")
+def get_near_duplicate_images(
+    vehicle_id: int,
+    max_distance: int = Query(6, ge=0, le=64),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Listar pares de imágenes casi idénticas de un vehículo - REQUIERE ADMIN"""
+
+    pairs = image_service.find_near_duplicates(
+        db=db,
+        vehicle_id=vehicle_id,
+        max_distance=max_distance
+    )
+
+    return {
+        "vehicle_id": vehicle_id,
+        "pairs": [
+            {
+                "image_id": first.id,
+                "duplicate_image_id": second.id,
+                "distance": distance
+            }
+            for first, second, distance in pairs
+        ]
+    }
+
 # ===== RUTAS PARA EL PANEL DE ADMINISTRACIÓN =====
 
 @router.get("/admin/all")
@@ -275,7 +439,7 @@ def get_all_vehicles_admin(
 ):
     """Obtener todos los vehículos para el panel de administración - REQUIERE ADMIN"""
     
-    print(f"🔐 Usuario {current_user.username} obteniendo vehículos del admin")
+    logger.debug("🔐 Usuario %s obteniendo vehículos del admin", current_user.username)
     
     vehicles = vehicle_crud.get_vehicles(
         db=db,
@@ -292,7 +456,7 @@ def get_all_vehicles_admin(
         status=status
     )
     
-    print(f"✅ Admin: {len(vehicles)} vehículos de {total} total")
+    logger.debug("✅ Admin: %s vehículos de %s total", len(vehicles), total)
     
     return {
         "vehicles": vehicles,
@@ -309,7 +473,7 @@ def get_dashboard_stats(
 ):
     """Obtener estadísticas para el dashboard de administración - REQUIERE ADMIN"""
     
-    print(f"🔐 Usuario {current_user.username} obteniendo stats del dashboard")
+    logger.debug("🔐 Usuario %s obteniendo stats del dashboard", current_user.username)
     
     stats = vehicle_crud.get_vehicle_stats(db=db)
     
@@ -334,7 +498,7 @@ def toggle_vehicle_featured(
 ):
     """Alternar estado destacado de un vehículo - REQUIERE ADMIN"""
     
-    print(f"🔐 Usuario {current_user.username} cambiando estado destacado del vehículo {vehicle_id}")
+    logger.info("🔐 Usuario %s cambiando estado destacado del vehículo %s", current_user.username, vehicle_id)
     
     vehicle = vehicle_crud.get_vehicle(db=db, vehicle_id=vehicle_id)
     if not vehicle:
@@ -349,7 +513,7 @@ def toggle_vehicle_featured(
     )
     
     status_text = "destacado" if new_featured else "normal"
-    print(f"✅ Vehículo {vehicle_id} marcado como {status_text}")
+    logger.info("✅ Vehículo %s marcado como %s", vehicle_id, status_text)
     
     return {
         "message": f"Vehículo marcado como {status_text}",
@@ -366,7 +530,7 @@ def create_test_vehicle(
 ):
     """Crear vehículo de prueba rápido - SOLO PARA TESTING"""
     
-    print(f"🔐 Usuario {current_user.username} creando vehículo de prueba")
+    logger.info("🔐 Usuario %s creando vehículo de prueba", current_user.username)
     
     from datetime import datetime
     
@@ -398,12 +562,12 @@ def create_test_vehicle(
             created_by=current_user.id
         )
         
-        print(f"✅ Vehículo de prueba creado: {db_vehicle.full_name}")
+        logger.info("✅ Vehículo de prueba creado: %s", db_vehicle.full_name)
         
         return db_vehicle
         
     except Exception as e:
-        print(f"❌ Error creando vehículo de prueba: {e}")
+        logger.error("❌ Error creando vehículo de prueba: %s", e)
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 # ===== ENDPOINT DE DEBUG =====
@@ -1,16 +1,41 @@
 # app/core/auth.py - SISTEMA DE AUTENTICACIÓN CORREGIDO
 
+import logging
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.core.database import get_db
 from app.core.security import verify_token
+from app.core.tracing import traced
+from app.core.user_cache import user_cache
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
+
 # Configurar esquema de seguridad
 security = HTTPBearer(auto_error=False)
 
+def _load_user(db: Session, username: str) -> Optional[User]:
+    return db.query(User).filter(User.username == username).first()
+
+async def resolve_user(db: Session, username: str, iat: Optional[int]) -> Optional[User]:
+    """
+    Usuario del token desde la cache; si no está, consulta la BD en el
+    threadpool para no bloquear el event loop
+    """
+    user = user_cache.get(username, iat)
+    if user is not None:
+        return user
+    
+    user = await run_in_threadpool(_load_user, db, username)
+    if user is None:
+        return None
+    
+    return user_cache.set(username, iat, user)
+
+@traced()
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
@@ -49,15 +74,15 @@ async def get_current_user(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error verificando token: {e}")
+        logger.warning("❌ Error verificando token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Error verificando credenciales",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Obtener usuario de la base de datos
-    user = db.query(User).filter(User.username == username).first()
+    # Obtener usuario (cache por username + iat del token)
+    user = await resolve_user(db, username, payload.get("iat"))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -73,6 +98,7 @@ async def get_current_user(
     
     return user
 
+@traced()
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -86,6 +112,7 @@ async def get_current_active_user(
         )
     return current_user
 
+@traced()
 async def get_current_superuser(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -100,6 +127,7 @@ async def get_current_superuser(
     return current_user
 
 # Dependencia opcional (para endpoints que pueden funcionar con o sin auth)
+@traced()
 async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
     db: Session = Depends(get_db)
@@ -119,7 +147,7 @@ async def get_current_user_optional(
         if username is None:
             return None
         
-        user = db.query(User).filter(User.username == username).first()
+        user = await resolve_user(db, username, payload.get("iat"))
         if user is None or not user.is_active:
             return None
         
@@ -1,7 +1,7 @@
 # app/core/config.py - ACTUALIZADO
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -14,6 +14,9 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    REVOCATION_BACKEND: str = "memory"  # "memory" (por proceso) o "redis" (compartida)
+    TOKEN_CACHE_MAX_ENTRIES: int = 4096  # tokens verificados en memoria (0 = sin cache)
     
     # Database
     DATABASE_URL: str
@@ -31,14 +34,107 @@ class Settings(BaseSettings):
         "*"  # TEMPORAL para desarrollo - REMOVER EN PRODUCCIÓN
     ]
     
+    # bcrypt: costo y pool de threads dedicado
+    BCRYPT_ROUNDS: int = 12
+    BCRYPT_WORKERS: int = 2
+    BCRYPT_MAX_PENDING: int = 32  # más operaciones en espera -> 503
+    
+    # Rate limiting de login (token buckets; en Redis si hay REDIS_URL)
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_IP_BURST: int = 20
+    LOGIN_IP_PER_MINUTE: float = 10
+    LOGIN_USERNAME_BURST: int = 5
+    LOGIN_USERNAME_PER_MINUTE: float = 3
+    TRUST_PROXY_HEADERS: bool = False  # usar X-Forwarded-For (solo detrás de un proxy propio)
+    TRUSTED_PROXY_HOPS: int = 1  # proxies propios que agregan X-Forwarded-For
+    
+    # Cache de usuarios autenticados (0 = deshabilitada)
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_MAX_ENTRIES: int = 1024
+    
     # File Upload
     UPLOAD_DIR: str = "static/uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: List[str] = ["jpg", "jpeg", "png", "webp"]
+    MAX_IMAGE_PIXELS: int = 50_000_000  # ancho x alto; protege contra decompression bombs
+    
+    # Optimización de imágenes (el original guardado se re-codifica sin metadatos)
+    IMAGE_MAX_DIMENSION: int = 2048
+    IMAGE_JPEG_QUALITY: int = 82
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_TARGET_SSIM: float = 0.0  # ej: 0.99 para elegir la calidad por SSIM; 0 = calidad fija
+    IMAGE_MIN_QUALITY: int = 60
+    IMAGE_MAX_QUALITY: int = 90
+    
+    # Storage: "local" (UPLOAD_DIR) o "s3" (S3 / MinIO)
+    STORAGE_BACKEND: str = "local"
+    STORAGE_PUBLIC_URL: str = "/static/uploads"
+    PRESIGNED_URL_EXPIRE_SECONDS: int = 900
+    
+    # Reconciliación de storage (0 = sin tarea periódica)
+    STORAGE_GC_INTERVAL_MINUTES: int = 0
+    STORAGE_GC_DELETE: bool = False
+    STORAGE_GC_INCLUDE_INACTIVE: bool = False
+    STORAGE_GC_BATCH_SIZE: int = 500
+    STORAGE_GC_MIN_AGE_SECONDS: int = 3600
+    
+    # Sprites de listados en 'sprites/' (0 = sin límite)
+    SPRITE_MAX_COUNT: int = 2000
+    SPRITE_MAX_AGE_DAYS: int = 30
+    SPRITE_PRUNE_EVERY: int = 100  # podar cada N sprites nuevos por worker
+    SPRITE_IP_BURST: int = 30
+    SPRITE_IP_PER_MINUTE: float = 60
+    SPRITE_BUILD_BURST: int = 20  # sprites nuevos (no cacheados), para todos los clientes
+    SPRITE_BUILDS_PER_MINUTE: float = 30
     
     # Environment
     ENVIRONMENT: str = "development"
     
+    # Logging (salida por una cola y un thread propio)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = ""  # "json" o "text"; vacío = json en production, text en el resto
+    LOG_LEVELS: Dict[str, str] = {}  # niveles por módulo, ej: {"app.services.image_service": "DEBUG"}
+    LOG_DEBUG_SAMPLE_RATE: float = 0.1  # fracción de eventos DEBUG que se escriben, por línea
+    SQL_ECHO: bool = False  # loguear el SQL de SQLAlchemy
+    
+    # Perfil de SQL por request: Server-Timing y aviso de N+1
+    SQL_PROFILER_ENABLED: Optional[bool] = None  # None = solo en development
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # misma sentencia N veces en una request
+    SQL_SLOW_QUERY_MS: int = 200  # loguear sentencias más lentas (0 = no)
+    SQL_LOG_PARAMS: Optional[bool] = None  # parámetros en el log de lentas; None = solo en development
+    
+    # Métricas Prometheus en /metrics
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""  # Authorization: Bearer <token> para el scraper
+    METRICS_ALLOWED_IPS: List[str] = []  # IPs o redes (CIDR) que pueden leer sin token
+    
+    # Perfil bajo demanda (superusuarios, header X-Profile: 1 o ?_profile=1)
+    PROFILING_ENABLED: bool = True
+    PROFILING_BURST: int = 3  # perfiles seguidos por usuario
+    PROFILING_PER_MINUTE: float = 2
+    PROFILING_INTERVAL_MS: float = 1  # intervalo de muestreo
+    PROFILING_MAX_SECONDS: float = 30  # el muestreo se corta pasado este tiempo
+    PROFILING_MAX_STORED: int = 50  # perfiles guardados por proceso
+    
+    # Memoria por worker: muestreo de RSS/GC y snapshots de tracemalloc
+    MEMORY_SAMPLE_INTERVAL_SECONDS: int = 60  # 0 = sin muestreo periódico
+    MEMORY_SAMPLE_HISTORY: int = 120  # muestras guardadas
+    TRACEMALLOC_MAX_SNAPSHOTS: int = 5
+    
+    # Trazas OpenTelemetry (OTLP/JSON): "file", "otlp" o vacío = apagado
+    TRACING_EXPORTER: str = ""
+    TRACING_FILE: str = "traces/traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318"
+    TRACING_SAMPLE_RATIO: float = 1.0  # fracción de requests trazadas
+    TRACING_TRUST_TRACEPARENT: bool = False  # respetar traceparent entrante (solo si lo pone un proxy propio)
+    TRACING_SERVICE_NAME: str = "larrosa-backend"
+    
+    # Event loop: lag como métrica y watchdog que loguea la pila si se bloquea
+    EVENT_LOOP_MONITOR_ENABLED: bool = True
+    EVENT_LOOP_LAG_INTERVAL_MS: int = 100
+    EVENT_LOOP_BLOCK_THRESHOLD_MS: int = 100
+    EVENT_LOOP_WATCHDOG_ENABLED: Optional[bool] = None  # None = solo en development
+    
     # Admin Panel
     ADMIN_EMAIL: str = "admin@larrosacamiones.com"
     ADMIN_USERNAME: str = "admin"
@@ -49,6 +145,8 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str = ""
     AWS_S3_BUCKET: str = ""
     AWS_REGION: str = "us-east-1"
+    AWS_S3_ENDPOINT_URL: str = ""  # ej: http://minio:9000
+    AWS_S3_PUBLIC_URL: str = ""  # CDN o URL pública del bucket
     
     # Redis (opcional)
     REDIS_URL: str = ""
@@ -6,7 +6,8 @@ from app.core.config import settings
 # Crear engine de base de datos
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=settings.ENVIRONMENT == "development",  # Log SQL queries en desarrollo
+    # Con SQL_ECHO el SQL se loguea por app.core.logging; echo=True escribiría directo a stdout
+    echo=False,
     pool_pre_ping=True,  # Verificar conexiones antes de usar
     pool_recycle=300  # Reciclar conexiones cada 5 minutos
 )
@@ -0,0 +1,108 @@
+# app/core/loop_monitor.py - LAG DEL EVENT LOOP Y DETECTOR DE LLAMADAS BLOQUEANTES
+
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+# Frames de la pila bloqueante que se loguean (los más internos)
+STACK_LIMIT = 40
+
+
+def watchdog_enabled() -> bool:
+    """EVENT_LOOP_WATCHDOG_ENABLED explícito, o encendido solo en development"""
+    if settings.EVENT_LOOP_WATCHDOG_ENABLED is not None:
+        return settings.EVENT_LOOP_WATCHDOG_ENABLED
+    return settings.ENVIRONMENT == "development"
+
+
+class LoopMonitor:
+    """Mide cuánto tarda el event loop en despertar un sleep de `interval`.
+
+    La demora por encima del intervalo es lo que esperó cualquier callback
+    listo para correr: sube cuando un handler async hace trabajo bloqueante
+    (commits sync, Pillow, stat del filesystem). Se exporta como histograma.
+
+    El watchdog (modo debug) es un thread que mira el último latido del
+    loop; si pasa más del umbral sin latir, loguea la pila del thread del
+    loop en ese momento, es decir, la llamada que lo tiene bloqueado.
+    """
+
+    def __init__(self):
+        self.interval = settings.EVENT_LOOP_LAG_INTERVAL_MS / 1000
+        self.threshold = settings.EVENT_LOOP_BLOCK_THRESHOLD_MS / 1000
+        self.heartbeat = time.monotonic()
+        self.loop_thread: Optional[int] = None
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.blocks = 0
+        self.stacks_logged = 0
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def run(self) -> None:
+        """Tarea periódica del loop; arranca también el watchdog si corresponde"""
+        self.loop_thread = threading.get_ident()
+        if watchdog_enabled():
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        logger.info(
+            f"⏱️ Event loop monitor every {settings.EVENT_LOOP_LAG_INTERVAL_MS} ms "
+            f"(block threshold {settings.EVENT_LOOP_BLOCK_THRESHOLD_MS} ms, watchdog={self._watchdog is not None})"
+        )
+
+        while True:
+            self.heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self.heartbeat - self.interval)
+
+            EVENT_LOOP_LAG.observe(lag)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self.blocks += 1
+                EVENT_LOOP_BLOCKED.inc()
+                if self._watchdog is not None:
+                    logger.warning("🐌 Event loop was blocked for %.0f ms", lag * 1000)
+
+    def _watch(self) -> None:
+        reported = None
+        while True:
+            time.sleep(self.threshold / 2)
+            beat = self.heartbeat
+            blocked = time.monotonic() - beat - self.interval
+            # Una sola pila por bloqueo: el latido no cambia hasta que termina
+            if blocked < self.threshold or reported == beat:
+                continue
+
+            reported = beat
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame)[-STACK_LIMIT:])
+            self.stacks_logged += 1
+            logger.warning(
+                "🐌 Event loop blocked for more than %.0f ms, loop thread is at:\n%s",
+                blocked * 1000, stack
+            )
+
+    def stats(self) -> Dict:
+        return {
+            "interval_ms": settings.EVENT_LOOP_LAG_INTERVAL_MS,
+            "threshold_ms": settings.EVENT_LOOP_BLOCK_THRESHOLD_MS,
+            "watchdog": self._watchdog is not None,
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "blocks": self.blocks,
+            "stacks_logged": self.stacks_logged,
+        }
+
+
+# Instancia global
+loop_monitor = LoopMonitor()
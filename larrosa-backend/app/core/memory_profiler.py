@@ -0,0 +1,289 @@
+# app/core/memory_profiler.py - MEMORIA POR WORKER: RSS, GC Y TRACEMALLOC
+
+import gc
+import io
+import os
+import sys
+import time
+import uuid
+import asyncio
+import logging
+import resource
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Dict, List
+from fastapi import HTTPException, status
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# Las asignaciones del propio tracemalloc y del import system solo meten ruido
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def rss_bytes() -> int:
+    """RSS actual del proceso (/proc en Linux; si no, el pico de getrusage)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class GCTimer:
+    """Cantidad y duración de las pausas del GC por generación (gc.callbacks)"""
+
+    def __init__(self):
+        self.pauses = [0, 0, 0]
+        self.seconds = [0.0, 0.0, 0.0]
+        self.collected = [0, 0, 0]
+        self._started = None
+
+    def __call__(self, phase: str, info: Dict) -> None:
+        if phase == "start":
+            self._started = time.perf_counter()
+        elif self._started is not None:
+            generation = info["generation"]
+            self.pauses[generation] += 1
+            self.seconds[generation] += time.perf_counter() - self._started
+            self.collected[generation] += info["collected"]
+            self._started = None
+
+    def stats(self) -> List[Dict]:
+        return [
+            {
+                "generation": generation,
+                "pauses": self.pauses[generation],
+                "pause_ms_total": round(self.seconds[generation] * 1000, 1),
+                "collected": self.collected[generation],
+            }
+            for generation in range(3)
+        ]
+
+
+def object_census() -> Dict:
+    """Objetos vivos que suelen retener memoria en esta app.
+
+    Recorre gc.get_objects(), así que cuesta decenas de ms con heaps
+    grandes: solo se calcula a pedido, nunca en el muestreo periódico.
+    """
+    from PIL import Image
+    from sqlalchemy.orm import Session
+
+    census = {
+        "pil_images": 0,
+        "pil_image_bytes": 0,
+        "bytesio_buffers": 0,
+        "bytesio_bytes": 0,
+        "sqlalchemy_sessions": 0,
+        "identity_map_objects": 0,
+    }
+    for obj in gc.get_objects():
+        if isinstance(obj, Image.Image):
+            census["pil_images"] += 1
+            if getattr(obj, "im", None) is not None:
+                census["pil_image_bytes"] += obj.width * obj.height * len(obj.getbands())
+        elif isinstance(obj, io.BytesIO):
+            census["bytesio_buffers"] += 1
+            # __sizeof__ incluye el buffer; getbuffer() lo exportaría y un
+            # write() concurrente del thread dueño fallaría con BufferError
+            census["bytesio_bytes"] += sys.getsizeof(obj)
+        elif isinstance(obj, Session):
+            census["sqlalchemy_sessions"] += 1
+            census["identity_map_objects"] += len(obj.identity_map)
+    return census
+
+
+class MemoryProfiler:
+    """Control de tracemalloc y muestreo periódico de RSS/GC de este worker.
+
+    Todo es por proceso: con varios workers cada respuesta indica el pid
+    que la atendió, y los snapshots solo existen en ese worker.
+    """
+
+    def __init__(self, max_snapshots: int, history: int):
+        self.max_snapshots = max_snapshots
+        self.gc_timer = GCTimer()
+        self.samples = deque(maxlen=history)
+        self._snapshots: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        gc.callbacks.append(self.gc_timer)
+
+    # ===== RSS / GC =====
+
+    def sample(self) -> Dict:
+        """Muestra barata (no recorre el heap): se toma desde el event loop"""
+        return {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "rss_bytes": rss_bytes(),
+            "gc_collections": [generation["collections"] for generation in gc.get_stats()],
+            "traced_bytes": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+        }
+
+    async def sample_loop(self) -> None:
+        """Tarea periódica: una muestra cada MEMORY_SAMPLE_INTERVAL_SECONDS"""
+        interval = settings.MEMORY_SAMPLE_INTERVAL_SECONDS
+        logger.info(f"🧠 Memory sampling every {interval}s (pid {os.getpid()})")
+
+        while True:
+            try:
+                self.samples.append(self.sample())
+            except Exception as e:
+                logger.error(f"❌ Memory sample failed: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self, objects: bool = False) -> Dict:
+        current = self.sample()
+        stats = {
+            "pid": os.getpid(),
+            "current": current,
+            "rss_peak_bytes": peak_rss_bytes(),
+            "gc": {
+                "objects": len(gc.get_objects()),
+                "thresholds": list(gc.get_threshold()),
+                "generations": self.gc_timer.stats(),
+                "uncollectable": len(gc.garbage),
+            },
+            "tracemalloc": self.tracemalloc_status(),
+            "history": list(self.samples),
+        }
+        if objects:
+            stats["objects"] = object_census()
+        return stats
+
+    # ===== TRACEMALLOC =====
+
+    def tracemalloc_status(self) -> Dict:
+        if not tracemalloc.is_tracing():
+            return {"tracing": False, "snapshots": self.snapshot_list()}
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": True,
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": traced,
+            "traced_peak_bytes": peak,
+            "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            "snapshots": self.snapshot_list(),
+        }
+
+    def start(self, frames: int) -> Dict:
+        """Empezar a trazar; solo se ven las asignaciones hechas desde ahora"""
+        if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() != frames:
+            tracemalloc.stop()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info(f"🧠 tracemalloc started ({frames} frames, pid {os.getpid()})")
+        return self.tracemalloc_status()
+
+    def stop(self) -> Dict:
+        """Dejar de trazar y liberar los snapshots (tracemalloc cuesta memoria y CPU)"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info(f"🧠 tracemalloc stopped (pid {os.getpid()})")
+        with self._lock:
+            self._snapshots.clear()
+        return self.tracemalloc_status()
+
+    def take_snapshot(self) -> Dict:
+        if not tracemalloc.is_tracing():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="tracemalloc no está activo en este worker"
+            )
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        entry = {
+            "id": uuid.uuid4().hex[:8],
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "traced_bytes": sum(stat.size for stat in snapshot.statistics("filename")),
+            "rss_bytes": rss_bytes(),
+            "snapshot": snapshot,
+        }
+        with self._lock:
+            self._snapshots[entry["id"]] = entry
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return self._summary(entry)
+
+    def snapshot_list(self) -> List[Dict]:
+        with self._lock:
+            return [self._summary(entry) for entry in self._snapshots.values()]
+
+    def top(self, snapshot_id: str, group_by: str, limit: int) -> Dict:
+        """Las `limit` ubicaciones que más memoria retienen en el snapshot"""
+        entry = self._get(snapshot_id)
+        stats = entry["snapshot"].statistics(group_by)
+        return {
+            **self._summary(entry),
+            "group_by": group_by,
+            "top": [
+                {"location": self._location(stat.traceback, group_by), "size_bytes": stat.size, "count": stat.count}
+                for stat in stats[:limit]
+            ],
+        }
+
+    def diff(self, base_id: str, current_id: str, group_by: str, limit: int) -> Dict:
+        """Ubicaciones que más crecieron entre dos snapshots"""
+        base = self._get(base_id)
+        current = self._get(current_id)
+        stats = current["snapshot"].compare_to(base["snapshot"], group_by)
+        return {
+            "base": self._summary(base),
+            "current": self._summary(current),
+            "group_by": group_by,
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": [
+                {
+                    "location": self._location(stat.traceback, group_by),
+                    "size_bytes": stat.size,
+                    "size_diff_bytes": stat.size_diff,
+                    "count": stat.count,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+    def _get(self, snapshot_id: str) -> Dict:
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        if entry is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Snapshot {snapshot_id} no encontrado en el worker {os.getpid()}"
+            )
+        return entry
+
+    @staticmethod
+    def _summary(entry: Dict) -> Dict:
+        return {key: value for key, value in entry.items() if key != "snapshot"}
+
+    @staticmethod
+    def _location(traceback: tracemalloc.Traceback, group_by: str):
+        if group_by == "traceback":
+            return traceback.format()
+        frame = traceback[0]
+        return frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
+
+
+# Instancia global
+memory_profiler = MemoryProfiler(
+    max_snapshots=settings.TRACEMALLOC_MAX_SNAPSHOTS,
+    history=settings.MEMORY_SAMPLE_HISTORY
+)
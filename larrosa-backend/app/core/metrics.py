@@ -0,0 +1,179 @@
+# app/core/metrics.py - MÉTRICAS PROMETHEUS
+
+import hmac
+import ipaddress
+from fastapi import Request
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from starlette.routing import Match
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app.core.config import settings
+from app.core.database import engine
+from app.core.security import token_cache
+from app.core.user_cache import user_cache
+
+# ===== HTTP =====
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requests HTTP completadas",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Latencia de las requests por ruta",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests en curso por ruta",
+    ["method", "route"]
+)
+
+# ===== Base de datos =====
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Duración de cada sentencia SQL",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Sentencias SQL ejecutadas por request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Tiempo total en SQL por request",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+# ===== Imágenes =====
+
+IMAGE_PROCESSING_DURATION = Histogram(
+    "image_processing_duration_seconds", "Duración de cada etapa del pipeline de imágenes",
+    ["stage"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+IMAGE_PROCESSING_IN_PROGRESS = Gauge(
+    "image_processing_in_progress", "Imágenes esperando o en proceso en el threadpool"
+)
+IMAGES_PROCESSED = Counter(
+    "images_processed_total", "Imágenes recibidas por resultado",
+    ["result"]
+)
+
+# ===== bcrypt =====
+
+BCRYPT_QUEUE_DURATION = Histogram(
+    "bcrypt_queue_seconds", "Espera en la cola del pool de bcrypt",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+BCRYPT_RUN_DURATION = Histogram(
+    "bcrypt_run_seconds", "Duración de cada hash/verificación bcrypt",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1, 2)
+)
+BCRYPT_REJECTED = Counter(
+    "bcrypt_rejected_total", "Operaciones bcrypt rechazadas por pool saturado"
+)
+
+# ===== Event loop =====
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Demora del event loop en atender un callback ya listo",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "event_loop_blocked_total", "Veces que el event loop estuvo bloqueado más que el umbral"
+)
+
+
+class StateCollector:
+    """Valores que ya existen en memoria (pool, caches); se leen al scrapear"""
+
+    def collect(self):
+        pool = engine.pool
+        pool_metrics = {
+            "db_pool_size": ("Conexiones configuradas en el pool", "size"),
+            "db_pool_checked_out": ("Conexiones en uso", "checkedout"),
+            "db_pool_checked_in": ("Conexiones libres en el pool", "checkedin"),
+            "db_pool_overflow": ("Conexiones por encima de pool_size", "overflow"),
+        }
+        for name, (documentation, method) in pool_metrics.items():
+            # SQLite usa pools sin estas estadísticas
+            if hasattr(pool, method):
+                yield GaugeMetricFamily(name, documentation, value=getattr(pool, method)())
+
+        hits = CounterMetricFamily("cache_hits", "Aciertos de cache", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Fallos de cache", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Aciertos / consultas desde el arranque", labels=["cache"])
+        for name, cache in (("token", token_cache), ("user", user_cache)):
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            lookups = stats["hits"] + stats["misses"]
+            ratio.add_metric([name], stats["hits"] / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+
+REGISTRY.register(StateCollector())
+
+
+def route_label(scope: dict) -> str:
+    """Plantilla de la ruta (ej: /api/v1/vehicles/{vehicle_id}) para no explotar la cardinalidad"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("path", "").startswith("/static/"):
+        return "/static"
+    return "unmatched"
+
+
+def match_route_label(routes: list, scope: dict) -> str:
+    """Como route_label pero antes del routing (scope["route"] todavía no existe).
+
+    Mismo criterio que el router de Starlette: la primera ruta que coincide
+    por completo, o si no la primera que coincide solo en el path (405).
+    """
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    if partial is not None:
+        return partial
+    return route_label(scope)
+
+
+def metrics_access_allowed(request: Request) -> bool:
+    """Bearer METRICS_TOKEN o IP (del socket, no X-Forwarded-For) en METRICS_ALLOWED_IPS.
+
+    Sin ninguno de los dos configurado /metrics queda abierto solo en
+    development: expone rutas, volumen de tráfico y estado interno.
+    """
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            return True
+
+    if settings.METRICS_ALLOWED_IPS and request.client:
+        try:
+            address = ipaddress.ip_address(request.client.host)
+        except ValueError:
+            return False
+        for allowed in settings.METRICS_ALLOWED_IPS:
+            try:
+                if address in ipaddress.ip_network(allowed, strict=False):
+                    return True
+            except ValueError:
+                continue
+        return False
+
+    if settings.METRICS_TOKEN:
+        return False
+    return settings.ENVIRONMENT == "development"
+
+
+def render_metrics() -> tuple:
+    """Cuerpo y content type para /metrics"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,109 @@
+# app/core/password_hasher.py - POOL DEDICADO PARA BCRYPT
+
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.core.metrics import BCRYPT_QUEUE_DURATION, BCRYPT_REJECTED, BCRYPT_RUN_DURATION
+from app.core.security import pwd_context
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasher:
+    """Ejecuta bcrypt en un pool de threads propio y acotado.
+
+    bcrypt cuesta 100-300 ms de CPU por llamada; en el threadpool compartido
+    de Starlette una ráfaga de logins bloquea las rutas sync del catálogo.
+    Acá corre en BCRYPT_WORKERS threads aparte y, si hay más de
+    BCRYPT_MAX_PENDING operaciones en espera, se responde 503 enseguida
+    en lugar de encolar sin límite.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+
+        # Estadísticas (solo se modifican desde el event loop)
+        self.completed = 0
+        self.rejected = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+        self.run_seconds_max = 0.0
+
+    async def _run(self, fn: Callable, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            BCRYPT_REJECTED.inc()
+            logger.warning(f"⚠️ bcrypt pool saturated ({self._pending} pending), rejecting")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, intenta nuevamente en unos segundos",
+                headers={"Retry-After": "1"}
+            )
+
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, queued, ran = await loop.run_in_executor(self._executor, job)
+        finally:
+            self._pending -= 1
+
+        self.completed += 1
+        self.queue_seconds_total += queued
+        self.queue_seconds_max = max(self.queue_seconds_max, queued)
+        self.run_seconds_total += ran
+        self.run_seconds_max = max(self.run_seconds_max, ran)
+        BCRYPT_QUEUE_DURATION.observe(queued)
+        BCRYPT_RUN_DURATION.observe(ran)
+        return result
+
+    async def hash(self, password: str) -> str:
+        """Hashear password con el costo configurado (BCRYPT_ROUNDS)"""
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verificar password. Devuelve (válido, hash nuevo si el costo cambió)"""
+        def verify_and_update():
+            try:
+                return pwd_context.verify_and_update(plain_password, hashed_password)
+            except Exception as e:
+                logger.error(f"❌ Error verificando password: {e}")
+                return False, None
+
+        return await self._run(verify_and_update)
+
+    def stats(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_ms_avg": self.queue_seconds_total / completed * 1000,
+            "queue_ms_max": self.queue_seconds_max * 1000,
+            "run_ms_avg": self.run_seconds_total / completed * 1000,
+            "run_ms_max": self.run_seconds_max * 1000,
+            "rounds": settings.BCRYPT_ROUNDS
+        }
+
+
+# Instancia global
+password_hasher = PasswordHasher(
+    workers=settings.BCRYPT_WORKERS,
+    max_pending=settings.BCRYPT_MAX_PENDING
+)
@@ -0,0 +1,193 @@
+# app/core/rate_limit.py - RATE LIMITING CON TOKEN BUCKETS
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+from fastapi import HTTPException, Request, status
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bucket en Redis: hash {t: tokens, ts: último refill}. Devuelve los segundos
+# a esperar (0 = permitido). Todo en un solo round-trip y atómico.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class InMemoryRateLimiter:
+    """Token buckets en memoria (por proceso).
+
+    Cada bucket guarda (tokens, último refill) y se recarga a `rate` tokens
+    por segundo hasta `capacity`. Un bucket lleno equivale a uno inexistente,
+    así que al superar max_entries se descartan los menos usados sin
+    perjudicar a nadie.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, capacity: int, rate: float) -> float:
+        """Consumir un token. Devuelve 0 si se permite o los segundos a esperar"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> Dict[str, int]:
+        return {"buckets": len(self._buckets)}
+
+
+class RedisRateLimiter:
+    """Token buckets compartidos entre procesos, evaluados con un script Lua.
+
+    Si Redis no responde se usa el limitador en memoria durante unos
+    segundos: mejor un límite por proceso que ninguno.
+    """
+
+    KEY_PREFIX = "ratelimit:"
+    RETRY_REDIS_SECONDS = 5
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(TOKEN_BUCKET_LUA)
+        self.local = InMemoryRateLimiter()
+        self._redis_down_until = 0.0
+        self.fallbacks = 0
+
+    async def acquire(self, key: str, capacity: int, rate: float) -> float:
+        if time.monotonic() >= self._redis_down_until:
+            try:
+                wait = await self.script(
+                    keys=[f"{self.KEY_PREFIX}{key}"],
+                    args=[capacity, rate, time.time()]
+                )
+                return float(wait)
+            except Exception as e:
+                logger.warning(f"⚠️ Redis rate limiter unavailable ({e}), using in-process buckets")
+                self._redis_down_until = time.monotonic() + self.RETRY_REDIS_SECONDS
+
+        self.fallbacks += 1
+        return self.local.acquire(key, capacity, rate)
+
+    def stats(self) -> Dict[str, int]:
+        return {"backend": "redis", "fallbacks": self.fallbacks, **self.local.stats()}
+
+
+class RateLimiter:
+    """Punto de entrada único: elige el backend y lleva las estadísticas"""
+
+    def __init__(self):
+        if settings.REDIS_URL:
+            logger.info("🚦 Using Redis rate limiting")
+            self.backend = RedisRateLimiter(settings.REDIS_URL)
+        else:
+            self.backend = InMemoryRateLimiter()
+        self.allowed = 0
+        self.rejected = 0
+
+    async def hit(self, key: str, capacity: int, per_minute: float) -> float:
+        """Consumir un token del bucket `key`; devuelve los segundos a esperar (0 = ok)"""
+        rate = per_minute / 60
+        if isinstance(self.backend, InMemoryRateLimiter):
+            # Sin await: un rechazo cuesta microsegundos
+            wait = self.backend.acquire(key, capacity, rate)
+        else:
+            wait = await self.backend.acquire(key, capacity, rate)
+
+        if wait > 0:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    async def enforce(self, key: str, capacity: int, per_minute: float) -> None:
+        """Como hit, pero responde 429 con Retry-After si el bucket está vacío"""
+        wait = await self.hit(key, capacity, per_minute)
+        if wait > 0:
+            logger.warning(f"🚦 Rate limit exceeded: {key}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiados intentos, espera unos segundos e intenta nuevamente",
+                headers={"Retry-After": str(int(wait) + 1)}
+            )
+
+    def stats(self) -> dict:
+        backend_stats = self.backend.stats()
+        backend_stats.setdefault("backend", "memory")
+        return {"allowed": self.allowed, "rejected": self.rejected, **backend_stats}
+
+
+def client_ip(request: Request) -> str:
+    """IP del cliente; X-Forwarded-For solo si estamos detrás de un proxy confiable.
+
+    Cada proxy agrega al final la IP de quien le habló, así que lo que está a
+    la izquierda lo puede escribir el cliente: se toma la entrada que agregó
+    el proxy más externo, contando TRUSTED_PROXY_HOPS desde la derecha.
+    """
+    if settings.TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+            depth = max(1, settings.TRUSTED_PROXY_HOPS)
+            if len(hops) >= depth:
+                return hops[-depth]
+    return request.client.host if request.client else "unknown"
+
+
+async def check_login_rate(request: Request, username: str) -> None:
+    """Límites de login por IP y por usuario.
+
+    Se llama al principio de las rutas de login, antes de buscar el usuario
+    y de bcrypt, así un ataque de credential stuffing se rechaza sin tocar
+    la base ni el pool de hashing.
+    """
+    if not settings.LOGIN_RATE_LIMIT_ENABLED:
+        return
+
+    await rate_limiter.enforce(
+        f"login:ip:{client_ip(request)}",
+        settings.LOGIN_IP_BURST,
+        settings.LOGIN_IP_PER_MINUTE
+    )
+    await rate_limiter.enforce(
+        f"login:user:{username.strip().lower()}",
+        settings.LOGIN_USERNAME_BURST,
+        settings.LOGIN_USERNAME_PER_MINUTE
+    )
+
+
+# Instancia global
+rate_limiter = RateLimiter()
@@ -0,0 +1,333 @@
+# app/core/request_profiler.py - PERFIL BAJO DEMANDA DE UNA REQUEST
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+import asyncio.tasks
+import logging
+import threading
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import fastapi.dependencies.utils
+import fastapi.routing
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from app.core.auth import resolve_user
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.rate_limit import rate_limiter
+from app.core.security import verify_token
+from app.core.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 128
+# Muestras en las que la request no corría en ningún thread: esperando I/O,
+# un lock o un pool propio (bcrypt, imágenes)
+AWAIT_FRAME = "<await>"
+_PREFIXES = sorted({os.getcwd() + os.sep, *(p + os.sep for p in sys.path if p)}, key=len, reverse=True)
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    for prefix in _PREFIXES:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _stack(frame) -> Tuple[str, ...]:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+class RequestSampler:
+    """Profiler por muestreo de una sola request.
+
+    cProfile y pyinstrument solo ven el thread donde se encienden, y la
+    mayoría de las rutas son sync y corren en el threadpool. Este sampler
+    lee sys._current_frames() cada `interval` segundos y se queda con:
+    - el thread del event loop, solo mientras corre una task de la request
+    - los threads del threadpool mientras ejecutan trabajo de la request
+    Así las requests concurrentes no contaminan el perfil.
+    """
+
+    def __init__(self, interval: float, max_seconds: float):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.tasks = set()
+        self.threads = set()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.truncated = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self.started
+
+    def run_watched(self, func, *args, **kwargs):
+        """Ejecutar func (ya en un thread del pool) contando sus muestras"""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self.threads.add(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.threads.discard(thread_id)
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                self.truncated = True
+                return
+
+            frames = sys._current_frames()
+            with self._lock:
+                threads = tuple(self.threads)
+            watched = [frames.get(thread_id) for thread_id in threads]
+            if asyncio.tasks._current_tasks.get(self.loop) in self.tasks:
+                watched.append(frames.get(self.loop_thread))
+
+            recorded = False
+            for frame in watched:
+                if frame is not None:
+                    self.stacks[_stack(frame)] += 1
+                    recorded = True
+            if not recorded:
+                self.stacks[(AWAIT_FRAME,)] += 1
+            self.samples += 1
+
+
+class ProfileResult:
+    """Perfil guardado: pilas agregadas y datos de la request"""
+
+    def __init__(self, method: str, path: str, username: str, status_code: int,
+                 duration: float, sampler: RequestSampler):
+        self.id = uuid.uuid4().hex[:12]
+        self.created_at = datetime.now(timezone.utc)
+        self.method = method
+        self.path = path
+        self.username = username
+        self.status_code = status_code
+        self.duration = duration
+        self.interval = sampler.interval
+        self.samples = sampler.samples
+        self.truncated = sampler.truncated
+        self.stacks = sampler.stacks
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "method": self.method,
+            "path": self.path,
+            "username": self.username,
+            "status_code": self.status_code,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "truncated": self.truncated
+        }
+
+    def collapsed(self) -> str:
+        """Formato "folded" (una pila por línea) para flamegraph.pl o speedscope"""
+        return "\n".join(
+            f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()
+        ) + "\n"
+
+    def text(self, limit: int = 40) -> str:
+        """Funciones con más muestras, inclusivas (con lo que llaman) y propias"""
+        total = sum(self.stacks.values()) or 1
+        inclusive: Counter = Counter()
+        own: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                inclusive[label] += count
+
+        lines = [
+            f"{self.method} {self.path} -> {self.status_code}",
+            f"{self.duration * 1000:.1f} ms, {self.samples} muestras cada {self.interval * 1000:g} ms"
+            + (" (cortado por PROFILING_MAX_SECONDS)" if self.truncated else ""),
+        ]
+        for title, counter in (("Inclusivo", inclusive), ("Propio", own)):
+            lines += ["", f"{title}:", f"{'muestras':>9} {'%':>6}  función"]
+            for label, count in counter.most_common(limit):
+                lines.append(f"{count:>9} {count / total * 100:>5.1f}%  {label}")
+        return "\n".join(lines) + "\n"
+
+
+# Sampler de la request que se está perfilando (se copia a las tasks hijas
+# y a los threads del threadpool)
+active_sampler: ContextVar[Optional[RequestSampler]] = ContextVar("active_sampler", default=None)
+
+
+def profiling_requested(request: Request) -> bool:
+    """Flag de perfilado con un bearer presente: lo único que cuesta en cada request.
+
+    Sin Authorization no puede ser un superusuario, así que el flag de un
+    anónimo no dispara verificación de token ni consultas.
+    """
+    if request.headers.get("authorization", "")[:7].lower() != "bearer ":
+        return False
+    return request.headers.get("x-profile") == "1" or request.query_params.get("_profile") == "1"
+
+
+async def profiling_user(request: Request) -> Optional[str]:
+    """Username si el token es de un superusuario activo; None si no.
+
+    Usa la cache de usuarios y no la BD: el flag lo puede mandar cualquier
+    usuario autenticado. Si el usuario no está en cache (primera request
+    con ese token) no se perfila; la ruta lo cachea y la siguiente sí.
+    Solo con la cache deshabilitada se consulta la BD.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+
+    payload = verify_token(token)
+    if payload is None:
+        return None
+
+    if user_cache.enabled:
+        user = user_cache.get(payload["sub"], payload.get("iat"))
+    else:
+        db = SessionLocal()
+        try:
+            user = await resolve_user(db, payload["sub"], payload.get("iat"))
+        finally:
+            db.close()
+
+    if user is None or not user.is_active or not user.is_superuser:
+        return None
+    return user.username
+
+
+class RequestProfiler:
+    """Perfila requests marcadas por superusuarios y guarda los últimos resultados.
+
+    Pensado para poder dejarlo encendido en producción: el flag se ignora
+    para cualquier otro usuario, cada admin tiene un token bucket propio y
+    se perfila una sola request a la vez por proceso. Los perfiles viven en
+    memoria del worker que atendió la request.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[str, ProfileResult]" = OrderedDict()
+        self._busy = False
+
+    def get(self, profile_id: str) -> Optional[ProfileResult]:
+        return self._profiles.get(profile_id)
+
+    def summaries(self) -> List[Dict]:
+        return [result.summary() for result in reversed(self._profiles.values())]
+
+    def _store(self, result: ProfileResult) -> None:
+        self._profiles[result.id] = result
+        while len(self._profiles) > self.max_entries:
+            self._profiles.popitem(last=False)
+
+    async def profile(self, request: Request, call_next):
+        username = await profiling_user(request)
+        if username is None:
+            return await call_next(request)
+
+        try:
+            await rate_limiter.enforce(
+                f"profile:user:{username}",
+                settings.PROFILING_BURST,
+                settings.PROFILING_PER_MINUTE
+            )
+        except HTTPException as e:
+            # Las HTTPException de una middleware no pasan por los exception handlers
+            return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+
+        if self._busy:
+            return JSONResponse(
+                {"detail": "Ya hay una request en perfilado, intenta nuevamente"},
+                status_code=429,
+                headers={"Retry-After": "1"}
+            )
+
+        self._busy = True
+        sampler = RequestSampler(settings.PROFILING_INTERVAL_MS / 1000, settings.PROFILING_MAX_SECONDS)
+        sampler.tasks.add(asyncio.current_task())
+        token = active_sampler.set(sampler)
+        status_code = 500
+        sampler.start()
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            duration = sampler.stop()
+            active_sampler.reset(token)
+            self._busy = False
+            result = ProfileResult(request.method, request.url.path, username, status_code, duration, sampler)
+            self._store(result)
+            logger.info(
+                "🔬 Profiled %s %s for %s: %.1f ms, %d samples (id=%s)",
+                result.method, result.path, username, duration * 1000, result.samples, result.id
+            )
+
+        response.headers["X-Profile-Id"] = result.id
+        return response
+
+
+def install_profiling_hooks() -> None:
+    """Enganchar FastAPI para seguir el trabajo de la request perfilada.
+
+    - solve_dependencies corre en la task que atiende la ruta (BaseHTTPMiddleware
+      la crea aparte de la task de la middleware): se registra esa task
+    - run_in_threadpool ejecuta rutas sync, serialización y dependencias sync:
+      se registra el thread mientras dura la llamada
+    """
+    original_solve = fastapi.routing.solve_dependencies
+    if getattr(original_solve, "_profiled", False):
+        return
+
+    async def solve_dependencies(*args, **kwargs):
+        sampler = active_sampler.get()
+        if sampler is not None:
+            sampler.tasks.add(asyncio.current_task())
+        return await original_solve(*args, **kwargs)
+
+    solve_dependencies._profiled = True
+    fastapi.routing.solve_dependencies = solve_dependencies
+
+    for module in (fastapi.routing, fastapi.dependencies.utils):
+        module.run_in_threadpool = _watched_run_in_threadpool(module.run_in_threadpool)
+
+
+def _watched_run_in_threadpool(original):
+    async def run_in_threadpool(func, *args, **kwargs):
+        sampler = active_sampler.get()
+        if sampler is None:
+            return await original(func, *args, **kwargs)
+        return await original(sampler.run_watched, func, *args, **kwargs)
+
+    return run_in_threadpool
+
+
+# Instancia global
+request_profiler = RequestProfiler(settings.PROFILING_MAX_STORED)
@@ -0,0 +1,153 @@
+# app/core/revocation.py - REVOCACIÓN DE TOKENS POR JTI
+
+import time
+import heapq
+import logging
+import threading
+from typing import Dict, List, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryRevocationStore:
+    """jti revocados en un dict, con un heap ordenado por exp para limpiarlos.
+
+    is_revoked es un lookup en el dict: O(1) y sin asignar memoria, se puede
+    llamar en cada request. Un jti solo hace falta hasta el exp de su token;
+    después el propio JWT ya es inválido, así que se descarta.
+    """
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        pass
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def revoke(self, jti: str, exp: float) -> bool:
+        """Revocar; True solo si el jti no estaba revocado (chequeo e inserción atómicos)"""
+        with self._lock:
+            newly = jti not in self._revoked
+            if newly:
+                self._revoked[jti] = exp
+                heapq.heappush(self._expiry_heap, (exp, jti))
+            self._purge_locked(time.time())
+            return newly
+
+    def purge(self) -> int:
+        with self._lock:
+            return self._purge_locked(time.time())
+
+    def _purge_locked(self, now: float) -> int:
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry_heap)
+            self._revoked.pop(jti, None)
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {"revoked": len(self._revoked)}
+
+
+class RedisRevocationStore:
+    """Revocación compartida entre procesos vía Redis.
+
+    Cada revocación se guarda como clave con TTL hasta el exp del token y se
+    publica por pub/sub; cada proceso mantiene un espejo local en memoria,
+    así el chequeo por request nunca va a la red.
+
+    La revocación usa SET NX, así entre procesos solo uno la "gana" (es lo
+    que hace de un solo uso al refresh token). Si Redis no responde se
+    revoca solo en el espejo local: protege a este proceso y no tira la
+    request, pero los demás no se enteran hasta que Redis vuelva.
+    """
+
+    KEY_PREFIX = "auth:revoked:"
+    CHANNEL = "auth:revocations"
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=2, socket_timeout=2)
+        self.local = InMemoryRevocationStore()
+        self._listener = None
+
+    def start(self) -> None:
+        """Cargar las revocaciones vigentes y escuchar las nuevas"""
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen, name="revocation-listener", daemon=True)
+        self._listener.start()
+
+    def _load_snapshot(self) -> None:
+        now = time.time()
+        count = 0
+        for key in self.client.scan_iter(match=f"{self.KEY_PREFIX}*", count=1000):
+            ttl = self.client.ttl(key)
+            if ttl and ttl > 0:
+                jti = key.decode()[len(self.KEY_PREFIX):]
+                self.local.revoke(jti, now + ttl)
+                count += 1
+        logger.info(f"🔒 Loaded {count} revoked tokens from Redis")
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                # Snapshot después de suscribirse, para no perder revocaciones intermedias
+                self._load_snapshot()
+                for message in pubsub.listen():
+                    jti, _, exp = message["data"].decode().partition(" ")
+                    self.local.revoke(jti, float(exp))
+            except Exception as e:
+                logger.error(f"❌ Revocation listener error: {e}, reconnecting")
+                time.sleep(5)
+
+    def is_revoked(self, jti: str) -> bool:
+        return self.local.is_revoked(jti)
+
+    def revoke(self, jti: str, exp: float) -> bool:
+        """Revocar; True solo si ningún proceso lo había revocado antes"""
+        import redis
+
+        ttl = int(exp - time.time()) + 1
+        if ttl <= 0:
+            return False
+        if self.local.is_revoked(jti):
+            return False
+
+        try:
+            newly = bool(self.client.set(f"{self.KEY_PREFIX}{jti}", 1, nx=True, ex=ttl))
+            if newly:
+                self.client.publish(self.CHANNEL, f"{jti} {exp}")
+        except redis.RedisError as e:
+            logger.error(f"❌ Redis unavailable revoking token, revoked locally only: {e}")
+            return self.local.revoke(jti, exp)
+
+        self.local.revoke(jti, exp)
+        return newly
+
+    def purge(self) -> int:
+        return self.local.purge()
+
+    def stats(self) -> Dict[str, int]:
+        return self.local.stats()
+
+
+def get_revocation_store():
+    """Crear el store configurado en REVOCATION_BACKEND"""
+    if settings.REVOCATION_BACKEND == "redis":
+        logger.info("🔒 Using Redis token revocation")
+        return RedisRevocationStore(settings.REDIS_URL)
+    return InMemoryRevocationStore()
+
+
+# Instancia global
+revocation_store = get_revocation_store()
@@ -1,13 +1,79 @@
 # app/core/security.py - FUNCIONES DE SEGURIDAD CORREGIDAS
 
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Union, Any, Dict
-from jose import JWTError, jwt
+from typing import Optional, Union, Any, Dict, Tuple
+from jose import JWTError, jwk, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.revocation import revocation_store
 
-# Configurar contexto de passwords
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Configurar contexto de passwords (hashes con otro costo se actualizan al hacer login)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+# Clave construida una sola vez (jose la parsea en cada llamada si se pasa el string)
+JWT_KEY = jwk.construct(settings.SECRET_KEY, settings.ALGORITHM)
+
+
+class VerifiedTokenCache:
+    """LRU acotado de payloads ya verificados, válido hasta el exp de cada token.
+
+    La clave es el SHA-256 del token, así no se guardan tokens en memoria.
+    Los payloads devueltos se comparten entre requests: son de solo lectura.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.time():
+                del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, digest: bytes, payload: Dict[str, Any]) -> None:
+        exp = payload.get("exp")
+        if self.max_entries <= 0 or not exp:
+            return
+        with self._lock:
+            self._entries[digest] = (float(exp), payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = VerifiedTokenCache(max_entries=settings.TOKEN_CACHE_MAX_ENTRIES)
 
 def create_access_token(
     subject: Union[str, Any], 
@@ -26,6 +92,7 @@ def create_access_token(
         "exp": expire,
         "sub": str(subject),
         "iat": datetime.utcnow(),
+        "jti": uuid.uuid4().hex,
         "type": "access_token"
     }
     
@@ -33,13 +100,13 @@ def create_access_token(
     try:
         encoded_jwt = jwt.encode(
             to_encode, 
-            settings.SECRET_KEY, 
+            JWT_KEY, 
             algorithm=settings.ALGORITHM
         )
-        print(f"🔐 Token creado para: {subject}")
+        logger.debug("🔐 Token creado para: %s", subject)
         return encoded_jwt
     except Exception as e:
-        print(f"❌ Error creando token: {e}")
+        logger.error(f"❌ Error creando token: {e}")
         raise
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -47,7 +114,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
         return pwd_context.verify(plain_password, hashed_password)
     except Exception as e:
-        print(f"❌ Error verificando password: {e}")
+        logger.error(f"❌ Error verificando password: {e}")
         return False
 
 def get_password_hash(password: str) -> str:
@@ -55,74 +122,92 @@ def get_password_hash(password: str) -> str:
     try:
         return pwd_context.hash(password)
     except Exception as e:
-        print(f"❌ Error hasheando password: {e}")
+        logger.error(f"❌ Error hasheando password: {e}")
         raise
 
-def verify_token(token: str) -> Optional[Dict[str, Any]]:
-    """Verificar y decodificar token JWT"""
-    try:
-        payload = jwt.decode(
-            token, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
-        )
-        
-        # Verificar que el token no haya expirado
-        exp = payload.get("exp")
-        if exp and datetime.utcnow() > datetime.fromtimestamp(exp):
-            print(f"⏰ Token expirado")
+def verify_token(token: str, token_type: str = "access_token") -> Optional[Dict[str, Any]]:
+    """Verificar y decodificar token JWT (firma y exp los valida jose).
+    
+    Solo acepta tokens del tipo pedido (un refresh token no sirve como
+    token de acceso) y que no hayan sido revocados.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    
+    payload = token_cache.get(digest)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, JWT_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError as e:
+            logger.debug("❌ Error JWT: %s", e)
+            return None
+        except Exception as e:
+            logger.warning(f"❌ Error verificando token: {e}")
             return None
         
         # Verificar que tenga la información necesaria
-        username = payload.get("sub")
-        if not username:
-            print(f"❌ Token sin información de usuario")
+        if not payload.get("sub"):
+            logger.debug("❌ Token sin información de usuario")
             return None
         
-        print(f"✅ Token válido para: {username}")
-        return payload
-        
-    except JWTError as e:
-        print(f"❌ Error JWT: {e}")
+        token_cache.set(digest, payload)
+    
+    if payload.get("type") != token_type:
         return None
-    except Exception as e:
-        print(f"❌ Error verificando token: {e}")
+    
+    # La revocación se revisa también en aciertos de cache
+    jti = payload.get("jti")
+    if jti is not None and revocation_store.is_revoked(jti):
         return None
+    
+    return payload
+
+def revoke_token(payload: Dict[str, Any]) -> bool:
+    """Revocar un token ya verificado hasta su expiración.
+
+    Devuelve True solo si esta llamada lo revocó: False si ya estaba revocado
+    (p. ej. otro /refresh concurrente con el mismo token) o no tiene jti.
+    """
+    jti = payload.get("jti")
+    exp = payload.get("exp")
+    if not jti or not exp:
+        return False
+    return revocation_store.revoke(jti, float(exp))
 
 def decode_token(token: str) -> Optional[Dict[str, Any]]:
     """Decodificar token sin verificar expiración (para debugging)"""
     try:
         payload = jwt.decode(
             token, 
-            settings.SECRET_KEY, 
+            JWT_KEY, 
             algorithms=[settings.ALGORITHM],
             options={"verify_exp": False}
         )
         return payload
     except Exception as e:
-        print(f"❌ Error decodificando token: {e}")
+        logger.error(f"❌ Error decodificando token: {e}")
         return None
 
 def create_refresh_token(subject: Union[str, Any]) -> str:
-    """Crear token de refresh"""
-    expire = datetime.utcnow() + timedelta(days=7)  # 7 días para refresh
+    """Crear token de refresh (de un solo uso: se rota en cada /refresh)"""
+    expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     
     to_encode = {
         "exp": expire,
         "sub": str(subject),
         "iat": datetime.utcnow(),
+        "jti": uuid.uuid4().hex,
         "type": "refresh_token"
     }
     
     try:
         encoded_jwt = jwt.encode(
             to_encode, 
-            settings.SECRET_KEY, 
+            JWT_KEY, 
             algorithm=settings.ALGORITHM
         )
         return encoded_jwt
     except Exception as e:
-        print(f"❌ Error creando refresh token: {e}")
+        logger.error(f"❌ Error creando refresh token: {e}")
         raise
 
 def is_token_expired(token: str) -> bool:
@@ -0,0 +1,137 @@
+# app/core/sql_profiler.py - PERFIL DE SQL POR REQUEST
+
+import re
+import time
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+import fastapi.routing
+from sqlalchemy import event
+from app.core.config import settings
+from app.core.database import engine
+from app.core.metrics import DB_QUERY_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Listas IN expandidas ((?, ?, ?) / (%(p_1)s, ...)) cuentan como la misma forma
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\([^)]*\)s|%s|:\w+)\s*,)+\s*(?:\?|%\([^)]*\)s|%s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def profiler_enabled() -> bool:
+    """SQL_PROFILER_ENABLED explícito, o encendido solo en development"""
+    if settings.SQL_PROFILER_ENABLED is not None:
+        return settings.SQL_PROFILER_ENABLED
+    return settings.ENVIRONMENT == "development"
+
+
+def log_params_enabled() -> bool:
+    """SQL_LOG_PARAMS explícito, o solo en development (los valores pueden ser datos personales)"""
+    if settings.SQL_LOG_PARAMS is not None:
+        return settings.SQL_LOG_PARAMS
+    return settings.ENVIRONMENT == "development"
+
+
+class RequestProfile:
+    """Sentencias, tiempo de SQL y de serialización de la request en curso.
+
+    `shapes` solo se llena con el profiler encendido: cuenta cuántas veces
+    se ejecutó cada forma de sentencia para detectar N+1.
+    """
+
+    __slots__ = ("queries", "seconds", "serialize_seconds", "shapes")
+
+    def __init__(self, track_shapes: bool = False):
+        self.queries = 0
+        self.seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.shapes: Optional[Counter] = Counter() if track_shapes else None
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """Formas de sentencia ejecutadas `threshold` veces o más (probable N+1)"""
+        if not self.shapes:
+            return []
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def server_timing(self, total_seconds: float) -> str:
+        """Valor del header Server-Timing (duraciones en ms)"""
+        return ", ".join([
+            f'db;dur={self.seconds * 1000:.1f};desc="{self.queries} queries"',
+            f"serialize;dur={self.serialize_seconds * 1000:.1f}",
+            f"app;dur={total_seconds * 1000:.1f}"
+        ])
+
+
+# La middleware crea un RequestProfile por request; el contexto se copia a
+# los threads del threadpool, así las rutas sync también lo ven
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("(...)", _WHITESPACE.sub(" ", statement)).strip()
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_QUERY_DURATION.observe(elapsed)
+
+    profile = current_profile.get()
+    if profile is not None:
+        profile.queries += 1
+        profile.seconds += elapsed
+        if profile.shapes is not None:
+            profile.shapes[statement_shape(statement)] += 1
+
+    if settings.SQL_SLOW_QUERY_MS > 0 and elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        if log_params_enabled():
+            logger.warning(
+                "🐢 Slow query (%.1f ms): %s | params=%.500r",
+                elapsed * 1000, _WHITESPACE.sub(" ", statement), parameters
+            )
+        else:
+            logger.warning("🐢 Slow query (%.1f ms): %s", elapsed * 1000, statement_shape(statement))
+
+
+@event.listens_for(engine, "handle_error")
+def _failed_cursor_execute(exception_context):
+    # Sin after_cursor_execute el inicio quedaría en la conexión (del pool) para siempre
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def report_repeated_statements(profile: RequestProfile, method: str, route: str) -> None:
+    """Loguear las sentencias repetidas de una request como sospecha de N+1"""
+    for shape, count in profile.repeated_statements(settings.SQL_N_PLUS_ONE_THRESHOLD):
+        logger.warning("🔁 Possible N+1 in %s %s: %dx %.300s", method, route, count, shape)
+
+
+def install_serialize_timing() -> None:
+    """Medir serialize_response de FastAPI (validación del response_model).
+
+    Incluye las cargas lazy de relaciones que dispara la serialización, que
+    suele ser justamente donde aparece el N+1.
+    """
+    original = fastapi.routing.serialize_response
+    if getattr(original, "_profiled", False):
+        return
+
+    async def serialize_response(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return await original(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await original(*args, **kwargs)
+        finally:
+            profile.serialize_seconds += time.perf_counter() - started
+
+    serialize_response._profiled = True
+    fastapi.routing.serialize_response = serialize_response
@@ -0,0 +1,454 @@
+# app/core/tracing.py - TRAZAS COMPATIBLES CON OPENTELEMETRY (OTLP/JSON)
+
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import inspect
+import logging
+import functools
+import threading
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tracing encendido si hay exporter; se decide al arrancar
+TRACING_ENABLED = bool(settings.TRACING_EXPORTER)
+
+# SpanKind y StatusCode de OTLP
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL_SECONDS = 2
+MAX_QUEUED_SPANS = 20_000
+
+
+def _now_ns() -> int:
+    return time.time_ns()
+
+
+class Span:
+    """Un span en curso o terminado, con los campos de OTLP"""
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_span_id", "name", "kind", "attributes",
+        "events", "status_code", "status_message", "start_ns", "end_ns"
+    )
+
+    sampled = True
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: str = "",
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.events: List[Dict] = []
+        self.status_code = 0
+        self.status_message = ""
+        self.start_ns = _now_ns()
+        self.end_ns = 0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def update_name(self, name: str) -> None:
+        self.name = name
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = str(exc)[:500]
+        self.events.append({
+            "name": "exception",
+            "time_ns": _now_ns(),
+            "attributes": {"exception.type": type(exc).__name__, "exception.message": str(exc)[:500]}
+        })
+
+    def end(self) -> None:
+        self.end_ns = _now_ns()
+        span_processor.on_end(self)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class NonRecordingSpan:
+    """Span de una request no muestreada: lleva el contexto pero no se exporta"""
+
+    sampled = False
+
+    def __init__(self, trace_id: str = "", span_id: str = ""):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def update_name(self, name: str) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+
+NON_RECORDING_SPAN = NonRecordingSpan()
+
+# Span activo; se copia a las tasks hijas y a los threads del threadpool
+current_span: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent_span_id, sampled) del header W3C traceparent, o None"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        trace_id, parent_id, flags = int(parts[1], 16), int(parts[2], 16), int(parts[3], 16)
+    except ValueError:
+        return None
+    if trace_id == 0 or parent_id == 0:
+        return None
+    return parts[1].lower(), parts[2].lower(), bool(flags & 1)
+
+
+def should_sample(trace_id: str) -> bool:
+    """Muestreo por proporción sobre el trace id (como TraceIdRatioBased)"""
+    ratio = settings.TRACING_SAMPLE_RATIO
+    if ratio >= 1:
+        return True
+    return int(trace_id[16:], 16) < ratio * (1 << 64)
+
+
+@contextmanager
+def server_span(method: str, path: str, traceparent: Optional[str] = None):
+    """Span raíz de una request HTTP.
+
+    El traceparent entrante solo se respeta (trace id y decisión de
+    muestreo) con TRACING_TRUST_TRACEPARENT, es decir, cuando lo pone un
+    proxy propio que descarta el del cliente; si no, cualquiera podría forzar
+    el muestreo de todas sus requests. En ese caso se empieza una traza
+    nueva y decide la proporción TRACING_SAMPLE_RATIO.
+    """
+    if not TRACING_ENABLED:
+        yield NON_RECORDING_SPAN
+        return
+
+    parent = parse_traceparent(traceparent) if settings.TRACING_TRUST_TRACEPARENT else None
+    if parent is not None:
+        trace_id, parent_span_id, sampled = parent
+    else:
+        trace_id, parent_span_id = f"{random.getrandbits(128):032x}", ""
+        sampled = should_sample(trace_id)
+
+    if not sampled:
+        token = current_span.set(NonRecordingSpan(trace_id, parent_span_id))
+        try:
+            yield NON_RECORDING_SPAN
+        finally:
+            current_span.reset(token)
+        return
+
+    span = Span(method, trace_id, parent_span_id, SPAN_KIND_SERVER, {
+        "http.request.method": method,
+        "url.path": path,
+    })
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        current_span.reset(token)
+        span.end()
+
+
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+    """Span hijo del activo, sin activarlo (ej: sentencias SQL). None si no se traza"""
+    parent = current_span.get()
+    if parent is None or not parent.sampled:
+        return None
+    return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+    """Span hijo del activo. Fuera de una request trazada no registra nada"""
+    child = start_span(name, kind, attributes)
+    if child is None:
+        yield NON_RECORDING_SPAN
+        return
+
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_exception(e)
+        raise
+    finally:
+        current_span.reset(token)
+        child.end()
+
+
+def traced(name: Optional[str] = None):
+    """Decorador: un span por llamada (funciones sync o async).
+
+    Con el tracing apagado devuelve la función sin envolver. functools.wraps
+    conserva la firma, así sirve también para dependencias de FastAPI.
+    """
+    def decorator(func):
+        if not TRACING_ENABLED:
+            return func
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# ===== EXPORTACIÓN =====
+
+def _attribute_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attributes: Dict[str, Any]) -> List[Dict]:
+    return [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items()]
+
+
+def _encode_span(span: Span) -> Dict:
+    encoded = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _attributes(span.attributes),
+        "status": {"code": span.status_code},
+    }
+    if span.parent_span_id:
+        encoded["parentSpanId"] = span.parent_span_id
+    if span.status_message:
+        encoded["status"]["message"] = span.status_message
+    if span.events:
+        encoded["events"] = [
+            {"name": event["name"], "timeUnixNano": str(event["time_ns"]), "attributes": _attributes(event["attributes"])}
+            for event in span.events
+        ]
+    return encoded
+
+
+def encode_otlp(spans: List[Span]) -> Dict:
+    """Lote de spans como ExportTraceServiceRequest de OTLP/JSON"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _attributes({
+                "service.name": settings.TRACING_SERVICE_NAME,
+                "service.version": settings.VERSION,
+                "deployment.environment": settings.ENVIRONMENT,
+                "process.pid": os.getpid(),
+            })},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_encode_span(span) for span in spans],
+            }],
+        }]
+    }
+
+
+class FileSpanExporter:
+    """Un lote OTLP/JSON por línea (JSON Lines), apto para el filelog del collector"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Span]) -> None:
+        line = json.dumps(encode_otlp(spans), separators=(",", ":"))
+        with open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """POST OTLP/JSON a {endpoint}/v1/traces (collector o un stand-in)"""
+
+    def __init__(self, endpoint: str, timeout: float = 5):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(encode_otlp(spans)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class BatchSpanProcessor:
+    """Encola los spans terminados y los exporta por lotes desde un thread.
+
+    El request nunca espera al exporter: si la cola se llena (collector
+    caído o lento) los spans se descartan y se cuentan.
+    """
+
+    def __init__(self):
+        self.exporter = None
+        self.dropped = 0
+        self.exported = 0
+        self.failed = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=MAX_QUEUED_SPANS)
+        self._thread = None
+
+    def start(self, exporter) -> None:
+        if self._thread is not None:
+            return
+        self.exporter = exporter
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def _run(self):
+        batch: List[Span] = []
+        deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+        while True:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                span = False
+
+            if span is None:
+                self._export(batch)
+                return
+            if span:
+                batch.append(span)
+            if len(batch) >= EXPORT_BATCH_SIZE or time.monotonic() >= deadline:
+                self._export(batch)
+                batch = []
+                deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+
+    def _export(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning(f"⚠️ Span export failed ({len(batch)} spans): {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": TRACING_ENABLED,
+            "exporter": settings.TRACING_EXPORTER,
+            "sample_ratio": settings.TRACING_SAMPLE_RATIO,
+            "trust_traceparent": settings.TRACING_TRUST_TRACEPARENT,
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+def setup_tracing() -> None:
+    """Arrancar el exporter configurado y trazar las sentencias SQL"""
+    if not TRACING_ENABLED:
+        return
+
+    if settings.TRACING_EXPORTER == "file":
+        exporter = FileSpanExporter(settings.TRACING_FILE)
+    elif settings.TRACING_EXPORTER == "otlp":
+        exporter = OTLPHttpSpanExporter(settings.TRACING_OTLP_ENDPOINT)
+    else:
+        raise ValueError(f"TRACING_EXPORTER inválido: {settings.TRACING_EXPORTER} (file u otlp)")
+
+    span_processor.start(exporter)
+    _instrument_sqlalchemy()
+    logger.info(
+        f"🛰️ Tracing enabled: exporter={settings.TRACING_EXPORTER}, "
+        f"sample_ratio={settings.TRACING_SAMPLE_RATIO}"
+    )
+
+
+def _instrument_sqlalchemy() -> None:
+    from sqlalchemy import event
+    from app.core.database import engine
+
+    system = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_sql_span(conn, cursor, statement, parameters, context, executemany):
+        sql_span = start_span(statement.split(None, 1)[0].upper(), SPAN_KIND_CLIENT, {
+            "db.system": system,
+            "db.statement": statement[:1000],
+        })
+        conn.info.setdefault("trace_spans", []).append(sql_span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_sql_span(conn, cursor, statement, parameters, context, executemany):
+        sql_span = conn.info["trace_spans"].pop()
+        if sql_span is not None:
+            if executemany:
+                sql_span.set_attribute("db.executemany", True)
+            sql_span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _fail_sql_span(exception_context):
+        spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+        if spans:
+            sql_span = spans.pop()
+            if sql_span is not None:
+                sql_span.record_exception(exception_context.original_exception)
+                sql_span.end()
+
+
+# Instancia global
+span_processor = BatchSpanProcessor()
@@ -0,0 +1,105 @@
+# app/core/user_cache.py - CACHE DE USUARIOS AUTENTICADOS
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event, inspect
+from app.core.config import settings
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, Optional[int]]
+
+
+class UserCache:
+    """Cache en memoria (por proceso) de los usuarios resueltos desde un token.
+
+    La clave es (username, iat): un login nuevo genera un token con otro iat
+    y por lo tanto una entrada nueva. Se guardan solo los valores de las
+    columnas y en cada acierto se arma un User transitorio (no ligado a una
+    sesión), así no hay lazy loads ni expiraciones después de un commit.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @staticmethod
+    def snapshot(user: User) -> Dict:
+        return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+    def get(self, username: str, iat: Optional[int]) -> Optional[User]:
+        if not self.enabled:
+            return None
+
+        key = (username, iat)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            values = entry[1]
+
+        return User(**values)
+
+    def set(self, username: str, iat: Optional[int], user: User) -> User:
+        """Guardar y devolver la copia transitoria del usuario"""
+        values = self.snapshot(user)
+        if self.enabled:
+            with self._lock:
+                self._entries[(username, iat)] = (time.monotonic() + self.ttl_seconds, values)
+                self._entries.move_to_end((username, iat))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return User(**values)
+
+    def invalidate(self, username: str) -> None:
+        """Eliminar todas las entradas de un usuario (todos sus tokens)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == username]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Instancia global
+user_cache = UserCache(
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    max_entries=settings.USER_CACHE_MAX_ENTRIES
+)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    """Cambios por el ORM (desactivar, permisos, password) invalidan la cache.
+
+    Los UPDATE masivos (query.update) no disparan este evento; para esos
+    casos el límite es el TTL.
+    """
+    user_cache.invalidate(target.username)
+
+    # Si cambió el username, invalidar también el anterior
+    for old_username in inspect(target).attrs.username.history.deleted or ():
+        user_cache.invalidate(old_username)
@@ -0,0 +1,22 @@
+import json
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.models.job_state import JobState
+
+class JobStateCRUD:
+    def load(self, db: Session, name: str) -> Optional[dict]:
+        """Estado guardado de la tarea, o None si nunca corrió"""
+        row = db.get(JobState, name)
+        return json.loads(row.data) if row is not None else None
+    
+    def save(self, db: Session, name: str, state: dict) -> None:
+        """Guardar (insertar o reemplazar) y commitear el estado de la tarea"""
+        row = db.get(JobState, name)
+        if row is None:
+            db.add(JobState(name=name, data=json.dumps(state)))
+        else:
+            row.data = json.dumps(state)
+        db.commit()
+
+# Instancia global del CRUD
+job_state_crud = JobStateCRUD()
@@ -3,13 +3,16 @@ from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
 from app.models.vehicle import Vehicle, VehicleImage
 from app.schemas.vehicle import VehicleCreate, VehicleUpdate
+from app.core.tracing import traced
 import os
 
 class VehicleCRUD:
+    @traced()
     def get_vehicle(self, db: Session, vehicle_id: int) -> Optional[Vehicle]:
         """Obtener un vehículo por ID"""
         return db.query(Vehicle).filter(Vehicle.id == vehicle_id, Vehicle.is_active == True).first()
     
+    @traced()
     def get_vehicles(
         self, 
         db: Session, 
@@ -65,6 +68,7 @@ class VehicleCRUD:
         
         return query.offset(skip).limit(limit).all()
     
+    @traced()
     def get_vehicles_count(
         self,
         db: Session,
@@ -117,6 +121,7 @@ class VehicleCRUD:
         
         return query.count()
     
+    @traced()
     def create_vehicle(self, db: Session, vehicle: VehicleCreate, created_by: int) -> Vehicle:
         """Crear un nuevo vehículo"""
         db_vehicle = Vehicle(
@@ -127,6 +132,7 @@ class VehicleCRUD:
         db.commit()
         db.refresh(db_vehicle)
         return db_vehicle
+    @traced()
     def update_vehicle(self, db: Session, vehicle_id: int, vehicle: VehicleUpdate) -> Optional[Vehicle]:
         """Actualizar un vehículo"""
         db_vehicle = self.get_vehicle(db, vehicle_id)
@@ -141,6 +147,7 @@ class VehicleCRUD:
         db.refresh(db_vehicle)
         return db_vehicle
     
+    @traced()
     def update_vehicle(self, db: Session, vehicle_id: int, vehicle) -> Optional[Vehicle]:
         """Actualizar un vehículo - versión mejorada que acepta dict o VehicleUpdate"""
         db_vehicle = self.get_vehicle(db, vehicle_id)
@@ -161,6 +168,7 @@ class VehicleCRUD:
         db.refresh(db_vehicle)
         return db_vehicle
    
+    @traced()
     def delete_vehicle(self, db: Session, vehicle_id: int) -> bool:
         """Eliminar un vehículo (soft delete)"""
         db_vehicle = self.get_vehicle(db, vehicle_id)
@@ -171,6 +179,7 @@ class VehicleCRUD:
         db.commit()
         return True
     
+    @traced()
     def get_featured_vehicles(self, db: Session, limit: int = 4) -> List[Vehicle]:
         """Obtener vehículos destacados"""
         return db.query(Vehicle).filter(
@@ -178,6 +187,7 @@ class VehicleCRUD:
             Vehicle.is_featured == True
         ).limit(limit).all()
     
+    @traced()
     def get_vehicle_stats(self, db: Session) -> dict:
         """Obtener estadísticas de vehículos"""
         total = db.query(Vehicle).filter(Vehicle.is_active == True).count()
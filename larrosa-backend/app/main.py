@@ -1,18 +1,50 @@
 # app/main.py - VERSIÓN CORREGIDA PARA SERVIR IMÁGENES
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 from app.core.config import settings
-from app.api.v1 import auth, vehicles
+from app.core.logging import setup_logging
+
+# Configurar logging antes de importar el resto (algunos módulos loguean al importarse)
+setup_logging()
+
+from app.api.v1 import auth, vehicles, admin
+from app.core.metrics import (
+    HTTP_IN_PROGRESS, HTTP_REQUESTS, HTTP_REQUEST_DURATION, DB_QUERIES_PER_REQUEST,
+    DB_TIME_PER_REQUEST, match_route_label, metrics_access_allowed, render_metrics, route_label
+)
+from app.core.sql_profiler import (
+    RequestProfile, current_profile, install_serialize_timing, profiler_enabled,
+    report_repeated_statements
+)
+from app.core.loop_monitor import loop_monitor
+from app.core.memory_profiler import memory_profiler
+from app.core.request_profiler import install_profiling_hooks, profiling_requested, request_profiler
+from app.core.revocation import revocation_store
+from app.core.tracing import server_span, setup_tracing
+from app.services.storage_reconciler import storage_gc_loop
+from app.utils.file_serving import resolve_upload_path, serve_file
+from app.services.image_service import image_service
 import os
+import time
+import asyncio
 import logging
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Perfil de SQL por request (Server-Timing y detección de N+1)
+SQL_PROFILER_ENABLED = profiler_enabled()
+if SQL_PROFILER_ENABLED:
+    install_serialize_timing()
+
+# Trazas OpenTelemetry (exporter a archivo u OTLP)
+setup_tracing()
+
+# Perfil bajo demanda de requests marcadas por superusuarios
+if settings.PROFILING_ENABLED:
+    install_profiling_hooks()
+
 # Crear la aplicación FastAPI
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -71,45 +103,49 @@ else:
     logger.error("❌ Static directory not found!")
 
 # RUTA PERSONALIZADA PARA SERVIR IMÁGENES
+IMAGES_ROOT = os.path.join(settings.UPLOAD_DIR, "vehicles")
+
+# /media y /uploads se mantienen por compatibilidad, sin re-entrar al handler
 @app.get("/images/{file_path:path}")
-async def serve_images(file_path: str):
-    """Servir imágenes con manejo de errores mejorado"""
-    
-    # Construir la ruta completa del archivo
-    full_path = os.path.join("static", "uploads", "vehicles", file_path)
-    
-    logger.info(f"🖼️ Serving image: {full_path}")
-    
-    # Verificar que el archivo existe y es un archivo
-    if not os.path.exists(full_path):
-        logger.error(f"❌ File not found: {full_path}")
-        raise HTTPException(status_code=404, detail="Image not found")
-    
-    if not os.path.isfile(full_path):
-        logger.error(f"❌ Path is not a file: {full_path}")
-        raise HTTPException(status_code=404, detail="Invalid file path")
-    
-    # Servir el archivo
-    return FileResponse(
-        full_path,
-        media_type="image/jpeg",  # Ajustar según el tipo de archivo
-        headers={"Cache-Control": "max-age=86400"}  # Cache por 24 horas
-    )
-
-# RUTA ALTERNATIVA PARA COMPATIBILIDAD
 @app.get("/media/{file_path:path}")
-async def serve_media(file_path: str):
-    """Ruta alternativa para servir medios"""
-    return await serve_images(file_path)
-
 @app.get("/uploads/{file_path:path}")
-async def serve_uploads(file_path: str):
-    """Ruta alternativa para uploads"""
-    return await serve_images(file_path)
+async def serve_images(file_path: str, request: Request):
+    """Servir imágenes con MIME correcto, ETag/Last-Modified, Range y cache inmutable"""
+    candidates = image_service.resolve_image_keys(file_path)
+    
+    for i, key in enumerate(candidates):
+        # Resolver contra vehicles/ para no exponer otras claves del storage
+        full_path = resolve_upload_path(IMAGES_ROOT, key[len("vehicles/"):])
+        if full_path is None:
+            raise HTTPException(status_code=404, detail="Invalid file path")
+        
+        try:
+            logger.debug("🖼️ Serving image: %s", full_path)
+            return serve_file(request, full_path)
+        except HTTPException as e:
+            # Probar el layout plano si el archivo todavía no se migró
+            if e.status_code != 404 or i == len(candidates) - 1:
+                raise
 
 # INCLUIR LAS RUTAS DE LA API
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(vehicles.router, prefix="/api/v1/vehicles", tags=["vehicles"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
+
+# Tareas periódicas
+@app.on_event("startup")
+async def start_background_jobs():
+    # Con Redis: cargar revocaciones vigentes y escuchar las nuevas
+    revocation_store.start()
+    
+    if settings.STORAGE_GC_INTERVAL_MINUTES > 0:
+        app.state.storage_gc_task = asyncio.create_task(storage_gc_loop())
+    
+    if settings.MEMORY_SAMPLE_INTERVAL_SECONDS > 0:
+        app.state.memory_sample_task = asyncio.create_task(memory_profiler.sample_loop())
+    
+    if settings.EVENT_LOOP_MONITOR_ENABLED:
+        app.state.loop_monitor_task = asyncio.create_task(loop_monitor.run())
 
 # Rutas básicas
 @app.get("/")
@@ -138,46 +174,83 @@ async def health_check():
         }
     }
 
-# RUTA DE DEBUG PARA LISTAR ARCHIVOS
-@app.get("/debug/files")
-async def debug_files():
-    """Listar archivos en el directorio de uploads para debugging"""
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Métricas en formato Prometheus (token o IP permitida, ver METRICS_TOKEN)"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not metrics_access_allowed(request):
+        raise HTTPException(
+            status_code=401,
+            detail="No autorizado",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    body, content_type = render_metrics()
+    return Response(content=body, headers={"Content-Type": content_type})
+
+async def observe_request(request, call_next):
+    """Métricas por ruta, perfil de SQL y Server-Timing de una request"""
+    if not settings.METRICS_ENABLED and not SQL_PROFILER_ENABLED:
+        return await call_next(request)
+    
+    method = request.method
+    profile = RequestProfile(track_shapes=SQL_PROFILER_ENABLED)
+    profile_token = current_profile.set(profile)
+    if settings.METRICS_ENABLED:
+        # La ruta se resuelve antes de call_next: el gauge sube y baja con la misma etiqueta
+        in_progress = HTTP_IN_PROGRESS.labels(method, match_route_label(app.router.routes, request.scope))
+        in_progress.inc()
+    started = time.perf_counter()
+    status_code = 500
+    
     try:
-        uploads_dir = "static/uploads/vehicles"
-        if not os.path.exists(uploads_dir):
-            return {"error": "Uploads directory not found", "path": uploads_dir}
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        current_profile.reset(profile_token)
+        route = route_label(request.scope)
         
-        files = []
-        for file in os.listdir(uploads_dir):
-            file_path = os.path.join(uploads_dir, file)
-            if os.path.isfile(file_path):
-                files.append({
-                    "name": file,
-                    "path": file_path,
-                    "size": os.path.getsize(file_path),
-                    "url": f"/images/{file}"
-                })
+        if settings.METRICS_ENABLED:
+            in_progress.dec()
+            HTTP_REQUESTS.labels(method, route, status_code).inc()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(profile.queries)
+            DB_TIME_PER_REQUEST.labels(route).observe(profile.seconds)
         
-        return {
-            "uploads_directory": uploads_dir,
-            "total_files": len(files),
-            "files": files[:10]  # Primeros 10 archivos
-        }
-    except Exception as e:
-        return {"error": str(e)}
+        if SQL_PROFILER_ENABLED:
+            report_repeated_statements(profile, method, route)
+    
+    if SQL_PROFILER_ENABLED:
+        response.headers["Server-Timing"] = profile.server_timing(elapsed)
+    
+    return response
 
-# Middleware para debugging en desarrollo
+# Middleware para debugging en desarrollo, métricas, trazas y perfilado
 @app.middleware("http")
 async def debug_middleware(request, call_next):
     if settings.ENVIRONMENT == "development":
         # Log de todas las requests de archivos estáticos
         if "/static/" in str(request.url) or "/images/" in str(request.url):
-            logger.info(f"📁 Static request: {request.method} {request.url}")
+            logger.debug("📁 Static request: %s %s", request.method, request.url)
+    
+    with server_span(request.method, request.url.path, request.headers.get("traceparent")) as span:
+        if settings.PROFILING_ENABLED and profiling_requested(request):
+            response = await request_profiler.profile(request, lambda req: observe_request(req, call_next))
+        else:
+            response = await observe_request(request, call_next)
+        
+        route = route_label(request.scope)
+        span.update_name(f"{request.method} {route}")
+        span.set_attribute("http.route", route)
+        span.set_attribute("http.response.status_code", response.status_code)
     
-    response = await call_next(request)
+    if span.sampled:
+        response.headers["X-Trace-Id"] = span.trace_id
     
     if settings.ENVIRONMENT == "development":
         if "/static/" in str(request.url) or "/images/" in str(request.url):
-            logger.info(f"📁 Static response: {response.status_code}")
+            logger.debug("📁 Static response: %s", response.status_code)
     
     return response
\ No newline at end of file
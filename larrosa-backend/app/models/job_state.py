@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class JobState(Base):
+    """Estado (cursor, contadores) de tareas por lotes que se reanudan.
+    
+    Vive en la BD y no en el storage: el storage es público (mount /static
+    o URL del bucket) y estos datos son internos.
+    """
+    __tablename__ = "job_states"
+    
+    name = Column(String(100), primary_key=True)
+    data = Column(Text, nullable=False)  # JSON
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<JobState(name='{self.name}')>"
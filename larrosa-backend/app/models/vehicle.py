@@ -58,11 +58,14 @@ class VehicleImage(Base):
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"), nullable=False)
     filename = Column(String(255), nullable=False)
     original_filename = Column(String(255), nullable=False)
-    file_path = Column(String(500), nullable=False)
+    file_path = Column(String(500), nullable=False, index=True)
     file_size = Column(Integer)
     mime_type = Column(String(100))
     width = Column(Integer)
     height = Column(Integer)
+    content_hash = Column(String(64), index=True)  # SHA-256 del contenido
+    perceptual_hash = Column(String(16))  # dHash para casi-duplicados
+    placeholder = Column(Text)  # LQIP en base64 (data URI WebP ~20px)
     is_primary = Column(Boolean, default=False)
     alt_text = Column(String(255))
     display_order = Column(Integer, default=0)
@@ -71,5 +74,18 @@ class VehicleImage(Base):
     # Relación
     vehicle = relationship("Vehicle", back_populates="images")
     
+    @property
+    def url(self) -> str:
+        """URL pública del original según el backend de storage"""
+        from app.services.image_service import image_service
+        return image_service.storage.url(image_service.key_from_file_path(self.file_path))
+    
+    @property
+    def thumbnail_url(self) -> str:
+        """URL pública del thumbnail según el backend de storage"""
+        from app.services.image_service import image_service
+        original_key = image_service.key_from_file_path(self.file_path)
+        return image_service.storage.url(image_service.thumbnail_key_for(original_key))
+    
     def __repr__(self):
         return f"<VehicleImage(id={self.id}, vehicle_id={self.vehicle_id}, filename='{self.filename}')>"
\ No newline at end of file
@@ -35,9 +35,16 @@ class UserInDB(UserInDBBase):
 # Schemas para autenticación
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
     user: User
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class TokenPayload(BaseModel):
     sub: Optional[str] = None
 
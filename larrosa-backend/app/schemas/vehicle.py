@@ -1,5 +1,5 @@
 from pydantic import BaseModel, validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # Schemas para imágenes de vehículos
@@ -21,11 +21,74 @@ class VehicleImage(VehicleImageBase):
     mime_type: Optional[str]
     width: Optional[int]
     height: Optional[int]
+    content_hash: Optional[str] = None
+    placeholder: Optional[str] = None
+    url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+# Schemas para sprites de thumbnails de listados
+class VehicleSpriteCell(BaseModel):
+    image_id: int
+    x: int
+    y: int
+    width: int
+    height: int
+
+class VehicleSprite(BaseModel):
+    key: Optional[str]  # None si el sprite no se cacheó (url es un data URL)
+    url: str
+    width: int
+    height: int
+    cell_width: int
+    cell_height: int
+    cells: Dict[str, VehicleSpriteCell]  # vehicle_id -> posición en el sprite
+
+# Schemas para reordenar la galería de un vehículo
+class VehicleImageOrderItem(BaseModel):
+    id: int
+    display_order: int
+
+class VehicleImagesUpdate(BaseModel):
+    images: List[VehicleImageOrderItem]
+    primary_image_id: Optional[int] = None
+
+    @validator('images')
+    def validate_unique_images(cls, v):
+        ids = [item.id for item in v]
+        if len(ids) != len(set(ids)):
+            raise ValueError('Hay imágenes repetidas')
+        return v
+
+    @validator('primary_image_id')
+    def validate_primary_in_images(cls, v, values):
+        if v is not None and 'images' in values and v not in {item.id for item in values['images']}:
+            raise ValueError('La imagen principal debe estar en la lista')
+        return v
+
+# Schemas para subidas directas al storage
+class VehicleImagePresignRequest(BaseModel):
+    filename: str
+    content_type: str
+    content_hash: str
+    file_size: int
+
+    @validator('content_hash')
+    def validate_content_hash(cls, v):
+        v = v.lower()
+        if len(v) != 64 or any(c not in '0123456789abcdef' for c in v):
+            raise ValueError('content_hash debe ser un SHA-256 en hexadecimal')
+        return v
+
+class VehicleImageRegister(BaseModel):
+    key: str
+    original_filename: str
+    content_type: str
+    alt_text: Optional[str] = None
+
 # Schemas para vehículos
 class VehicleBase(BaseModel):
     brand: str
@@ -1,26 +1,45 @@
 # app/services/image_service.py - VERSIÓN CORREGIDA
 
+import io
 import os
-import uuid
-from typing import List, Optional
+import time
+import base64
+import hashlib
+from typing import List, Optional, Tuple
 from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
 from PIL import Image
+from sqlalchemy import func, select, update, values, column, bindparam, Integer, Boolean
 from sqlalchemy.orm import Session
 from app.models.vehicle import VehicleImage
 from app.core.config import settings
-import aiofiles
+from app.core.metrics import IMAGE_PROCESSING_DURATION, IMAGE_PROCESSING_IN_PROGRESS, IMAGES_PROCESSED
+from app.core.tracing import span, traced
+from app.services.storage import storage
+from app.utils.image_sniff import SNIFF_BYTES, SniffedImage, sniff_image
+from app.utils.image_optimizer import prepare_image, make_thumbnail, optimize_image, encode_image, draft_for
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Prefijo fijo con el que se guardaban las filas antes de UPLOAD_DIR configurable
+LEGACY_UPLOAD_DIR = "static/uploads"
+
+THUMBNAIL_SIZE = (400, 300)
+
+# Respaldo de Pillow por si algo llega a decodificarse sin pasar por el sniffing
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
 class ImageService:
     def __init__(self):
         self.upload_dir = settings.UPLOAD_DIR
         self.max_file_size = settings.MAX_FILE_SIZE
         self.allowed_extensions = settings.ALLOWED_EXTENSIONS
+        self.storage = storage
         
         # Crear directorios si no existen
-        self.ensure_directories()
+        if settings.STORAGE_BACKEND == "local":
+            self.ensure_directories()
     
     def ensure_directories(self):
         """Crear todos los directorios necesarios"""
@@ -59,74 +78,355 @@ class ImageService:
         
         return True
     
-    async def save_image(self, file: UploadFile, vehicle_id: int) -> dict:
+    def inspect_image_bytes(self, content: bytes, require_size: bool = True) -> SniffedImage:
+        """Validar formato real y dimensiones leyendo solo la cabecera.
+        
+        Se ejecuta antes de guardar o decodificar: rechaza lo que no es
+        imagen, formatos no permitidos y decompression bombs.
+        """
+        sniffed = sniff_image(content)
+        
+        if sniffed is None:
+            raise HTTPException(status_code=400, detail="El archivo no es una imagen válida")
+        
+        if not sniffed.supported or sniffed.extension not in self.allowed_extensions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Formato {sniffed.format} no permitido. Formatos válidos: {', '.join(self.allowed_extensions)}"
+            )
+        
+        if not require_size:
+            return sniffed
+        
+        if sniffed.pixels is None:
+            raise HTTPException(status_code=400, detail="No se pudieron leer las dimensiones de la imagen")
+        
+        if sniffed.pixels > settings.MAX_IMAGE_PIXELS:
+            logger.warning(f"⚠️ Rejected {sniffed.width}x{sniffed.height} image (pixel limit)")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Imagen demasiado grande: {sniffed.width}x{sniffed.height} píxeles. Máximo: {settings.MAX_IMAGE_PIXELS} píxeles"
+            )
+        
+        return sniffed
+    
+    @staticmethod
+    def compute_content_hash(content: bytes) -> str:
+        """Hash SHA-256 del contenido, usado como nombre del archivo"""
+        return hashlib.sha256(content).hexdigest()
+    
+    @staticmethod
+    def compute_perceptual_hash(img: Image.Image) -> str:
+        """dHash de 64 bits (16 caracteres hex) para detectar casi-duplicados"""
+        small = img.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+        pixels = list(small.getdata())
+        bits = 0
+        for row in range(8):
+            for col in range(8):
+                left = pixels[row * 9 + col]
+                right = pixels[row * 9 + col + 1]
+                bits = (bits << 1) | (1 if left > right else 0)
+        return f"{bits:016x}"
+    
+    @staticmethod
+    def compute_placeholder(img: Image.Image, size: int = 20) -> str:
+        """LQIP: imagen de ~20px en WebP como data URI, para pintar antes del thumbnail"""
+        small = img.convert("RGB")
+        small.thumbnail((size, size), Image.Resampling.BILINEAR)
+        buffer = io.BytesIO()
+        small.save(buffer, format="WEBP", quality=30, method=6)
+        return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    
+    @staticmethod
+    def hamming_distance(hash_a: str, hash_b: str) -> int:
+        """Distancia de Hamming entre dos dHash"""
+        return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+    
+    @staticmethod
+    def shard_prefix(filename: str) -> str:
+        """Directorios de reparto 'ab/cd' para un nombre de archivo.
+        
+        Los nombres direccionados por contenido usan su propio hash; los
+        nombres antiguos (uuid) usan el SHA-256 del nombre.
+        """
+        stem = filename.split('.')[0]
+        if len(stem) != 64 or any(c not in '0123456789abcdef' for c in stem):
+            stem = hashlib.sha256(filename.encode()).hexdigest()
+        return f"{stem[:2]}/{stem[2:4]}"
+    
+    def original_key(self, filename: str) -> str:
+        """Clave de almacenamiento del original"""
+        return f"vehicles/{self.shard_prefix(filename)}/{filename}"
+    
+    def thumbnail_key(self, filename: str) -> str:
+        """Clave de almacenamiento del thumbnail"""
+        return f"vehicles/thumbnails/{self.shard_prefix(filename)}/{filename}"
+    
+    def legacy_original_key(self, filename: str) -> str:
+        """Clave del original en el layout plano anterior"""
+        return f"vehicles/{filename}"
+    
+    def file_path_for_key(self, key: str) -> str:
+        """Ruta lógica guardada en VehicleImage.file_path"""
+        return f"{self.upload_dir}/{key}"
+    
+    def key_from_file_path(self, file_path: str) -> str:
+        """Inversa de file_path_for_key; acepta también filas con el prefijo legacy"""
+        file_path = file_path.lstrip('/')
+        for upload_dir in (self.upload_dir, LEGACY_UPLOAD_DIR):
+            prefix = f"{upload_dir.strip('/')}/"
+            if file_path.startswith(prefix):
+                return file_path[len(prefix):]
+        return file_path
+    
+    def file_path_candidates(self, key: str) -> List[str]:
+        """Valores de file_path con los que una fila puede referenciar la clave"""
+        return list(dict.fromkeys(
+            f"{upload_dir}/{key}"
+            for upload_dir in (self.upload_dir, self.upload_dir.strip('/'), f"/{LEGACY_UPLOAD_DIR}", LEGACY_UPLOAD_DIR)
+        ))
+    
+    def thumbnail_key_for(self, original_key: str) -> str:
+        """Clave del thumbnail a partir de la clave del original"""
+        return original_key.replace('vehicles/', 'vehicles/thumbnails/', 1)
+    
+    def _process_image(self, content: bytes, file_extension: str) -> dict:
+        """Decodificar, optimizar y generar thumbnail en memoria (bloqueante).
+        
+        El original guardado es la versión optimizada: orientada según EXIF,
+        sin metadatos, limitada a IMAGE_MAX_DIMENSION y re-codificada.
+        """
+        image_format = Image.registered_extensions()[f".{file_extension}"]
+        quality = settings.IMAGE_WEBP_QUALITY if image_format == "WEBP" else settings.IMAGE_JPEG_QUALITY
+        
+        with IMAGE_PROCESSING_DURATION.labels("prepare").time(), span("image.decode"):
+            with Image.open(io.BytesIO(content)) as source:
+                logger.debug(f"📏 Original dimensions: {source.width}x{source.height}")
+                img = prepare_image(source, image_format, settings.IMAGE_MAX_DIMENSION)
+        
+        with IMAGE_PROCESSING_DURATION.labels("optimize").time(), span("image.optimize") as optimize_span:
+            optimized, used_quality = optimize_image(
+                img,
+                image_format,
+                default_quality=quality,
+                target_ssim=settings.IMAGE_TARGET_SSIM,
+                min_quality=settings.IMAGE_MIN_QUALITY,
+                max_quality=settings.IMAGE_MAX_QUALITY
+            )
+            optimize_span.set_attribute("image.quality", used_quality)
+        width, height = img.size
+        logger.info(
+            f"🗜️ Optimized {len(content)} -> {len(optimized)} bytes "
+            f"({width}x{height}, quality {used_quality})"
+        )
+        
+        # Crear thumbnail desde la imagen ya orientada y reducida
+        with IMAGE_PROCESSING_DURATION.labels("thumbnail").time(), span("image.thumbnail"):
+            thumb = make_thumbnail(img, THUMBNAIL_SIZE)
+            perceptual_hash = self.compute_perceptual_hash(thumb)
+            placeholder = self.compute_placeholder(thumb)
+            thumbnail = encode_image(thumb, image_format, quality)
+        
+        return {
+            "content": optimized,
+            "width": width,
+            "height": height,
+            "perceptual_hash": perceptual_hash,
+            "placeholder": placeholder,
+            "thumbnail": thumbnail
+        }
+    
+    @traced()
+    async def save_image(self, file: UploadFile, vehicle_id: int, db: Optional[Session] = None) -> dict:
         """Guardar imagen y crear thumbnail"""
         self.validate_image(file)
         
-        # Generar nombre único
-        file_extension = file.filename.split('.')[-1].lower()
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
+        # Leer primero la cabecera: lo que no es una imagen permitida se
+        # rechaza sin leer el resto
+        with span("image.read") as read_span:
+            head = await file.read(SNIFF_BYTES)
+            self.inspect_image_bytes(head, require_size=False)
+            
+            # Leer el resto sin pasar del máximo permitido
+            content = head + await file.read(self.max_file_size + 1 - len(head))
+            read_span.set_attribute("image.size", len(content))
         
-        # RUTAS CORREGIDAS - sin duplicar 'static'
-        original_path = f"{self.upload_dir}/vehicles/{unique_filename}"
-        thumbnail_path = f"{self.upload_dir}/vehicles/thumbnails/{unique_filename}"
+        if len(content) > self.max_file_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Archivo demasiado grande. Máximo: {self.max_file_size} bytes"
+            )
+        
+        # Extensión y MIME salen del contenido, no del nombre ni del cliente
+        sniffed = self.inspect_image_bytes(content)
+        
+        return await self.store_image_bytes(
+            content=content,
+            file_extension=sniffed.extension,
+            original_filename=file.filename,
+            mime_type=sniffed.mime_type,
+            db=db
+        )
+    
+    @traced()
+    async def store_image_bytes(
+        self,
+        content: bytes,
+        file_extension: str,
+        original_filename: str,
+        mime_type: Optional[str],
+        db: Optional[Session] = None
+    ) -> dict:
+        """Guardar original optimizado y thumbnail en el storage.
         
-        logger.info(f"💾 Saving image to: {original_path}")
-        logger.info(f"🖼️ Creating thumbnail at: {thumbnail_path}")
+        Los archivos se nombran por hash SHA-256 del contenido subido (antes
+        de optimizar): si la misma foto ya fue subida, se reutilizan el
+        original, el thumbnail y los metadatos existentes sin volver a
+        escribirlos ni procesarlos.
+        """
+        content_hash = self.compute_content_hash(content)
+        unique_filename = f"{content_hash}.{file_extension}"
+        original_key = self.original_key(unique_filename)
+        thumbnail_key = self.thumbnail_key(unique_filename)
+        created_keys = []
         
         try:
-            # Leer contenido del archivo
-            content = await file.read()
+            existing = None
+            if db is not None:
+                # Hasta el commit del llamador: un borrado del mismo contenido
+                # no puede quitar los archivos que esta subida va a reutilizar
+                await run_in_threadpool(self.lock_content, db, content_hash, True)
+                existing = db.query(VehicleImage).filter(
+                    VehicleImage.content_hash == content_hash
+                ).first()
             
-            if len(content) > self.max_file_size:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Archivo demasiado grande. Máximo: {self.max_file_size} bytes"
+            deduplicated = False
+            if existing is not None:
+                # Reutilizar la ubicación de la fila existente (layout plano o repartido)
+                existing_key = self.key_from_file_path(existing.file_path)
+                deduplicated = (
+                    await run_in_threadpool(self.storage.exists, existing_key)
+                    and await run_in_threadpool(self.storage.exists, self.thumbnail_key_for(existing_key))
                 )
             
-            # Guardar archivo original
-            async with aiofiles.open(original_path, 'wb') as buffer:
-                await buffer.write(content)
-            
-            logger.info(f"✅ Image saved: {original_path}")
-            
-            # Crear thumbnail
-            with Image.open(original_path) as img:
-                # Obtener dimensiones originales
-                width, height = img.size
-                logger.info(f"📏 Original dimensions: {width}x{height}")
+            if deduplicated:
+                original_key = existing_key
+                thumbnail_key = self.thumbnail_key_for(existing_key)
+                logger.info(f"♻️ Reusing existing image: {original_key}")
+                file_size = existing.file_size
+                width = existing.width
+                height = existing.height
+                perceptual_hash = existing.perceptual_hash
+                placeholder = existing.placeholder
+                IMAGES_PROCESSED.labels("deduplicated").inc()
+            else:
+                # Cuenta también el tiempo esperando un thread libre
+                with IMAGE_PROCESSING_IN_PROGRESS.track_inprogress():
+                    processed = await run_in_threadpool(self._process_image, content, file_extension)
+                file_size = len(processed["content"])
+                width = processed["width"]
+                height = processed["height"]
+                perceptual_hash = processed["perceptual_hash"]
+                placeholder = processed["placeholder"]
                 
-                # Crear thumbnail
-                img.thumbnail((400, 300), Image.Resampling.LANCZOS)
-                img.save(thumbnail_path, quality=85, optimize=True)
-                logger.info(f"✅ Thumbnail created: {thumbnail_path}")
+                # Guardar el original optimizado; si ya existía (ej: subida
+                # directa sin procesar) se reemplaza pero no se borra en error
+                with span("image.write"):
+                    already_stored = await run_in_threadpool(self.storage.exists, original_key)
+                    logger.info(f"💾 Saving image to: {original_key}")
+                    store_started = time.perf_counter()
+                    await run_in_threadpool(self.storage.save, original_key, processed["content"], mime_type)
+                    if not already_stored:
+                        created_keys.append(original_key)
+                    
+                    await run_in_threadpool(self.storage.save, thumbnail_key, processed["thumbnail"], mime_type)
+                    created_keys.append(thumbnail_key)
+                IMAGE_PROCESSING_DURATION.labels("store").observe(time.perf_counter() - store_started)
+                IMAGES_PROCESSED.labels("processed").inc()
+                logger.info(f"✅ Thumbnail created: {thumbnail_key}")
             
             # RETURN CON RUTAS CORRECTAS
             return {
                 "filename": unique_filename,
-                "original_filename": file.filename,
-                "file_path": f"static/uploads/vehicles/{unique_filename}",  # RUTA RELATIVA CORRECTA
-                "thumbnail_path": f"static/uploads/vehicles/thumbnails/{unique_filename}",
-                "file_size": len(content),
-                "mime_type": file.content_type,
+                "original_filename": original_filename,
+                "file_path": self.file_path_for_key(original_key),
+                "thumbnail_path": self.file_path_for_key(thumbnail_key),
+                "file_size": file_size,
+                "mime_type": mime_type,
                 "width": width,
-                "height": height
+                "height": height,
+                "content_hash": content_hash,
+                "perceptual_hash": perceptual_hash,
+                "placeholder": placeholder,
+                "deduplicated": deduplicated
             }
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"❌ Error processing image: {str(e)}")
+            IMAGES_PROCESSED.labels("failed").inc()
             
-            # Limpiar archivos si algo sale mal
-            if os.path.exists(original_path):
-                os.remove(original_path)
-            if os.path.exists(thumbnail_path):
-                os.remove(thumbnail_path)
+            # Limpiar solo los archivos creados por esta subida; los existentes
+            # pueden estar referenciados por otras imágenes
+            for key in created_keys:
+                await run_in_threadpool(self.storage.delete, key)
             
             raise HTTPException(
                 status_code=500,
                 detail=f"Error al procesar la imagen: {str(e)}"
             )
     
+    def image_data_from_existing(
+        self,
+        existing: VehicleImage,
+        original_filename: str,
+        mime_type: Optional[str]
+    ) -> dict:
+        """Datos de imagen guardada reutilizando archivos y metadatos de otra fila"""
+        original_key = self.key_from_file_path(existing.file_path)
+        return {
+            "filename": existing.filename,
+            "original_filename": original_filename,
+            "file_path": existing.file_path,
+            "thumbnail_path": self.file_path_for_key(self.thumbnail_key_for(original_key)),
+            "file_size": existing.file_size,
+            "mime_type": mime_type or existing.mime_type,
+            "width": existing.width,
+            "height": existing.height,
+            "content_hash": existing.content_hash,
+            "perceptual_hash": existing.perceptual_hash,
+            "placeholder": existing.placeholder,
+            "deduplicated": True
+        }
+    
+    def build_image_record(
+        self,
+        vehicle_id: int,
+        image_data: dict,
+        is_primary: bool,
+        display_order: int,
+        alt_text: Optional[str] = None
+    ) -> VehicleImage:
+        """Crear (sin commitear) el registro de BD para una imagen guardada"""
+        return VehicleImage(
+            vehicle_id=vehicle_id,
+            filename=image_data["filename"],
+            original_filename=image_data["original_filename"],
+            file_path=image_data["file_path"],  # RUTA CORREGIDA
+            file_size=image_data["file_size"],
+            mime_type=image_data["mime_type"],
+            width=image_data["width"],
+            height=image_data["height"],
+            content_hash=image_data["content_hash"],
+            perceptual_hash=image_data["perceptual_hash"],
+            placeholder=image_data["placeholder"],
+            alt_text=alt_text,
+            is_primary=is_primary,
+            display_order=display_order
+        )
+    
+    @traced()
     async def save_vehicle_images(
         self, 
         db: Session, 
@@ -149,18 +449,12 @@ class ImageService:
                 logger.info(f"📷 Processing image {i+1}: {file.filename}")
                 
                 # Guardar imagen física
-                image_data = await self.save_image(file, vehicle_id)
+                image_data = await self.save_image(file, vehicle_id, db=db)
                 
                 # Crear registro en BD
-                db_image = VehicleImage(
+                db_image = self.build_image_record(
                     vehicle_id=vehicle_id,
-                    filename=image_data["filename"],
-                    original_filename=image_data["original_filename"],
-                    file_path=image_data["file_path"],  # RUTA CORREGIDA
-                    file_size=image_data["file_size"],
-                    mime_type=image_data["mime_type"],
-                    width=image_data["width"],
-                    height=image_data["height"],
+                    image_data=image_data,
                     is_primary=(i == 0),  # Primera imagen como principal
                     display_order=i
                 )
@@ -171,22 +465,19 @@ class ImageService:
                 # LOG DETALLADO PARA DEBUG
                 logger.info(f"🗄️ Database entry: vehicle_id={vehicle_id}, filename={db_image.filename}, file_path={db_image.file_path}")
                 
-                # GENERAR Y LOGGEAR URL
-                url = f"http://localhost:8000/{image_data['file_path']}"
-                logger.info(f"🌐 URL: {url}")
-                
             except Exception as e:
                 logger.error(f"❌ Error guardando imagen {file.filename}: {str(e)}")
                 continue
         
         if saved_images:
             try:
-                db.commit()
-                logger.info(f"✅ Committed {len(saved_images)} images to database")
-                
-                # Refrescar objetos
-                for img in saved_images:
-                    db.refresh(img)
+                with span("image.commit", attributes={"image.count": len(saved_images)}):
+                    db.commit()
+                    logger.info(f"✅ Committed {len(saved_images)} images to database")
+                    
+                    # Refrescar objetos
+                    for img in saved_images:
+                        db.refresh(img)
                     
             except Exception as e:
                 logger.error(f"❌ Error committing to database: {str(e)}")
@@ -198,31 +489,203 @@ class ImageService:
         
         return saved_images
     
+    def create_presigned_upload(
+        self,
+        filename: str,
+        content_type: str,
+        content_hash: str,
+        file_size: int
+    ) -> dict:
+        """Preparar una subida directa del navegador al storage.
+        
+        El cliente calcula el SHA-256 del archivo; si ese contenido ya existe
+        no hace falta subirlo de nuevo.
+        """
+        if not self.storage.supports_presigned_upload:
+            raise HTTPException(
+                status_code=400,
+                detail="El almacenamiento configurado no soporta subidas directas"
+            )
+        
+        file_extension = filename.split('.')[-1].lower()
+        if file_extension not in self.allowed_extensions:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Formato de archivo no permitido. Formatos válidos: {', '.join(self.allowed_extensions)}"
+            )
+        
+        if not content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail="El archivo debe ser una imagen")
+        
+        if file_size <= 0:
+            raise HTTPException(status_code=400, detail="Tamaño de archivo inválido")
+        
+        if file_size > self.max_file_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Archivo demasiado grande. Máximo: {self.max_file_size} bytes"
+            )
+        
+        key = self.original_key(f"{content_hash}.{file_extension}")
+        
+        if self.storage.exists(key):
+            return {"key": key, "already_exists": True}
+        
+        upload = self.storage.presigned_put(
+            key, 
+            content_type, 
+            file_size,
+            settings.PRESIGNED_URL_EXPIRE_SECONDS
+        )
+        return {"key": key, "already_exists": False, **upload}
+    
+    async def register_uploaded_image(
+        self,
+        db: Session,
+        vehicle_id: int,
+        key: str,
+        original_filename: str,
+        mime_type: str,
+        alt_text: Optional[str] = None
+    ) -> VehicleImage:
+        """Registrar una imagen subida directamente al storage"""
+        filename = key.rsplit('/', 1)[-1]
+        content_hash, _, file_extension = filename.partition('.')
+        
+        if key != self.original_key(filename) or not file_extension:
+            raise HTTPException(status_code=400, detail="Clave de imagen inválida")
+        
+        # Tamaño por HEAD antes de leer: un objeto enorme no llega a la memoria del worker
+        stored_size = await run_in_threadpool(self.storage.size, key)
+        if stored_size is None:
+            raise HTTPException(status_code=404, detail="La imagen no fue subida al almacenamiento")
+        
+        # Si la clave ya fue registrada, el objeto es la versión optimizada
+        # (su hash ya no coincide con el nombre): reutilizar la fila existente
+        existing = db.query(VehicleImage).filter(
+            VehicleImage.file_path == self.file_path_for_key(key)
+        ).first()
+        
+        if existing is not None:
+            image_data = self.image_data_from_existing(existing, original_filename, mime_type)
+        else:
+            if stored_size > self.max_file_size:
+                await run_in_threadpool(self.storage.delete, key)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Archivo demasiado grande. Máximo: {self.max_file_size} bytes"
+                )
+            
+            content = await run_in_threadpool(self.storage.read, key)
+            
+            # La clave debe corresponder al contenido, si no la deduplicación se rompe
+            if self.compute_content_hash(content) != content_hash:
+                await run_in_threadpool(self.storage.delete, key)
+                raise HTTPException(status_code=400, detail="El hash no coincide con el contenido subido")
+            
+            # Validar el contenido real; el objeto todavía no está referenciado
+            try:
+                sniffed = self.inspect_image_bytes(content)
+                if Image.registered_extensions().get(f".{file_extension}") != sniffed.format:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"La extensión .{file_extension} no coincide con el contenido ({sniffed.format})"
+                    )
+            except HTTPException:
+                await run_in_threadpool(self.storage.delete, key)
+                raise
+            
+            image_data = await self.store_image_bytes(
+                content=content,
+                file_extension=file_extension,
+                original_filename=original_filename,
+                mime_type=sniffed.mime_type,
+                db=db
+            )
+        
+        existing_count = db.query(VehicleImage).filter(
+            VehicleImage.vehicle_id == vehicle_id
+        ).count()
+        
+        db_image = self.build_image_record(
+            vehicle_id=vehicle_id,
+            image_data=image_data,
+            is_primary=(existing_count == 0),
+            display_order=existing_count,
+            alt_text=alt_text
+        )
+        
+        try:
+            db.add(db_image)
+            db.commit()
+            db.refresh(db_image)
+        except Exception as e:
+            logger.error(f"❌ Error committing to database: {str(e)}")
+            db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error guardando en base de datos: {str(e)}"
+            )
+        
+        return db_image
+    
+    def lock_content(self, db: Session, content_hash: Optional[str], shared: bool = False) -> None:
+        """Lock de la transacción sobre un hash de contenido (advisory lock de PostgreSQL).
+        
+        Las subidas toman el lock compartido (no se bloquean entre sí) y el
+        borrado el exclusivo, así contar referencias y borrar archivos no se
+        cruza con una subida que deduplica contra esos mismos archivos. En
+        otros motores (SQLite en desarrollo) no hace nada.
+        """
+        if not content_hash or db.get_bind().dialect.name != "postgresql":
+            return
+        lock = func.pg_advisory_xact_lock_shared if shared else func.pg_advisory_xact_lock
+        db.execute(select(lock(int(content_hash[:15], 16))))
+    
+    def count_references(self, db: Session, db_image: VehicleImage) -> int:
+        """Contar otras imágenes que apuntan al mismo archivo físico"""
+        # Por file_path (indexado): durante la migración de layout puede haber
+        # copias del mismo contenido en rutas distintas
+        return db.query(VehicleImage).filter(
+            VehicleImage.id != db_image.id,
+            VehicleImage.file_path == db_image.file_path
+        ).count()
+    
     def delete_image(self, db: Session, image_id: int) -> bool:
-        """Eliminar imagen física y registro"""
+        """Eliminar registro, y los archivos físicos si era la última referencia"""
         db_image = db.query(VehicleImage).filter(VehicleImage.id == image_id).first()
         if not db_image:
             return False
         
         try:
-            # Construir rutas de archivos físicos
-            original_path = db_image.file_path
-            if not original_path.startswith('/'):
-                original_path = original_path
+            # Claves de almacenamiento de los archivos físicos
+            original_key = self.key_from_file_path(db_image.file_path)
+            thumbnail_key = self.thumbnail_key_for(original_key)
             
-            thumbnail_path = original_path.replace('/vehicles/', '/vehicles/thumbnails/')
-            
-            # Eliminar archivos físicos
-            if os.path.exists(original_path):
-                os.remove(original_path)
-                logger.info(f"🗑️ Deleted original: {original_path}")
-            
-            if os.path.exists(thumbnail_path):
-                os.remove(thumbnail_path)
-                logger.info(f"🗑️ Deleted thumbnail: {thumbnail_path}")
+            # Contar y borrar con el lock tomado: las subidas que deduplican
+            # contra este contenido esperan, o ya commitearon y se cuentan
+            self.lock_content(db, db_image.content_hash)
+            remaining_references = self.count_references(db, db_image)
             
             # Eliminar registro
             db.delete(db_image)
+            db.flush()
+            
+            # Eliminar archivos físicos solo si nadie más los usa, antes del
+            # commit que libera el lock
+            if remaining_references == 0:
+                try:
+                    self.storage.delete(original_key)
+                    logger.info(f"🗑️ Deleted original: {original_key}")
+                    
+                    self.storage.delete(thumbnail_key)
+                    logger.info(f"🗑️ Deleted thumbnail: {thumbnail_key}")
+                except Exception as e:
+                    # La fila se borra igual; la reconciliación recupera los archivos
+                    logger.warning(f"⚠️ Could not delete files for {original_key}: {e}")
+            else:
+                logger.info(f"♻️ Keeping files for {original_key}: {remaining_references} references left")
+            
             db.commit()
             
             logger.info(f"✅ Image {image_id} deleted successfully")
@@ -233,23 +696,98 @@ class ImageService:
             db.rollback()
             return False
     
+    def update_images_order(
+        self,
+        db: Session,
+        vehicle_id: int,
+        image_orders: List[dict],
+        primary_image_id: Optional[int] = None
+    ) -> int:
+        """Aplicar orden completo y principal en un solo UPDATE.
+        
+        image_orders: [{"image_id": int, "order": int}, ...] con toda la galería.
+        En PostgreSQL se usa UPDATE ... FROM (VALUES ...); en otros motores
+        un executemany de la misma sentencia. Devuelve las filas actualizadas.
+        """
+        if not image_orders:
+            return 0
+        
+        set_primary = primary_image_id is not None
+        rows = [
+            (item["image_id"], item["order"], item["image_id"] == primary_image_id)
+            for item in image_orders
+        ]
+        
+        if db.get_bind().dialect.name == "postgresql":
+            new_order = values(
+                column("id", Integer),
+                column("display_order", Integer),
+                column("is_primary", Boolean),
+                name="new_order"
+            ).data(rows)
+            
+            new_values = {"display_order": new_order.c.display_order}
+            if set_primary:
+                new_values["is_primary"] = new_order.c.is_primary
+            
+            stmt = (
+                update(VehicleImage)
+                .where(
+                    VehicleImage.id == new_order.c.id,
+                    VehicleImage.vehicle_id == vehicle_id
+                )
+                .values(**new_values)
+                .execution_options(synchronize_session=False)
+            )
+            result = db.execute(stmt)
+        else:
+            table = VehicleImage.__table__
+            new_values = {"display_order": bindparam("new_display_order")}
+            if set_primary:
+                new_values["is_primary"] = bindparam("new_is_primary")
+            
+            stmt = (
+                update(table)
+                .where(
+                    table.c.id == bindparam("target_id"),
+                    table.c.vehicle_id == vehicle_id
+                )
+                .values(**new_values)
+            )
+            params = []
+            for image_id, order, is_primary in rows:
+                row_params = {"target_id": image_id, "new_display_order": order}
+                if set_primary:
+                    row_params["new_is_primary"] = is_primary
+                params.append(row_params)
+            result = db.connection().execute(stmt, params)
+        
+        return result.rowcount
+    
     def set_primary_image(self, db: Session, vehicle_id: int, image_id: int) -> bool:
         """Establecer imagen como principal"""
         try:
-            # Quitar primary de todas las imágenes del vehículo
-            db.query(VehicleImage).filter(
-                VehicleImage.vehicle_id == vehicle_id
-            ).update({"is_primary": False})
+            # Sin esta verificación un id ajeno desmarcaría todas las imágenes
+            exists = db.query(
+                db.query(VehicleImage).filter(
+                    VehicleImage.id == image_id,
+                    VehicleImage.vehicle_id == vehicle_id
+                ).exists()
+            ).scalar()
+            if not exists:
+                return False
             
-            # Establecer nueva imagen principal
-            result = db.query(VehicleImage).filter(
-                VehicleImage.id == image_id,
+            # Un único UPDATE marca la nueva principal y desmarca el resto
+            db.query(VehicleImage).filter(
                 VehicleImage.vehicle_id == vehicle_id
-            ).update({"is_primary": True})
+            ).update(
+                {"is_primary": VehicleImage.id == image_id},
+                synchronize_session=False
+            )
             
             db.commit()
             logger.info(f"✅ Set image {image_id} as primary for vehicle {vehicle_id}")
-            return result > 0
+            return True
             
         except Exception as e:
             logger.error(f"❌ Error setting primary image: {str(e)}")
@@ -259,14 +797,10 @@ class ImageService:
     def reorder_images(self, db: Session, vehicle_id: int, image_orders: List[dict]) -> bool:
         """Reordenar imágenes de un vehículo"""
         try:
-            for item in image_orders:
-                db.query(VehicleImage).filter(
-                    VehicleImage.id == item["image_id"],
-                    VehicleImage.vehicle_id == vehicle_id
-                ).update({"display_order": item["order"]})
+            updated = self.update_images_order(db, vehicle_id, image_orders)
             
             db.commit()
-            logger.info(f"✅ Reordered {len(image_orders)} images for vehicle {vehicle_id}")
+            logger.info(f"✅ Reordered {updated} images for vehicle {vehicle_id}")
             return True
             
         except Exception as e:
@@ -280,11 +814,71 @@ class ImageService:
             VehicleImage.vehicle_id == vehicle_id
         ).order_by(VehicleImage.display_order).all()
         
-        logger.info(f"📋 Found {len(images)} images for vehicle {vehicle_id}")
-        for img in images:
-            logger.info(f"   📷 {img.filename} -> {img.file_path}")
+        logger.debug("📋 Found %s images for vehicle %s", len(images), vehicle_id)
+        if logger.isEnabledFor(logging.DEBUG):
+            for img in images:
+                logger.debug("   📷 %s -> %s", img.filename, img.file_path)
         
         return images
 
+    def find_near_duplicates(
+        self, 
+        db: Session, 
+        vehicle_id: int, 
+        max_distance: int = 6
+    ) -> List[Tuple[VehicleImage, VehicleImage, int]]:
+        """Detectar pares de imágenes casi idénticas de un vehículo por dHash"""
+        images = db.query(VehicleImage).filter(
+            VehicleImage.vehicle_id == vehicle_id,
+            VehicleImage.perceptual_hash.isnot(None)
+        ).order_by(VehicleImage.display_order).all()
+        
+        pairs = []
+        for i, first in enumerate(images):
+            for second in images[i + 1:]:
+                distance = self.hamming_distance(first.perceptual_hash, second.perceptual_hash)
+                if distance <= max_distance:
+                    pairs.append((first, second, distance))
+        
+        return pairs
+
+    def backfill_placeholder(self, db_image: VehicleImage) -> bool:
+        """Generar placeholder (y dHash si falta) desde el thumbnail ya guardado"""
+        original_key = self.key_from_file_path(db_image.file_path)
+        thumbnail_key = self.thumbnail_key_for(original_key)
+        
+        # El thumbnail es chico; si no existe se usa el original
+        key = thumbnail_key if self.storage.exists(thumbnail_key) else original_key
+        if not self.storage.exists(key):
+            logger.warning(f"⚠️ No file for image {db_image.id}: {key}")
+            return False
+        
+        with Image.open(io.BytesIO(self.storage.read(key))) as img:
+            # Si se usa el original, decodificar a escala reducida
+            draft_for(img, THUMBNAIL_SIZE)
+            db_image.placeholder = self.compute_placeholder(img)
+            if not db_image.perceptual_hash:
+                db_image.perceptual_hash = self.compute_perceptual_hash(img)
+        
+        return True
+
+    def resolve_image_keys(self, relative_path: str) -> List[str]:
+        """Claves candidatas para una ruta pedida bajo /images.
+        
+        Acepta rutas completas ('ab/cd/<nombre>') y nombres sueltos
+        ('<nombre>', 'thumbnails/<nombre>'), que se buscan primero en el
+        layout repartido y después en el plano mientras dura la migración.
+        """
+        relative_path = relative_path.lstrip('/')
+        thumbnails = relative_path.startswith('thumbnails/')
+        name = relative_path[len('thumbnails/'):] if thumbnails else relative_path
+        
+        if '/' in name:
+            return [f"vehicles/{relative_path}"]
+        
+        if thumbnails:
+            return [self.thumbnail_key(name), f"vehicles/thumbnails/{name}"]
+        return [self.original_key(name), self.legacy_original_key(name)]
+
 # Instancia global del servicio
 image_service = ImageService()
\ No newline at end of file
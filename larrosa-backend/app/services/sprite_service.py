@@ -0,0 +1,240 @@
+# app/services/sprite_service.py - SPRITES DE THUMBNAILS PARA LISTADOS
+
+import io
+import json
+import math
+import time
+import base64
+import hashlib
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
+from PIL import Image
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.rate_limit import rate_limiter
+from app.models.vehicle import Vehicle, VehicleImage
+from app.services.image_service import ImageService, image_service, THUMBNAIL_SIZE
+from app.services.storage import StorageBackend, StoredObject
+from app.utils.image_optimizer import encode_image, make_thumbnail
+
+logger = logging.getLogger(__name__)
+
+# Fuera de 'vehicles/' para que la reconciliación no los trate como huérfanos
+SPRITE_PREFIX = "sprites"
+SPRITE_QUALITY = 80
+MAX_SPRITE_VEHICLES = 100
+# Cambiar si cambia el layout, para no reutilizar sprites viejos
+SPRITE_VERSION = 1
+
+
+class SpriteService:
+    """Une los thumbnails principales de una página de vehículos en una sola imagen.
+
+    El sprite se cachea en el storage con una clave derivada del conjunto de
+    hashes de contenido de las imágenes, así cualquier cambio de imagen
+    principal genera una clave nueva y los sprites existentes no cambian
+    nunca. El prefijo se poda por antigüedad y cantidad (ver prune).
+    """
+
+    def __init__(self, storage: StorageBackend, images: ImageService):
+        self.storage = storage
+        self.images = images
+        self._built = 0
+
+    def primary_images(self, db: Session, vehicle_ids: List[int]) -> Dict[int, VehicleImage]:
+        """Imagen principal (o la primera) de cada vehículo activo, en una sola consulta"""
+        rows = db.query(VehicleImage).join(
+            Vehicle, Vehicle.id == VehicleImage.vehicle_id
+        ).filter(
+            VehicleImage.vehicle_id.in_(vehicle_ids),
+            Vehicle.is_active == True
+        ).order_by(
+            VehicleImage.vehicle_id,
+            VehicleImage.is_primary.desc(),
+            VehicleImage.display_order,
+            VehicleImage.id
+        ).all()
+
+        primary = {}
+        for row in rows:
+            primary.setdefault(row.vehicle_id, row)
+        return primary
+
+    @staticmethod
+    def content_key(image: VehicleImage) -> str:
+        """Identidad del contenido de una imagen (file_path en filas sin hash)"""
+        return image.content_hash or image.file_path
+
+    def sprite_digest(self, contents: List[str]) -> str:
+        """Clave de cache: solo el conjunto de contenidos, sin ids ni orden de la página"""
+        parts = [f"v{SPRITE_VERSION}", *contents]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    def build_sprite(self, contents: Dict[str, VehicleImage]) -> tuple:
+        """Componer el sprite en una grilla de celdas del tamaño del thumbnail (bloqueante).
+
+        Las celdas se indexan por contenido, en el orden de `contents`; el
+        tercer valor indica si se pudieron leer todas las imágenes.
+        """
+        cell_width, cell_height = THUMBNAIL_SIZE
+        columns = max(1, math.ceil(math.sqrt(len(contents))))
+        rows = max(1, math.ceil(len(contents) / columns))
+
+        sprite = Image.new("RGB", (columns * cell_width, rows * cell_height), (255, 255, 255))
+        tiles = {}
+        complete = True
+
+        for index, (content, image) in enumerate(contents.items()):
+            original_key = self.images.key_from_file_path(image.file_path)
+            thumbnail_key = self.images.thumbnail_key_for(original_key)
+            key = thumbnail_key if self.storage.exists(thumbnail_key) else original_key
+
+            try:
+                with Image.open(io.BytesIO(self.storage.read(key))) as img:
+                    thumb = make_thumbnail(img, THUMBNAIL_SIZE)
+            except Exception as e:
+                logger.warning(f"⚠️ Skipping image {image.id} in sprite: {e}")
+                complete = False
+                continue
+
+            x = (index % columns) * cell_width
+            y = (index // columns) * cell_height
+            if thumb.mode in ("RGBA", "LA", "P"):
+                thumb = thumb.convert("RGBA")
+                sprite.paste(thumb, (x, y), thumb)
+            else:
+                sprite.paste(thumb.convert("RGB"), (x, y))
+
+            tiles[content] = {
+                "x": x,
+                "y": y,
+                "width": thumb.width,
+                "height": thumb.height
+            }
+
+        return encode_image(sprite, "JPEG", SPRITE_QUALITY), {
+            "width": sprite.width,
+            "height": sprite.height,
+            "cell_width": cell_width,
+            "cell_height": cell_height,
+            "tiles": tiles
+        }, complete
+
+    async def get_sprite(self, db: Session, vehicle_ids: List[int]) -> dict:
+        """Sprite y mapa de coordenadas para una página de vehículos"""
+        vehicle_ids = list(dict.fromkeys(vehicle_ids))[:MAX_SPRITE_VEHICLES]
+        primary = await run_in_threadpool(self.primary_images, db, vehicle_ids)
+
+        # Contenidos únicos y ordenados: la misma página en otro orden, o con
+        # ids distintos que comparten imagen, reutiliza el mismo sprite
+        contents = {}
+        for image in primary.values():
+            contents.setdefault(self.content_key(image), image)
+        contents = dict(sorted(contents.items()))
+
+        digest = self.sprite_digest(list(contents))
+        image_key = f"{SPRITE_PREFIX}/{digest}.jpg"
+        map_key = f"{SPRITE_PREFIX}/{digest}.json"
+
+        layout: Optional[dict] = None
+        if await run_in_threadpool(self.storage.exists, map_key):
+            try:
+                layout = json.loads(await run_in_threadpool(self.storage.read, map_key))
+            except Exception:
+                layout = None
+
+        key, url = image_key, self.storage.url(image_key)
+        if layout is None:
+            # Cada subconjunto de ids es una clave nueva: el tope global de
+            # construcciones acota la CPU/IO que puede forzar cualquiera
+            await rate_limiter.enforce(
+                "sprites:builds",
+                settings.SPRITE_BUILD_BURST,
+                settings.SPRITE_BUILDS_PER_MINUTE
+            )
+            logger.info(f"🧩 Building sprite for {len(contents)} images: {image_key}")
+            data, layout, complete = await run_in_threadpool(self.build_sprite, contents)
+            if complete:
+                await run_in_threadpool(self.storage.save, image_key, data, "image/jpeg")
+                # El mapa se guarda último: si existe, el sprite también
+                await run_in_threadpool(
+                    self.storage.save, map_key, json.dumps(layout).encode(), "application/json"
+                )
+                await self._maybe_prune()
+            else:
+                # Un fallo de lectura no debe quedar cacheado para siempre bajo
+                # esta clave: se sirve inline y se reintenta en la próxima petición
+                key, url = None, "data:image/jpeg;base64," + base64.b64encode(data).decode()
+
+        cells = {}
+        for vehicle_id in vehicle_ids:
+            image = primary.get(vehicle_id)
+            tile = layout["tiles"].get(self.content_key(image)) if image is not None else None
+            if tile is not None:
+                cells[str(vehicle_id)] = {"image_id": image.id, **tile}
+
+        return {
+            "key": key,
+            "url": url,
+            "width": layout["width"],
+            "height": layout["height"],
+            "cell_width": layout["cell_width"],
+            "cell_height": layout["cell_height"],
+            "cells": cells
+        }
+
+    # ===== LIMPIEZA =====
+
+    async def _maybe_prune(self) -> None:
+        """Podar cada SPRITE_PRUNE_EVERY sprites nuevos, para acotar el prefijo
+        aunque la reconciliación periódica esté apagada"""
+        self._built += 1
+        if settings.SPRITE_PRUNE_EVERY and self._built % settings.SPRITE_PRUNE_EVERY == 0:
+            try:
+                await run_in_threadpool(self.prune, True)
+            except Exception as e:
+                logger.error(f"❌ Sprite prune failed: {e}")
+
+    def prune(self, delete: bool = True) -> dict:
+        """Borrar sprites con más de SPRITE_MAX_AGE_DAYS y, si aun así pasan de
+        SPRITE_MAX_COUNT, los más viejos (bloqueante; lista todo 'sprites/')"""
+        sprites: Dict[str, List[StoredObject]] = defaultdict(list)
+        for obj in self.storage.iter_objects(f"{SPRITE_PREFIX}/"):
+            digest = obj.key.rsplit("/", 1)[-1].split(".", 1)[0]
+            sprites[digest].append(obj)
+
+        # Los sprites no se modifican: la fecha del más nuevo de sus archivos es la de creación
+        by_age = sorted(sprites.items(), key=lambda item: max(obj.modified_at for obj in item[1]))
+        max_age = settings.SPRITE_MAX_AGE_DAYS * 86400
+        now = time.time()
+
+        expired = []
+        for index, (digest, objects) in enumerate(by_age):
+            too_old = max_age and now - max(obj.modified_at for obj in objects) > max_age
+            over_cap = settings.SPRITE_MAX_COUNT and len(by_age) - index > settings.SPRITE_MAX_COUNT
+            if too_old or over_cap:
+                expired.append((digest, objects))
+
+        reclaimed_bytes = 0
+        if delete:
+            for digest, objects in expired:
+                # Primero el mapa, para que nadie sirva un sprite a medio borrar
+                for obj in sorted(objects, key=lambda o: not o.key.endswith(".json")):
+                    self.storage.delete(obj.key)
+                    reclaimed_bytes += obj.size
+            if expired:
+                logger.info(f"🗑️ Pruned {len(expired)} sprites ({reclaimed_bytes} bytes)")
+
+        return {
+            "sprites": len(by_age),
+            "expired": len(expired),
+            "expired_bytes": sum(obj.size for _, objects in expired for obj in objects),
+            "reclaimed_bytes": reclaimed_bytes,
+            "deleted": delete
+        }
+
+
+# Instancia global
+sprite_service = SpriteService(storage=image_service.storage, images=image_service)
@@ -0,0 +1,292 @@
+# app/services/storage.py - BACKENDS DE ALMACENAMIENTO DE ARCHIVOS
+
+import os
+import shutil
+import logging
+from dataclasses import dataclass
+from typing import Iterator, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Las claves son direccionadas por contenido y nunca cambian
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@dataclass
+class StoredObject:
+    """Entrada de un listado del storage"""
+    key: str
+    size: int
+    modified_at: float  # timestamp unix
+
+
+class StorageBackend:
+    """Interfaz común de almacenamiento.
+
+    Las claves son rutas relativas con '/' (ej: 'vehicles/thumbnails/<hash>.jpg'),
+    independientes del backend concreto.
+    """
+
+    supports_presigned_upload = False
+
+    def save(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def read(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, key: str) -> Optional[int]:
+        """Tamaño en bytes sin leer el contenido, o None si no existe"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    def copy(self, src_key: str, dst_key: str) -> None:
+        raise NotImplementedError
+
+    def presigned_put(self, key: str, content_type: str, content_length: int, expires_in: int) -> dict:
+        raise NotImplementedError("Este backend no soporta subidas directas")
+
+    def iter_objects(self, prefix: str, start_after: str = "") -> Iterator[StoredObject]:
+        """Listar objetos bajo prefix en orden lexicográfico de clave"""
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """Almacenamiento en el filesystem local (UPLOAD_DIR)"""
+
+    def __init__(self, root: str, public_url: str):
+        self.root = root
+        self.public_url = public_url.rstrip("/")
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def save(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        """Escribir en un temporal y renombrar, para que dos subidas iguales no se pisen"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as buffer:
+            buffer.write(data)
+        os.replace(tmp_path, path)
+
+    def read(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self.path(key))
+        except OSError:
+            return None
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    def copy(self, src_key: str, dst_key: str) -> None:
+        """Hard link si es posible (sin copiar bytes), si no copia"""
+        src = self.path(src_key)
+        dst = self.path(dst_key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+        try:
+            os.link(src, dst)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copy2(src, dst)
+
+    def iter_objects(self, prefix: str, start_after: str = "") -> Iterator[StoredObject]:
+        """Recorrer con os.scandir, sin listar directorios ya pasados"""
+        yield from self._scan(self.path(prefix.rstrip("/")), prefix.rstrip("/") + "/", start_after)
+
+    def _scan(self, directory: str, key_prefix: str, start_after: str) -> Iterator[StoredObject]:
+        try:
+            with os.scandir(directory) as it:
+                # Los directorios se ordenan como 'nombre/' para respetar el orden de claves
+                entries = sorted(
+                    it, 
+                    key=lambda e: e.name + "/" if e.is_dir(follow_symlinks=False) else e.name
+                )
+        except FileNotFoundError:
+            return
+
+        for entry in entries:
+            key = key_prefix + entry.name
+
+            if entry.is_dir(follow_symlinks=False):
+                sub_prefix = key + "/"
+                # Saltar subárboles completos anteriores al cursor
+                if start_after and sub_prefix < start_after and not start_after.startswith(sub_prefix):
+                    continue
+                yield from self._scan(entry.path, sub_prefix, start_after)
+            elif entry.is_file(follow_symlinks=False):
+                if start_after and key <= start_after:
+                    continue
+                st = entry.stat()
+                yield StoredObject(key=key, size=st.st_size, modified_at=st.st_mtime)
+
+
+class S3Storage(StorageBackend):
+    """Almacenamiento S3 o compatible (MinIO en desarrollo)"""
+
+    supports_presigned_upload = True
+
+    def __init__(
+        self,
+        bucket: str,
+        region: str,
+        endpoint_url: Optional[str] = None,
+        public_url: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None
+    ):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.region = region
+        self.endpoint_url = endpoint_url or None
+
+        # MinIO y otros compatibles necesitan direccionamiento por path
+        addressing_style = "path" if self.endpoint_url else "auto"
+        self.client = boto3.client(
+            "s3",
+            region_name=region,
+            endpoint_url=self.endpoint_url,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            config=Config(signature_version="s3v4", s3={"addressing_style": addressing_style})
+        )
+
+        if public_url:
+            self.public_url = public_url.rstrip("/")
+        elif self.endpoint_url:
+            self.public_url = f"{self.endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_url = f"https://{bucket}.s3.{region}.amazonaws.com"
+
+    def save(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        extra = {"CacheControl": IMMUTABLE_CACHE_CONTROL}
+        if content_type:
+            extra["ContentType"] = content_type
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+
+    def read(self, key: str) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=key)
+        return response["Body"].read()
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    def copy(self, src_key: str, dst_key: str) -> None:
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=dst_key,
+            CopySource={"Bucket": self.bucket, "Key": src_key}
+        )
+
+    def iter_objects(self, prefix: str, start_after: str = "") -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        params = {"Bucket": self.bucket, "Prefix": prefix}
+        if start_after:
+            params["StartAfter"] = start_after
+
+        for page in paginator.paginate(**params):
+            for obj in page.get("Contents", []):
+                yield StoredObject(
+                    key=obj["Key"],
+                    size=obj["Size"],
+                    modified_at=obj["LastModified"].timestamp()
+                )
+
+    def presigned_put(self, key: str, content_type: str, content_length: int, expires_in: int) -> dict:
+        """URL firmada para que el navegador suba los bytes directo al bucket.
+
+        Content-Length va firmado: S3 rechaza un cuerpo de otro tamaño, así
+        que la URL no sirve para subir más que lo declarado al pedirla.
+        """
+        upload_url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentType": content_type,
+                "ContentLength": content_length,
+                "CacheControl": IMMUTABLE_CACHE_CONTROL
+            },
+            ExpiresIn=expires_in
+        )
+        return {
+            "upload_url": upload_url,
+            "method": "PUT",
+            "headers": {
+                "Content-Type": content_type,
+                "Content-Length": str(content_length),
+                "Cache-Control": IMMUTABLE_CACHE_CONTROL
+            },
+            "expires_in": expires_in
+        }
+
+
+def get_storage_backend() -> StorageBackend:
+    """Crear el backend configurado en STORAGE_BACKEND"""
+    if settings.STORAGE_BACKEND == "s3":
+        logger.info(f"☁️ Using S3 storage: bucket={settings.AWS_S3_BUCKET}")
+        return S3Storage(
+            bucket=settings.AWS_S3_BUCKET,
+            region=settings.AWS_REGION,
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            public_url=settings.AWS_S3_PUBLIC_URL,
+            access_key_id=settings.AWS_ACCESS_KEY_ID,
+            secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+        )
+
+    return LocalStorage(root=settings.UPLOAD_DIR, public_url=settings.STORAGE_PUBLIC_URL)
+
+
+# Instancia global del backend
+storage = get_storage_backend()
@@ -0,0 +1,333 @@
+# app/services/storage_reconciler.py - RECONCILIACIÓN STORAGE <-> BASE DE DATOS
+
+import asyncio
+import time
+import logging
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud.job_state import job_state_crud
+from app.models.vehicle import Vehicle, VehicleImage
+from app.services.image_service import ImageService, image_service
+from app.services.sprite_service import sprite_service
+from app.services.storage import StorageBackend, StoredObject
+
+logger = logging.getLogger(__name__)
+
+# En la BD (job_states), no en el storage: el storage es público
+STATE_NAME = "storage_reconcile"
+SCAN_PREFIX = "vehicles/"
+
+
+class StorageReconciler:
+    """Detecta y recupera archivos huérfanos y filas que apuntan a archivos inexistentes.
+
+    Trabaja por lotes: cada lote lista hasta batch_size objetos después del
+    cursor guardado y los cruza contra la BD con un solo IN sobre file_path
+    (indexado), así el trabajo por ejecución es acotado y se puede repartir
+    en el tiempo.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        images: ImageService,
+        batch_size: int = 500,
+        min_age_seconds: int = 3600
+    ):
+        self.storage = storage
+        self.images = images
+        self.batch_size = batch_size
+        self.min_age_seconds = min_age_seconds
+
+    # ===== ESTADO =====
+
+    def load_state(self, db: Session) -> dict:
+        state = job_state_crud.load(db, STATE_NAME)
+        return state if state is not None else {"cursor": "", "missing_after_id": 0, "passes": 0}
+
+    def save_state(self, db: Session, state: dict) -> None:
+        state["updated_at"] = time.time()
+        job_state_crud.save(db, STATE_NAME, state)
+
+    def reset_state(self, db: Session) -> None:
+        self.save_state(db, {"cursor": "", "missing_after_id": 0, "passes": 0})
+
+    # ===== CLASIFICACIÓN =====
+
+    def original_key_for(self, key: str) -> str:
+        """Clave del original al que pertenece un objeto (él mismo o su thumbnail)"""
+        if key.startswith("vehicles/thumbnails/"):
+            return key.replace("vehicles/thumbnails/", "vehicles/", 1)
+        return key
+
+    def referenced_keys(
+        self,
+        db: Session,
+        keys: Iterable[str],
+        include_inactive: bool = False
+    ) -> Set[str]:
+        """Claves de originales que alguna fila referencia.
+
+        Se compara por clave, no por file_path: las filas viejas guardan el
+        prefijo legacy 'static/uploads/' aunque UPLOAD_DIR sea otro. El IN va
+        sobre todas las variantes de file_path de cada clave (sigue usando
+        el índice) y lo encontrado se normaliza con key_from_file_path.
+
+        Con include_inactive=True las imágenes de vehículos dados de baja
+        (soft delete) se consideran recuperables.
+        """
+        keys = set(keys)
+        if not keys:
+            return set()
+
+        file_paths = [path for key in keys for path in self.images.file_path_candidates(key)]
+        query = db.query(VehicleImage.file_path).filter(VehicleImage.file_path.in_(file_paths))
+        if include_inactive:
+            query = query.join(Vehicle, Vehicle.id == VehicleImage.vehicle_id).filter(
+                Vehicle.is_active == True
+            )
+
+        return {self.images.key_from_file_path(row.file_path) for row in query.distinct()} & keys
+
+    def find_orphans(
+        self,
+        db: Session,
+        objects: List[StoredObject],
+        include_inactive: bool = False
+    ) -> List[StoredObject]:
+        """Objetos del lote que ninguna fila referencia (respetando la antigüedad mínima)"""
+        now = time.time()
+        candidates = [
+            obj for obj in objects
+            if now - obj.modified_at >= self.min_age_seconds
+        ]
+
+        original_of = {obj.key: self.original_key_for(obj.key) for obj in candidates}
+        referenced = self.referenced_keys(db, original_of.values(), include_inactive)
+
+        return [obj for obj in candidates if original_of[obj.key] not in referenced]
+
+    # ===== LOTES =====
+
+    def run_orphan_batch(
+        self,
+        db: Session,
+        delete: bool = False,
+        include_inactive: bool = False,
+        state: Optional[dict] = None
+    ) -> dict:
+        """Procesar el siguiente lote de objetos del storage"""
+        state = state if state is not None else self.load_state(db)
+        cursor = state.get("cursor", "")
+
+        objects = list(islice(
+            self.storage.iter_objects(SCAN_PREFIX, start_after=cursor),
+            self.batch_size
+        ))
+
+        orphans = self.find_orphans(db, objects, include_inactive)
+
+        reclaimed_bytes = 0
+        if delete and orphans:
+            # Revalidar justo antes de borrar, por si una subida los referenció recién
+            orphans = self.find_orphans(db, orphans, include_inactive)
+            for obj in orphans:
+                self.storage.delete(obj.key)
+                reclaimed_bytes += obj.size
+                logger.info(f"🗑️ Reclaimed orphan: {obj.key} ({obj.size} bytes)")
+
+        if objects:
+            state["cursor"] = objects[-1].key
+        else:
+            # Fin del recorrido: la próxima ejecución empieza de nuevo
+            state["cursor"] = ""
+            state["passes"] = state.get("passes", 0) + 1
+
+        return {
+            "scanned": len(objects),
+            "orphans": [{"key": obj.key, "size": obj.size} for obj in orphans],
+            "orphan_bytes": sum(obj.size for obj in orphans),
+            "reclaimed_bytes": reclaimed_bytes,
+            "deleted": delete,
+            "cursor": state["cursor"],
+            "completed_pass": not objects
+        }
+
+    def run_missing_batch(self, db: Session, state: Optional[dict] = None) -> dict:
+        """Revisar el siguiente lote de filas buscando archivos inexistentes"""
+        state = state if state is not None else self.load_state(db)
+        after_id = state.get("missing_after_id", 0)
+
+        rows = db.query(VehicleImage.id, VehicleImage.vehicle_id, VehicleImage.file_path).filter(
+            VehicleImage.id > after_id
+        ).order_by(VehicleImage.id).limit(self.batch_size).all()
+
+        missing = []
+        for row in rows:
+            original_key = self.images.key_from_file_path(row.file_path)
+            thumbnail_key = self.images.thumbnail_key_for(original_key)
+
+            missing_original = not self.storage.exists(original_key)
+            missing_thumbnail = not self.storage.exists(thumbnail_key)
+
+            if missing_original or missing_thumbnail:
+                missing.append({
+                    "image_id": row.id,
+                    "vehicle_id": row.vehicle_id,
+                    "file_path": row.file_path,
+                    "missing_original": missing_original,
+                    "missing_thumbnail": missing_thumbnail
+                })
+
+        state["missing_after_id"] = rows[-1].id if rows else 0
+
+        return {
+            "checked": len(rows),
+            "missing": missing,
+            "after_id": state["missing_after_id"]
+        }
+
+    def run_batch(self, db: Session, delete: bool = False, include_inactive: bool = False) -> dict:
+        """Un paso incremental: un lote de huérfanos, uno de faltantes y la poda de sprites"""
+        state = self.load_state(db)
+
+        report = {
+            "orphans": self.run_orphan_batch(db, delete, include_inactive, state),
+            "missing": self.run_missing_batch(db, state),
+            "sprites": sprite_service.prune(delete)
+        }
+
+        self.save_state(db, state)
+        return report
+
+    def run_full_pass(
+        self,
+        db: Session,
+        delete: bool = False,
+        include_inactive: bool = False,
+        max_batches: Optional[int] = None
+    ) -> dict:
+        """Recorrer todo el storage y todas las filas desde el cursor actual"""
+        totals = {
+            "scanned": 0,
+            "orphans": [],
+            "orphan_bytes": 0,
+            "reclaimed_bytes": 0,
+            "checked": 0,
+            "missing": [],
+            "batches": 0,
+            "sprites": sprite_service.prune(delete)
+        }
+        orphans_done = missing_done = False
+
+        while not (orphans_done and missing_done):
+            if max_batches is not None and totals["batches"] >= max_batches:
+                break
+
+            state = self.load_state(db)
+
+            if not orphans_done:
+                batch = self.run_orphan_batch(db, delete, include_inactive, state)
+                totals["scanned"] += batch["scanned"]
+                totals["orphans"].extend(batch["orphans"])
+                totals["orphan_bytes"] += batch["orphan_bytes"]
+                totals["reclaimed_bytes"] += batch["reclaimed_bytes"]
+                orphans_done = batch["completed_pass"]
+
+            if not missing_done:
+                batch = self.run_missing_batch(db, state)
+                totals["checked"] += batch["checked"]
+                totals["missing"].extend(batch["missing"])
+                missing_done = batch["checked"] == 0
+
+            self.save_state(db, state)
+            totals["batches"] += 1
+
+        return totals
+
+    # ===== REPORTE DE USO =====
+
+    def usage_page(self, db: Session, cursor: str = "", limit: int = 100) -> dict:
+        """Página del listado de storage con marca de referencia, más resumen de BD"""
+        objects = list(islice(self.storage.iter_objects(SCAN_PREFIX, start_after=cursor), limit))
+
+        original_of = {obj.key: self.original_key_for(obj.key) for obj in objects}
+        referenced = self.referenced_keys(db, original_of.values())
+
+        return {
+            "files": [
+                {
+                    "key": obj.key,
+                    "size": obj.size,
+                    "modified_at": obj.modified_at,
+                    "url": self.storage.url(obj.key),
+                    "referenced": original_of[obj.key] in referenced
+                }
+                for obj in objects
+            ],
+            "next_cursor": objects[-1].key if len(objects) == limit else None,
+            "summary": self.usage_summary(db)
+        }
+
+    def usage_summary(self, db: Session) -> Dict[str, int]:
+        """Totales desde la BD, sin recorrer el storage"""
+        total_images = db.query(func.count(VehicleImage.id)).scalar() or 0
+        unique_files = db.query(func.count(func.distinct(VehicleImage.file_path))).scalar() or 0
+
+        distinct_files = db.query(
+            VehicleImage.file_path,
+            func.max(VehicleImage.file_size).label("file_size")
+        ).group_by(VehicleImage.file_path).subquery()
+        stored_bytes = db.query(func.sum(distinct_files.c.file_size)).scalar() or 0
+
+        return {
+            "total_images": total_images,
+            "unique_files": unique_files,
+            "original_bytes": int(stored_bytes)
+        }
+
+
+# Instancia global
+storage_reconciler = StorageReconciler(
+    storage=image_service.storage,
+    images=image_service,
+    batch_size=settings.STORAGE_GC_BATCH_SIZE,
+    min_age_seconds=settings.STORAGE_GC_MIN_AGE_SECONDS
+)
+
+
+def _run_scheduled_batch() -> dict:
+    db = SessionLocal()
+    try:
+        return storage_reconciler.run_batch(
+            db,
+            delete=settings.STORAGE_GC_DELETE,
+            include_inactive=settings.STORAGE_GC_INCLUDE_INACTIVE
+        )
+    finally:
+        db.close()
+
+
+async def storage_gc_loop() -> None:
+    """Tarea periódica: un lote incremental cada STORAGE_GC_INTERVAL_MINUTES"""
+    interval = settings.STORAGE_GC_INTERVAL_MINUTES * 60
+    logger.info(f"🧹 Storage GC scheduled every {settings.STORAGE_GC_INTERVAL_MINUTES} min")
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            report = await run_in_threadpool(_run_scheduled_batch)
+            logger.info(
+                f"🧹 Storage GC: scanned={report['orphans']['scanned']} "
+                f"orphans={len(report['orphans']['orphans'])} "
+                f"reclaimed={report['orphans']['reclaimed_bytes']} "
+                f"missing={len(report['missing']['missing'])} "
+                f"sprites_expired={report['sprites']['expired']}"
+            )
+        except Exception as e:
+            logger.error(f"❌ Storage GC failed: {e}")
@@ -0,0 +1,151 @@
+# app/utils/file_serving.py - SERVIDO DE ARCHIVOS SUBIDOS
+
+import os
+import stat
+import mimetypes
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+import aiofiles
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# Los nombres de archivo nunca cambian de contenido, se pueden cachear para siempre
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+# Algunas versiones de Python no traen webp en la tabla de tipos
+mimetypes.add_type("image/webp", ".webp")
+
+
+def resolve_upload_path(root: str, relative_path: str) -> Optional[str]:
+    """Resolver una ruta relativa dentro de root, o None si intenta salir de ella"""
+    root_abs = os.path.abspath(root)
+    candidate = os.path.normpath(os.path.join(root_abs, relative_path.lstrip("/\\")))
+
+    if not candidate.startswith(root_abs + os.sep):
+        return None
+
+    return candidate
+
+
+def _make_etag(st: os.stat_result) -> str:
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def _is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Evaluar If-None-Match / If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= int(since)
+
+    return False
+
+
+def _parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """Parsear un único rango 'bytes=start-end'.
+
+    Devuelve (start, end) inclusivo, None si el rango debe ignorarse
+    (múltiples rangos o unidad desconocida) y lanza ValueError si no es satisfacible.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_str, _, end_str = spec.strip().partition("-")
+
+    if start_str == "":
+        # Sufijo: últimos N bytes
+        suffix = int(end_str)
+        if suffix <= 0:
+            raise ValueError("Empty suffix range")
+        return max(file_size - suffix, 0), file_size - 1
+
+    start = int(start_str)
+    end = int(end_str) if end_str else file_size - 1
+
+    if start >= file_size or end < start:
+        raise ValueError("Unsatisfiable range")
+
+    return start, min(end, file_size - 1)
+
+
+async def _iter_file_range(path: str, start: int, length: int):
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_file(request: Request, full_path: str) -> Response:
+    """Servir un archivo con un solo stat, validadores, Range y cache inmutable"""
+    try:
+        st = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        logger.debug("File not found: %s", full_path)
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    if not stat.S_ISREG(st.st_mode):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = _make_etag(st)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _is_not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = _parse_range(range_header, st.st_size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{st.st_size}"}
+            )
+
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            return StreamingResponse(
+                _iter_file_range(full_path, start, length),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{st.st_size}",
+                    "Content-Length": str(length),
+                }
+            )
+
+    # FileResponse reutiliza el stat ya hecho y envía el archivo en bloques
+    return FileResponse(
+        full_path,
+        media_type=media_type,
+        headers=headers,
+        stat_result=st
+    )
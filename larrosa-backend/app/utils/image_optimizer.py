@@ -0,0 +1,211 @@
+# app/utils/image_optimizer.py - OPTIMIZACIÓN DE IMÁGENES SUBIDAS
+
+import io
+import logging
+from typing import Optional, Tuple
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Formatos con pérdida donde tiene sentido elegir calidad
+LOSSY_FORMATS = ("JPEG", "WEBP")
+
+# Lado de la región central comparada a resolución real (SSIM); reducir la
+# imagen escondería justamente los artefactos del encoder
+SSIM_COMPARE_SIZE = 512
+SSIM_BLOCK = 8
+
+
+# reduce() por factor entero hasta quedar a >= REDUCING_GAP veces el destino;
+# el LANCZOS final sobre ese margen mantiene la calidad
+REDUCING_GAP = 2.0
+
+
+def fit_size(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Tamaño que entra en box manteniendo la proporción (sin agrandar)"""
+    width, height = size
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def draft_for(img: Image.Image, target_size: Tuple[int, int]) -> None:
+    """Decodificar JPEG directamente a 1/2, 1/4 o 1/8 si el destino es mucho menor.
+
+    Debe llamarse antes de cargar los píxeles. draft() elige la mayor
+    reducción que deja la imagen >= REDUCING_GAP veces el destino.
+    """
+    if img.format != "JPEG":
+        return
+    requested = (
+        int(target_size[0] * REDUCING_GAP),
+        int(target_size[1] * REDUCING_GAP)
+    )
+    if requested[0] < img.width or requested[1] < img.height:
+        img.draft(img.mode, requested)
+
+
+def resize_to(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Redimensionar con reduce() previo y LANCZOS final"""
+    if img.size == size:
+        return img.copy()
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+
+def prepare_image(img: Image.Image, image_format: str, max_dimension: int) -> Image.Image:
+    """Aplicar la orientación EXIF, limitar el tamaño y ajustar el modo al formato.
+
+    Recibe la imagen recién abierta (sin cargar) para poder decodificar
+    JPEG a escala. Se redimensiona antes de rotar, así solo se copia la
+    versión ya reducida. Devuelve una imagen nueva sin metadatos: al
+    re-codificar solo se conserva lo que se pase explícitamente (perfil ICC).
+    """
+    icc_profile = img.info.get("icc_profile")
+    transparency = img.info.get("transparency")
+
+    # El box es cuadrado, así que la orientación no cambia el tamaño destino
+    box = (max_dimension, max_dimension) if max_dimension else img.size
+    target = fit_size(img.size, box)
+    draft_for(img, target)
+
+    resized = resize_to(img, target)
+    prepared = ImageOps.exif_transpose(resized)
+
+    if image_format == "JPEG" and prepared.mode not in ("RGB", "L"):
+        prepared = prepared.convert("RGB")
+    elif image_format == "WEBP" and prepared.mode not in ("RGB", "RGBA"):
+        prepared = prepared.convert("RGBA" if "A" in prepared.getbands() else "RGB")
+
+    # Solo perfil de color y transparencia de paleta; EXIF, GPS, XMP y comentarios se descartan
+    prepared.info = {}
+    if icc_profile:
+        prepared.info["icc_profile"] = icc_profile
+    if transparency is not None and prepared.mode == img.mode:
+        prepared.info["transparency"] = transparency
+    return prepared
+
+
+def make_thumbnail(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Variante reducida de una imagen ya preparada (no la modifica)"""
+    return resize_to(img, fit_size(img.size, size))
+
+
+def encode_image(img: Image.Image, image_format: str, quality: int) -> bytes:
+    """Codificar con los parámetros ajustados de cada formato"""
+    options = {}
+    if img.info.get("icc_profile"):
+        options["icc_profile"] = img.info["icc_profile"]
+
+    if image_format == "JPEG":
+        options.update(quality=quality, optimize=True, progressive=True)
+    elif image_format == "WEBP":
+        options.update(quality=quality, method=4)
+    elif image_format == "PNG":
+        options.update(optimize=True)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def structural_similarity(reference: Image.Image, candidate: Image.Image) -> float:
+    """SSIM medio por bloques de 8x8, en grises, sobre la región central.
+
+    Es una aproximación (ventanas sin solapamiento, sin gaussiana), suficiente
+    para comparar calidades de un mismo encoder entre sí.
+    """
+    ref = reference.convert("L")
+    cand = candidate.convert("L")
+    if cand.size != ref.size:
+        cand = cand.resize(ref.size, Image.Resampling.BILINEAR)
+
+    width, height = ref.size
+    crop_w = min(width, SSIM_COMPARE_SIZE)
+    crop_h = min(height, SSIM_COMPARE_SIZE)
+    box = (
+        (width - crop_w) // 2,
+        (height - crop_h) // 2,
+        (width - crop_w) // 2 + crop_w,
+        (height - crop_h) // 2 + crop_h
+    )
+    ref = ref.crop(box)
+    cand = cand.crop(box)
+
+    width, height = ref.size
+    ref_px = ref.tobytes()
+    cand_px = cand.tobytes()
+
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    n = SSIM_BLOCK * SSIM_BLOCK
+
+    total = 0.0
+    blocks = 0
+    for by in range(0, height - SSIM_BLOCK + 1, SSIM_BLOCK):
+        for bx in range(0, width - SSIM_BLOCK + 1, SSIM_BLOCK):
+            xs = []
+            ys = []
+            for row in range(by, by + SSIM_BLOCK):
+                offset = row * width + bx
+                xs.extend(ref_px[offset:offset + SSIM_BLOCK])
+                ys.extend(cand_px[offset:offset + SSIM_BLOCK])
+
+            mean_x = sum(xs) / n
+            mean_y = sum(ys) / n
+            var_x = sum(x * x for x in xs) / n - mean_x * mean_x
+            var_y = sum(y * y for y in ys) / n - mean_y * mean_y
+            cov = sum(x * y for x, y in zip(xs, ys)) / n - mean_x * mean_y
+
+            total += ((2 * mean_x * mean_y + c1) * (2 * cov + c2)) / (
+                (mean_x * mean_x + mean_y * mean_y + c1) * (var_x + var_y + c2)
+            )
+            blocks += 1
+
+    return total / blocks if blocks else 1.0
+
+
+def search_quality(
+    img: Image.Image,
+    image_format: str,
+    target_ssim: float,
+    min_quality: int,
+    max_quality: int
+) -> Tuple[bytes, int]:
+    """Búsqueda binaria de la menor calidad que alcanza target_ssim"""
+    best: Optional[Tuple[bytes, int]] = None
+    low, high = min_quality, max_quality
+
+    while low <= high:
+        quality = (low + high) // 2
+        data = encode_image(img, image_format, quality)
+        with Image.open(io.BytesIO(data)) as decoded:
+            score = structural_similarity(img, decoded)
+
+        if score >= target_ssim:
+            best = (data, quality)
+            high = quality - 1
+        else:
+            low = quality + 1
+
+    if best is None:
+        # Ninguna calidad del rango alcanza el objetivo: usar la máxima
+        return encode_image(img, image_format, max_quality), max_quality
+
+    return best
+
+
+def optimize_image(
+    img: Image.Image,
+    image_format: str,
+    default_quality: int,
+    target_ssim: float = 0.0,
+    min_quality: int = 60,
+    max_quality: int = 90
+) -> Tuple[bytes, int]:
+    """Codificar una imagen ya preparada. Devuelve (bytes, calidad usada)"""
+    if target_ssim and image_format in LOSSY_FORMATS:
+        data, quality = search_quality(img, image_format, target_ssim, min_quality, max_quality)
+        logger.debug(f"🎯 Quality {quality} for SSIM >= {target_ssim}")
+        return data, quality
+
+    return encode_image(img, image_format, default_quality), default_quality
+
@@ -0,0 +1,146 @@
+# app/utils/image_sniff.py - DETECCIÓN DE FORMATO Y DIMENSIONES POR CABECERA
+
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+# Bytes que se leen antes de aceptar el resto de la subida. Alcanza para
+# reconocer cualquier formato; en JPEG el SOF puede estar después del EXIF
+SNIFF_BYTES = 64 * 1024
+
+# Formatos aceptados: formato Pillow -> (extensión, MIME)
+SUPPORTED_FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "PNG": ("png", "image/png"),
+    "WEBP": ("webp", "image/webp"),
+}
+
+# Marcadores SOF de JPEG (todos menos DHT=C4, JPG=C8 y DAC=CC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Marcadores sin campo de longitud
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+@dataclass
+class SniffedImage:
+    """Resultado de leer la cabecera. width/height son None si no alcanzaron los bytes"""
+    format: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+    @property
+    def supported(self) -> bool:
+        return self.format in SUPPORTED_FORMATS
+
+    @property
+    def extension(self) -> str:
+        return SUPPORTED_FORMATS[self.format][0]
+
+    @property
+    def mime_type(self) -> str:
+        return SUPPORTED_FORMATS[self.format][1]
+
+    @property
+    def pixels(self) -> Optional[int]:
+        if self.width is None or self.height is None:
+            return None
+        return self.width * self.height
+
+
+def _jpeg_size(data: bytes):
+    """Recorrer los segmentos hasta el SOF sin decodificar nada"""
+    i = 2
+    length = len(data)
+    while i < length:
+        if data[i] != 0xFF:
+            return None
+        # Bytes de relleno 0xFF entre segmentos
+        while i < length and data[i] == 0xFF:
+            i += 1
+        if i >= length:
+            return None
+
+        marker = data[i]
+        i += 1
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            # Fin de imagen o inicio de datos sin haber visto SOF
+            return None
+        if i + 2 > length:
+            return None
+
+        segment_length = struct.unpack(">H", data[i:i + 2])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 7 > length:
+                return None
+            height, width = struct.unpack(">HH", data[i + 3:i + 7])
+            return width, height
+        i += segment_length
+    return None
+
+
+def _png_size(data: bytes):
+    if len(data) < 24 or data[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", data[16:24])
+
+
+def _webp_size(data: bytes):
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+
+    if chunk == b"VP8 ":
+        # Frame con pérdida: start code 9d 01 2a y tamaños de 14 bits
+        if data[23:26] != b"\x9d\x01\x2a":
+            return None
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+
+    if chunk == b"VP8L":
+        # Sin pérdida: firma 0x2f y tamaños de 14 bits empaquetados
+        if data[20] != 0x2F:
+            return None
+        b0, b1, b2, b3 = data[21:25]
+        width = 1 + (b0 | ((b1 & 0x3F) << 8))
+        height = 1 + ((b1 >> 6) | (b2 << 2) | ((b3 & 0x0F) << 10))
+        return width, height
+
+    if chunk == b"VP8X":
+        # Extendido: tamaño del canvas en 24 bits
+        width = 1 + int.from_bytes(data[24:27], "little")
+        height = 1 + int.from_bytes(data[27:30], "little")
+        return width, height
+
+    return None
+
+
+def sniff_image(data: bytes) -> Optional[SniffedImage]:
+    """Identificar formato y dimensiones mirando solo la cabecera.
+
+    Devuelve None si los bytes no corresponden a ninguna imagen conocida.
+    Para formatos no soportados devuelve el nombre sin dimensiones.
+    """
+    if data[:3] == b"\xff\xd8\xff":
+        size = _jpeg_size(data)
+        return SniffedImage("JPEG", *size) if size else SniffedImage("JPEG")
+
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        size = _png_size(data)
+        return SniffedImage("PNG", *size) if size else SniffedImage("PNG")
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        size = _webp_size(data)
+        return SniffedImage("WEBP", *size) if size else SniffedImage("WEBP")
+
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return SniffedImage("GIF")
+    if data[:2] == b"BM":
+        return SniffedImage("BMP")
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return SniffedImage("TIFF")
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"mif1", b"msf1", b"avif"):
+        return SniffedImage("AVIF" if data[8:12] == b"avif" else "HEIC")
+
+    return None
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Script para generar placeholders (LQIP) de imágenes ya existentes
+Ejecutar: docker-compose exec backend python backfill_placeholders.py
+"""
+import os
+import sys
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
+
+from app.core.database import SessionLocal
+from app.models.vehicle import VehicleImage
+from app.services.image_service import image_service
+
+def backfill(batch_size: int):
+    """Procesar en lotes las imágenes sin placeholder"""
+    db = SessionLocal()
+    processed = 0
+    failed_ids = set()
+    
+    try:
+        while True:
+            query = db.query(VehicleImage).filter(VehicleImage.placeholder.is_(None))
+            if failed_ids:
+                query = query.filter(VehicleImage.id.notin_(failed_ids))
+            
+            batch = query.order_by(VehicleImage.id).limit(batch_size).all()
+            if not batch:
+                break
+            
+            for db_image in batch:
+                try:
+                    if image_service.backfill_placeholder(db_image):
+                        processed += 1
+                    else:
+                        failed_ids.add(db_image.id)
+                except Exception as e:
+                    print(f"❌ Error en imagen {db_image.id}: {e}")
+                    failed_ids.add(db_image.id)
+            
+            db.commit()
+            print(f"✅ {processed} placeholders generados")
+        
+        print(f"\n🏁 Listo: {processed} generados, {len(failed_ids)} sin archivo o con error")
+        
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generar placeholders faltantes")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    
+    print("🖼️ Generando placeholders de imágenes existentes...")
+    backfill(args.batch_size)
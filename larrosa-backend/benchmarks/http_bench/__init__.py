@@ -0,0 +1,9 @@
+"""
+Benchmark HTTP de la API de vehículos e imágenes
+Ejecutar (desde larrosa-backend): python -m benchmarks.http_bench [--scale 1k] [--database-url postgresql://...]
+
+Levanta la app con uvicorn contra una base sembrada a la escala pedida
+(SQLite por defecto, o un Postgres local), genera carga concurrente sobre
+cada escenario y guarda latencias (p50/p95/p99), throughput y sentencias
+SQL por request en un JSON, para comparar corridas entre commits.
+"""
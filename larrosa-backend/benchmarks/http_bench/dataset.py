@@ -0,0 +1,57 @@
+"""
+Siembra de la base del benchmark con generate_dataset.py y un usuario admin
+
+Se importa después de fijar DATABASE_URL, porque app.core.database crea el
+engine al importarse. Los datos son deterministas (semilla fija) para que
+dos corridas a la misma escala midan lo mismo.
+"""
+from sqlalchemy import func
+from app.core.database import Base, SessionLocal, engine
+from app.core.security import pwd_context
+from app.models.user import User
+from app.models.vehicle import Vehicle
+from generate_dataset import CATALOG, TYPES, generate
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench-password"
+SEED = 42
+
+# Marca -> modelos, para armar búsquedas que encuentren resultados
+BRANDS = {}
+for brand, model, *_ in CATALOG:
+    BRANDS.setdefault(brand, []).append(model)
+
+
+def is_seeded(scale: int) -> bool:
+    db = SessionLocal()
+    try:
+        vehicles = db.query(func.count(Vehicle.id)).scalar()
+        has_user = db.query(User).filter(User.username == BENCH_USERNAME).first() is not None
+        return vehicles == scale and has_user
+    except Exception:
+        return False
+    finally:
+        db.close()
+
+
+def seed(scale: int, images_per_vehicle: int = 3, reseed: bool = False) -> bool:
+    """Crear el esquema y sembrar la base. Devuelve False si ya estaba sembrada"""
+    if not reseed and is_seeded(scale):
+        return False
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            "username": BENCH_USERNAME,
+            "email": "bench@larrosacamiones.com",
+            "hashed_password": pwd_context.hash(BENCH_PASSWORD),
+            "full_name": "Benchmark",
+            "is_active": True,
+            "is_superuser": True,
+        }])
+
+    result = generate(vehicles=scale, images_per_vehicle=images_per_vehicle, seed=SEED)
+    print(f"🌱 Sembrados {result['vehicles']} vehículos y {result['images']} imágenes")
+    return True
@@ -0,0 +1,101 @@
+"""
+Generador de carga: N threads con conexiones HTTP persistentes (http.client)
+"""
+import re
+import time
+import random
+import threading
+import http.client
+from collections import Counter
+
+# db;dur=1.2;desc="3 queries" (lo agrega el profiler de SQL de la app)
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Samples:
+    """Mediciones de un escenario, acumuladas por todos los threads"""
+
+    def __init__(self):
+        self.latencies = []
+        self.db_queries = []
+        self.db_ms = []
+        self.statuses = Counter()
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def add(self, latency, status, server_timing):
+        match = SERVER_TIMING_DB.search(server_timing or "")
+        with self.lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+            if match:
+                self.db_ms.append(float(match.group(1)))
+                self.db_queries.append(int(match.group(2)))
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "errors": self.errors + sum(n for status, n in self.statuses.items() if status >= 500),
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+            "throughput_rps": count / elapsed if elapsed else 0.0,
+            "latency_ms": {
+                "mean": sum(latencies) / count * 1000 if count else 0.0,
+                "p50": percentile(latencies, 0.50) * 1000,
+                "p95": percentile(latencies, 0.95) * 1000,
+                "p99": percentile(latencies, 0.99) * 1000,
+                "max": latencies[-1] * 1000 if count else 0.0,
+            },
+            "db_queries_per_request": sum(self.db_queries) / len(self.db_queries) if self.db_queries else None,
+            "db_ms_per_request": sum(self.db_ms) / len(self.db_ms) if self.db_ms else None,
+        }
+
+
+def run_scenario(port, build_request, ctx, concurrency, duration, warmup, seed=0):
+    """Carga en lazo cerrado durante `duration` segundos después del warmup"""
+    samples = Samples()
+    started = time.monotonic()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            method, path, body, headers = build_request(rng, ctx)
+            try:
+                request_started = time.perf_counter()
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                latency = time.perf_counter() - request_started
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                if now >= measure_from:
+                    with samples.lock:
+                        samples.errors += 1
+                continue
+            if now >= measure_from:
+                samples.add(latency, response.status, response.getheader("Server-Timing"))
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return samples.summary(duration)
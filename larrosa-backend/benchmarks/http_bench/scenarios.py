@@ -0,0 +1,102 @@
+"""
+Escenarios del benchmark: cada uno arma una request aleatoria (determinista por thread)
+"""
+import io
+import json
+import random
+import uuid
+from urllib.parse import urlencode
+from PIL import Image
+from benchmarks.http_bench.dataset import BENCH_PASSWORD, BENCH_USERNAME, BRANDS, TYPES
+
+API = "/api/v1"
+
+
+class Context:
+    """Datos compartidos por los escenarios: escala, token y fotos para subir"""
+
+    def __init__(self, scale: int, token: str, upload_images: int = 64):
+        self.scale = scale
+        self.token = token
+        self.images = [self.make_image(seed) for seed in range(upload_images)]
+        self.uploads = 0
+
+    @staticmethod
+    def make_image(seed: int) -> bytes:
+        """JPEG 1280x960 con ruido: contenido distinto para que no se deduplique"""
+        rng = random.Random(seed)
+        img = Image.effect_noise((1280, 960), 64).convert("RGB")
+        img.paste((rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)), (0, 0, 320, 240))
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=90)
+        return buffer.getvalue()
+
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+def list_page(rng, ctx):
+    page = rng.randint(0, min(ctx.scale // 20, 50))
+    return "GET", f"{API}/vehicles/?" + urlencode({"skip": page * 20, "limit": 20}), None, {}
+
+
+def search(rng, ctx):
+    brand = rng.choice(list(BRANDS))
+    term = rng.choice([brand, rng.choice(BRANDS[brand]).split()[0]])
+    return "GET", f"{API}/vehicles/?" + urlencode({"search": term, "limit": 20}), None, {}
+
+
+def filters(rng, ctx):
+    year_min = rng.randint(2000, 2020)
+    params = {
+        "vehicle_type": rng.choice(list(TYPES)),
+        "year_min": year_min,
+        "year_max": year_min + 5,
+        "km_max": rng.choice([200_000, 500_000, 1_000_000]),
+        "status": "Disponible",
+        "limit": 20,
+    }
+    return "GET", f"{API}/vehicles/?" + urlencode(params), None, {}
+
+
+def detail(rng, ctx):
+    return "GET", f"{API}/vehicles/{rng.randint(1, ctx.scale)}", None, {}
+
+
+def featured(rng, ctx):
+    return "GET", f"{API}/vehicles/featured?limit=4", None, {}
+
+
+def stats(rng, ctx):
+    return "GET", f"{API}/vehicles/stats", None, {}
+
+
+def login(rng, ctx):
+    body = json.dumps({"username": BENCH_USERNAME, "password": BENCH_PASSWORD}).encode()
+    return "POST", f"{API}/auth/login-json", body, {"Content-Type": "application/json"}
+
+
+def upload(rng, ctx):
+    """Una foto por request; el pie de página cambia los bytes para evitar el dedupe"""
+    ctx.uploads += 1
+    content = ctx.images[ctx.uploads % len(ctx.images)] + uuid.uuid4().bytes
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="images"; filename="bench.jpg"\r\n'
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}", **ctx.auth()}
+    return "POST", f"{API}/vehicles/{rng.randint(1, ctx.scale)}/images", body, headers
+
+
+SCENARIOS = {
+    "list": list_page,
+    "search": search,
+    "filters": filters,
+    "detail": detail,
+    "featured": featured,
+    "stats": stats,
+    "login": login,
+    "upload": upload,
+}
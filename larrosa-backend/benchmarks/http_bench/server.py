@@ -0,0 +1,76 @@
+"""
+Levantar la app con uvicorn en un proceso aparte para el benchmark
+"""
+import os
+import sys
+import time
+import socket
+import subprocess
+import http.client
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class AppServer:
+    """uvicorn con la configuración del benchmark; usar como context manager"""
+
+    def __init__(self, database_url: str, upload_dir: str, workers: int = 1, env: dict = None):
+        self.port = free_port()
+        self.workers = workers
+        self.env = {
+            **os.environ,
+            "DATABASE_URL": database_url,
+            "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark-secret-key"),
+            "ENVIRONMENT": "benchmark",
+            "UPLOAD_DIR": upload_dir,
+            "LOG_LEVEL": "WARNING",
+            # Server-Timing trae las sentencias SQL por request
+            "SQL_PROFILER_ENABLED": "true",
+            "SQL_SLOW_QUERY_MS": "0",
+            # Los avisos de N+1 se repetirían en cada request
+            "LOG_LEVELS": '{"app.core.sql_profiler": "ERROR"}',
+            # El escenario de login mide bcrypt, no el rate limiter
+            "LOGIN_RATE_LIMIT_ENABLED": "false",
+            **(env or {})
+        }
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--host", "127.0.0.1", "--port", str(self.port),
+                "--workers", str(self.workers), "--log-level", "warning"
+            ],
+            cwd=BACKEND_DIR,
+            env=self.env
+        )
+        self.wait_ready()
+        return self
+
+    def wait_ready(self, timeout: float = 30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn terminó con código {self.process.returncode}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=1)
+                conn.request("GET", "/health")
+                if conn.getresponse().status == 200:
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError("uvicorn no respondió a /health")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
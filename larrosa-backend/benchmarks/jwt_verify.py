@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark de verificación de JWT: jose directo vs clave pre-construida vs cache
+Ejecutar: SECRET_KEY=... DATABASE_URL=sqlite:// python benchmarks/jwt_verify.py [--iterations 20000]
+
+Mide verificaciones por segundo de:
+  - jose con la clave como string (como se hacía antes)
+  - jose con la clave construida una vez (JWT_KEY)
+  - verify_token sin cache (cada token es nuevo)
+  - verify_token con cache (el mismo token repetido, como en el panel admin)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from jose import jwt
+from app.core.config import settings
+from app.core.security import JWT_KEY, create_access_token, token_cache, verify_token
+
+
+def measure(name, fn, tokens, iterations):
+    """Ejecutar fn sobre los tokens en ronda y devolver ops/s"""
+    count = len(tokens)
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(tokens[i % count])
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_second": iterations / elapsed,
+        "us_per_op": elapsed / iterations * 1_000_000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de verificación de JWT")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens distintos en ronda para los casos con cache")
+    parser.add_argument("--json", action="store_true", help="Imprimir los resultados en JSON")
+    args = parser.parse_args()
+
+    tokens = [create_access_token(f"user{i}") for i in range(args.tokens)]
+    # Suficientes tokens únicos para que la cache nunca acierte
+    cold_tokens = [create_access_token(f"cold{i}") for i in range(args.iterations)]
+
+    def jose_string_key(token):
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    def jose_prebuilt_key(token):
+        return jwt.decode(token, JWT_KEY, algorithms=[settings.ALGORITHM])
+
+    token_cache.clear()
+    results = [
+        measure("jose (clave string)", jose_string_key, tokens, args.iterations),
+        measure("jose (clave pre-construida)", jose_prebuilt_key, tokens, args.iterations),
+        measure("verify_token sin cache", verify_token, cold_tokens, args.iterations),
+    ]
+
+    token_cache.clear()
+    for token in tokens:
+        verify_token(token)
+    results.append(measure("verify_token con cache", verify_token, tokens, args.iterations))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"🔐 {args.iterations} verificaciones, algoritmo {settings.ALGORITHM}")
+    print(f"{'caso':<30} {'ops/s':>12} {'µs/op':>10}")
+    for r in results:
+        print(f"{r['name']:<30} {r['ops_per_second']:>12.0f} {r['us_per_op']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
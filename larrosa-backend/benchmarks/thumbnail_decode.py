@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark del pipeline de imágenes: decodificación completa vs decodificación a escala
+Ejecutar: python benchmarks/thumbnail_decode.py [--corpus ../assets/imagenes] [--repeat 3]
+
+Cada modo corre en su propio proceso para medir el pico de memoria (RSS)
+sin que uno contamine al otro. Los archivos que Pillow no puede abrir
+(ej: HEIC) se ignoran.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image, ImageOps
+
+from app.utils.image_optimizer import prepare_image, make_thumbnail, encode_image
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'imagenes')
+MAX_DIMENSION = 2048
+THUMBNAIL_SIZE = (400, 300)
+QUALITY = 82
+
+
+def load_corpus(corpus):
+    """Leer a memoria los archivos del corpus que Pillow puede decodificar"""
+    files = []
+    for root, _, names in os.walk(corpus):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                with Image.open(io.BytesIO(content)) as img:
+                    img.verify()
+            except Exception:
+                continue
+            files.append((name, content))
+    return files
+
+
+def process_full(content):
+    """Pipeline anterior: decodificar a resolución completa y después reducir"""
+    with Image.open(io.BytesIO(content)) as source:
+        image_format = source.format
+        source.load()
+        img = ImageOps.exif_transpose(source)
+    img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS, reducing_gap=None)
+    original = encode_image(img, image_format, QUALITY)
+    img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS, reducing_gap=None)
+    return original, encode_image(img, image_format, QUALITY)
+
+
+def process_scaled(content):
+    """Pipeline actual: draft()/reduce() y LANCZOS final"""
+    with Image.open(io.BytesIO(content)) as source:
+        image_format = source.format
+        img = prepare_image(source, image_format, MAX_DIMENSION)
+    original = encode_image(img, image_format, QUALITY)
+    return original, encode_image(make_thumbnail(img, THUMBNAIL_SIZE), image_format, QUALITY)
+
+
+def thumbnail_full(content):
+    """Solo thumbnail, decodificando a resolución completa"""
+    with Image.open(io.BytesIO(content)) as source:
+        image_format = source.format
+        source.load()
+        img = ImageOps.exif_transpose(source)
+    img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS, reducing_gap=None)
+    return encode_image(img, image_format, QUALITY)
+
+
+def thumbnail_scaled(content):
+    """Solo thumbnail, con draft() directo al tamaño del thumbnail"""
+    with Image.open(io.BytesIO(content)) as source:
+        image_format = source.format
+        img = prepare_image(source, image_format, max(THUMBNAIL_SIZE))
+    return encode_image(make_thumbnail(img, THUMBNAIL_SIZE), image_format, QUALITY)
+
+
+# Pares antes/después: pipeline completo de subida y generación de un thumbnail
+MODES = {
+    "full": process_full,
+    "scaled": process_scaled,
+    "thumb-full": thumbnail_full,
+    "thumb-scaled": thumbnail_scaled,
+}
+
+
+def run_worker(mode, corpus, repeat, max_dimension):
+    """Medir un modo dentro del proceso actual e imprimir el resultado en JSON"""
+    global MAX_DIMENSION
+    MAX_DIMENSION = max_dimension
+
+    files = load_corpus(corpus)
+    process = MODES[mode]
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    timings = []
+    for _ in range(repeat):
+        for _, content in files:
+            start = time.perf_counter()
+            process(content)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings.sort()
+    print(json.dumps({
+        "mode": mode,
+        "images": len(files),
+        "runs": len(timings),
+        "ms_per_image": sum(timings) / len(timings) if timings else 0,
+        "p50_ms": timings[len(timings) // 2] if timings else 0,
+        "max_ms": timings[-1] if timings else 0,
+        # ru_maxrss está en KB en Linux
+        "peak_rss_mb": peak_rss / 1024,
+        "peak_rss_delta_mb": (peak_rss - baseline_rss) / 1024
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de decodificación de thumbnails")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Directorio con fotos de prueba")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-dimension", type=int, default=MAX_DIMENSION, help="Lado máximo del original guardado")
+    parser.add_argument("--json", action="store_true", help="Imprimir los resultados en JSON")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--worker", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.corpus, args.repeat, args.max_dimension)
+        return
+
+    results = []
+    for mode in args.modes:
+        output = subprocess.run(
+            [
+                sys.executable, os.path.abspath(__file__),
+                "--worker", mode,
+                "--corpus", args.corpus,
+                "--repeat", str(args.repeat),
+                "--max-dimension", str(args.max_dimension)
+            ],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        results.append(json.loads(output.stdout))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"🖼️ Corpus: {os.path.abspath(args.corpus)} ({results[0]['images']} imágenes x {args.repeat})")
+    print(f"{'modo':<13} {'ms/imagen':>10} {'p50 ms':>8} {'max ms':>8} {'pico RSS MB':>12} {'Δ RSS MB':>9}")
+    for r in results:
+        print(
+            f"{r['mode']:<13} {r['ms_per_image']:>10.1f} {r['p50_ms']:>8.1f} {r['max_ms']:>8.1f} "
+            f"{r['peak_rss_mb']:>12.1f} {r['peak_rss_delta_mb']:>9.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
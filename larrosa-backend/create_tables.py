@@ -7,6 +7,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
 from app.core.database import engine, Base
 from app.models.user import User
 from app.models.vehicle import Vehicle, VehicleImage
+from app.models.job_state import JobState
 
 def create_tables():
     """Crear todas las tablas en la base de datos"""
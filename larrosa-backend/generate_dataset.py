@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Generador de catálogos sintéticos para pruebas de capacidad
+Ejecutar: docker-compose exec backend python generate_dataset.py --vehicles 1000000 [--truncate] [--image-files 50]
+
+Genera vehículos con distribuciones realistas (marcas y modelos con pesos,
+kilometraje correlacionado con el año, precio según modelo, antigüedad y
+km) y sus filas de imágenes. En PostgreSQL carga con COPY por lotes (millones
+de filas en minutos); en SQLite u otros motores usa executemany.
+
+Con --image-files N se generan N imágenes reales (original y thumbnail en el
+storage) y las filas se reparten entre ellas; sin eso las filas apuntan a
+archivos inexistentes, suficiente para medir consultas.
+"""
+import io
+import os
+import csv
+import sys
+import time
+import random
+import argparse
+import hashlib
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
+
+from sqlalchemy import func, select, text
+from app.core.config import settings
+from app.core.database import Base, engine
+from app.models.user import User  # noqa: F401 - la FK de vehicles necesita la tabla users
+from app.models.vehicle import Vehicle, VehicleImage
+
+CURRENT_YEAR = datetime.now().year
+
+# (marca, modelo, tipo, HP, precio 0 km en USD, peso relativo)
+CATALOG = [
+    ("Scania", "R450", "camion-tractor", 450, 165000, 9),
+    ("Scania", "G410", "camion-tractor", 410, 150000, 7),
+    ("Scania", "P310", "camion-chasis", 310, 120000, 4),
+    ("Volvo", "FH 460", "camion-tractor", 460, 170000, 8),
+    ("Volvo", "FM 400", "camion-tractor", 400, 150000, 4),
+    ("Volvo", "VM 330", "camion-chasis", 330, 115000, 4),
+    ("Mercedes-Benz", "Actros 2646", "camion-tractor", 460, 160000, 7),
+    ("Mercedes-Benz", "Axor 2041", "camion-tractor", 408, 130000, 6),
+    ("Mercedes-Benz", "Atego 1726", "camion-chasis", 256, 95000, 6),
+    ("Mercedes-Benz", "Sprinter 416", "utilitarios", 163, 55000, 5),
+    ("Iveco", "Stralis 490", "camion-tractor", 490, 140000, 5),
+    ("Iveco", "Tector 170E28", "camion-chasis", 280, 90000, 5),
+    ("Iveco", "Daily 70C17", "utilitarios", 170, 60000, 4),
+    ("Ford", "Cargo 1723", "camion-chasis", 230, 85000, 6),
+    ("Ford", "Cargo 2042", "camion-tractor", 420, 115000, 3),
+    ("Ford", "Ranger XLT", "utilitarios", 200, 45000, 6),
+    ("Volkswagen", "Constellation 17.280", "camion-chasis", 280, 95000, 7),
+    ("Volkswagen", "Delivery 11.180", "camion-chasis", 180, 70000, 5),
+    ("Volkswagen", "Amarok V6", "utilitarios", 258, 55000, 5),
+    ("Renault", "Master", "utilitarios", 150, 42000, 3),
+]
+TYPES = {
+    "camion-tractor": "Camión Tractor",
+    "camion-chasis": "Camión Chasis",
+    "utilitarios": "Utilitarios",
+}
+# km por año de uso según el tipo
+ANNUAL_KM = {"camion-tractor": 110_000, "camion-chasis": 60_000, "utilitarios": 30_000}
+TRACCION = {"camion-tractor": ["4x2", "6x2", "6x4"], "camion-chasis": ["4x2", "6x2"], "utilitarios": ["4x2", "4x4"]}
+COLORS = ["Blanco"] * 6 + ["Rojo", "Azul", "Gris", "Negro", "Plateado"]
+LOCATIONS = ["Villa María, Córdoba"] * 8 + ["Córdoba Capital", "Río Cuarto, Córdoba"]
+# 1 a 8 fotos por vehículo, la mayoría entre 3 y 5
+IMAGE_COUNT_WEIGHTS = [4, 6, 14, 22, 22, 14, 10, 8]
+
+VEHICLE_COLUMNS = [
+    "id", "brand", "model", "full_name", "type", "type_name", "year", "kilometers", "power",
+    "traccion", "transmission", "color", "status", "price", "is_active", "is_featured",
+    "location", "description", "date_registered", "date_added", "created_at"
+]
+IMAGE_COLUMNS = [
+    "id", "vehicle_id", "filename", "original_filename", "file_path", "file_size", "mime_type",
+    "width", "height", "content_hash", "perceptual_hash", "placeholder", "is_primary",
+    "display_order", "created_at"
+]
+
+
+def vehicle_rows(count: int, start_id: int, rng: random.Random):
+    """Tuplas en el orden de VEHICLE_COLUMNS"""
+    weights = [entry[5] for entry in CATALOG]
+    now = datetime.now(timezone.utc)
+
+    for vehicle_id in range(start_id, start_id + count):
+        brand, model, vehicle_type, power, new_price, _ = rng.choices(CATALOG, weights)[0]
+
+        # Más unidades de 5 a 12 años de antigüedad
+        age = min(max(int(rng.triangular(0, 25, 8)), 0), CURRENT_YEAR - 2000)
+        year = CURRENT_YEAR - age
+        kilometers = int(ANNUAL_KM[vehicle_type] * max(age, 0.3) * rng.lognormvariate(0, 0.3))
+        kilometers = round(kilometers, -3)
+
+        # Depreciación ~12% anual más un descuento por km, con ruido
+        price = new_price * (0.88 ** age) * max(0.4, 1 - kilometers / 3_000_000) * rng.uniform(0.85, 1.15)
+        price = round(price, -2)
+
+        status = rng.choices(["Disponible", "Reservado", "Vendido"], [85, 5, 10])[0]
+        added = now - timedelta(days=rng.triangular(0, 1100, 30), seconds=rng.randint(0, 86399))
+
+        yield (
+            vehicle_id, brand, model, f"{brand} {model}", vehicle_type, TYPES[vehicle_type],
+            year, kilometers, power, rng.choice(TRACCION[vehicle_type]),
+            "Automática" if rng.random() < (0.6 if year >= 2015 else 0.15) else "Manual",
+            rng.choice(COLORS), status, price,
+            rng.random() > 0.03, rng.random() < 0.005,
+            rng.choice(LOCATIONS),
+            f"{brand} {model} {year}, {f'{kilometers:,}'.replace(',', '.')} km. Service al día.",
+            f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{year}",
+            added, added
+        )
+
+
+def image_rows(vehicle_start: int, vehicle_count: int, image_start: int, rng: random.Random,
+               images_per_vehicle=None, pool=None):
+    """Tuplas en el orden de IMAGE_COLUMNS.
+
+    Con pool (imágenes reales generadas) cada fila apunta a una de ellas;
+    si no, a un archivo inexistente con nombre único.
+    """
+    image_id = image_start
+    created = datetime.now(timezone.utc)
+
+    for vehicle_id in range(vehicle_start, vehicle_start + vehicle_count):
+        count = images_per_vehicle or rng.choices(range(1, 9), IMAGE_COUNT_WEIGHTS)[0]
+        for order in range(count):
+            if pool:
+                image = pool[rng.randrange(len(pool))]
+            else:
+                digest = hashlib.sha256(f"{vehicle_id}:{order}".encode()).hexdigest()
+                filename = f"{digest}.jpg"
+                image = {
+                    "filename": filename,
+                    "file_path": f"{settings.UPLOAD_DIR}/vehicles/{digest[:2]}/{digest[2:4]}/{filename}",
+                    "file_size": 250_000, "width": 1365, "height": 2048,
+                    "content_hash": digest, "perceptual_hash": None, "placeholder": None,
+                }
+            yield (
+                image_id, vehicle_id, image["filename"], f"foto-{order + 1}.jpg", image["file_path"],
+                image["file_size"], "image/jpeg", image["width"], image["height"],
+                image["content_hash"], image["perceptual_hash"], image["placeholder"],
+                order == 0, order, created
+            )
+            image_id += 1
+
+
+def generate_image_pool(count: int, rng: random.Random) -> list:
+    """Crear `count` fotos distintas en el storage con el pipeline real (original, thumbnail, LQIP)"""
+    from PIL import Image
+    from app.services.image_service import image_service
+
+    pool = []
+    for index in range(count):
+        img = Image.effect_noise((1600, 1200), rng.randint(20, 80)).convert("RGB")
+        tint = Image.new("RGB", img.size, (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+        img = Image.blend(img, tint, 0.6)
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=90)
+        content = buffer.getvalue()
+
+        digest = image_service.compute_content_hash(content)
+        filename = f"{digest}.jpg"
+        processed = image_service._process_image(content, "jpg")
+        original_key = image_service.original_key(filename)
+        image_service.storage.save(original_key, processed["content"], "image/jpeg")
+        image_service.storage.save(image_service.thumbnail_key(filename), processed["thumbnail"], "image/jpeg")
+
+        pool.append({
+            "filename": filename,
+            "file_path": image_service.file_path_for_key(original_key),
+            "file_size": len(processed["content"]),
+            "width": processed["width"],
+            "height": processed["height"],
+            "content_hash": digest,
+            "perceptual_hash": processed["perceptual_hash"],
+            "placeholder": processed["placeholder"],
+        })
+        print(f"🖼️ Imagen {index + 1}/{count}: {original_key}")
+    return pool
+
+
+def batched(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def copy_rows(raw_connection, table: str, columns: list, rows, batch_size: int) -> int:
+    """PostgreSQL: COPY ... FROM STDIN en CSV, un buffer por lote"""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    total = 0
+    with raw_connection.cursor() as cursor:
+        for batch in batched(rows, batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            total += len(batch)
+            print(f"   {table}: {total:,} filas")
+    return total
+
+
+def insert_rows(connection, table, columns: list, rows, batch_size: int) -> int:
+    """Resto de motores: executemany por lote"""
+    total = 0
+    for batch in batched(rows, batch_size):
+        connection.execute(table.insert(), [dict(zip(columns, row)) for row in batch])
+        total += len(batch)
+        print(f"   {table.name}: {total:,} filas")
+    return total
+
+
+def next_id(connection, model) -> int:
+    return (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def truncate(connection):
+    if engine.dialect.name == "postgresql":
+        connection.execute(text("TRUNCATE vehicle_images, vehicles RESTART IDENTITY CASCADE"))
+    else:
+        connection.execute(VehicleImage.__table__.delete())
+        connection.execute(Vehicle.__table__.delete())
+
+
+def generate(vehicles: int, images_per_vehicle=None, image_files: int = 0, batch_size: int = 50_000,
+             seed: int = 42, truncate_first: bool = False) -> dict:
+    """Cargar `vehicles` vehículos (y sus imágenes) a continuación de los existentes"""
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+    pool = generate_image_pool(image_files, rng) if image_files else None
+
+    if truncate_first:
+        with engine.begin() as connection:
+            truncate(connection)
+
+    with engine.connect() as connection:
+        vehicle_start = next_id(connection, Vehicle)
+        image_start = next_id(connection, VehicleImage)
+
+    vehicles_iter = vehicle_rows(vehicles, vehicle_start, rng)
+    images_iter = image_rows(vehicle_start, vehicles, image_start, rng, images_per_vehicle, pool)
+
+    if engine.dialect.name == "postgresql":
+        raw = engine.raw_connection()
+        try:
+            loaded_vehicles = copy_rows(raw, "vehicles", VEHICLE_COLUMNS, vehicles_iter, batch_size)
+            loaded_images = copy_rows(raw, "vehicle_images", IMAGE_COLUMNS, images_iter, batch_size)
+            with raw.cursor() as cursor:
+                # Con ids explícitos las secuencias quedan atrás
+                for table in ("vehicles", "vehicle_images"):
+                    cursor.execute(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+                    )
+            raw.commit()
+        finally:
+            raw.close()
+
+        # Estadísticas al día para que los planes sean los de producción
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("ANALYZE vehicles"))
+            connection.execute(text("ANALYZE vehicle_images"))
+    else:
+        with engine.begin() as connection:
+            if engine.dialect.name == "sqlite":
+                connection.execute(text("PRAGMA synchronous = OFF"))
+            loaded_vehicles = insert_rows(connection, Vehicle.__table__, VEHICLE_COLUMNS, vehicles_iter, batch_size)
+            loaded_images = insert_rows(connection, VehicleImage.__table__, IMAGE_COLUMNS, images_iter, batch_size)
+            if engine.dialect.name == "sqlite":
+                connection.execute(text("ANALYZE"))
+
+    return {"vehicles": loaded_vehicles, "images": loaded_images, "first_vehicle_id": vehicle_start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar un catálogo sintético de vehículos")
+    parser.add_argument("--vehicles", type=int, default=10_000)
+    parser.add_argument("--images-per-vehicle", type=int, help="Fijo; por defecto entre 1 y 8 (media ~4)")
+    parser.add_argument("--image-files", type=int, default=0, help="Imágenes reales a generar y compartir entre filas")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="Borrar vehículos e imágenes existentes antes de cargar")
+    args = parser.parse_args()
+
+    if settings.ENVIRONMENT == "production":
+        print("❌ No se generan datos sintéticos con ENVIRONMENT=production")
+        sys.exit(1)
+
+    print(f"🚛 Generando {args.vehicles:,} vehículos en {engine.dialect.name}...")
+    started = time.perf_counter()
+    result = generate(
+        vehicles=args.vehicles,
+        images_per_vehicle=args.images_per_vehicle,
+        image_files=args.image_files,
+        batch_size=args.batch_size,
+        seed=args.seed,
+        truncate_first=args.truncate
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {result['vehicles']:,} vehículos y {result['images']:,} imágenes en {elapsed:.1f}s")
+    print(f"   {(result['vehicles'] + result['images']) / elapsed:,.0f} filas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Script para migrar las imágenes del layout plano (vehicles/<nombre>) al
+layout repartido en dos niveles (vehicles/ab/cd/<nombre>)
+Ejecutar: docker-compose exec backend python migrate_upload_layout.py [--dry-run]
+
+Se puede cortar y volver a ejecutar: el progreso se guarda por lotes en la
+BD (job_states) y cada paso es idempotente (copiar, actualizar fila, borrar el plano).
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
+
+from app.core.database import SessionLocal
+from app.crud.job_state import job_state_crud
+from app.models.vehicle import VehicleImage
+from app.services.image_service import image_service
+
+# En la BD y no en el storage, que es público
+STATE_NAME = "upload_layout_migration"
+
+storage = image_service.storage
+
+
+def load_state(db):
+    state = job_state_crud.load(db, STATE_NAME)
+    return state if state is not None else {"after_id": 0, "moved": 0, "skipped": 0, "missing": 0}
+
+
+def save_state(db, state):
+    state["updated_at"] = time.time()
+    job_state_crud.save(db, STATE_NAME, state)
+
+
+def move_object(src_key, dst_key, dry_run):
+    """Copiar src a dst. Devuelve False si no existe ninguno de los dos"""
+    if storage.exists(dst_key):
+        return True
+    if not storage.exists(src_key):
+        return False
+    if not dry_run:
+        storage.copy(src_key, dst_key)
+    return True
+
+
+def migrate_batch(db, state, batch_size, dry_run):
+    """Migrar el siguiente lote de filas (keyset por id)"""
+    rows = db.query(VehicleImage).filter(
+        VehicleImage.id > state["after_id"]
+    ).order_by(VehicleImage.id).limit(batch_size).all()
+
+    flat_keys = set()
+
+    for row in rows:
+        src_key = image_service.key_from_file_path(row.file_path)
+        dst_key = image_service.original_key(row.filename)
+
+        if src_key == dst_key:
+            state["skipped"] += 1
+            continue
+
+        src_thumb = image_service.thumbnail_key_for(src_key)
+        dst_thumb = image_service.thumbnail_key_for(dst_key)
+
+        if not move_object(src_key, dst_key, dry_run):
+            print(f"   ⚠️ Archivo faltante para imagen {row.id}: {src_key}")
+            state["missing"] += 1
+            continue
+        move_object(src_thumb, dst_thumb, dry_run)
+
+        if not dry_run:
+            row.file_path = image_service.file_path_for_key(dst_key)
+        flat_keys.add(src_key)
+        state["moved"] += 1
+
+    if not dry_run:
+        db.commit()
+
+        # Borrar el plano solo cuando ninguna fila lo sigue usando
+        for src_key in flat_keys:
+            still_used = db.query(VehicleImage.id).filter(
+                VehicleImage.file_path.in_(image_service.file_path_candidates(src_key))
+            ).first()
+            if still_used is None:
+                storage.delete(src_key)
+                storage.delete(image_service.thumbnail_key_for(src_key))
+
+    if rows:
+        state["after_id"] = rows[-1].id
+
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrar imágenes al layout repartido en subdirectorios")
+    parser.add_argument("--dry-run", action="store_true", help="Solo reportar, sin copiar ni actualizar filas")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--sleep", type=float, default=0.0, help="Pausa en segundos entre lotes")
+    parser.add_argument("--reset", action="store_true", help="Empezar desde el principio en vez del progreso guardado")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+
+    state = {"after_id": 0, "moved": 0, "skipped": 0, "missing": 0} if args.reset else load_state(db)
+    if args.dry_run:
+        # El dry-run no debe avanzar el progreso real
+        state = {"after_id": 0, "moved": 0, "skipped": 0, "missing": 0}
+
+    print(f"📦 Migrando layout de imágenes desde id > {state['after_id']}...")
+
+    try:
+        while True:
+            count = migrate_batch(db, state, args.batch_size, args.dry_run)
+            if not args.dry_run:
+                save_state(db, state)
+            if count == 0:
+                break
+            print(f"   ✅ Lote hasta id {state['after_id']}: movidas={state['moved']} sin cambios={state['skipped']}")
+            if args.sleep:
+                time.sleep(args.sleep)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {e} (se puede retomar ejecutando de nuevo)")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"🎉 Migración {'simulada' if args.dry_run else 'completada'}")
+    print(f"   Movidas: {state['moved']}")
+    print(f"   Ya migradas: {state['skipped']}")
+    print(f"   Con archivo faltante: {state['missing']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Script para reconciliar el storage de imágenes con la base de datos
+Ejecutar: docker-compose exec backend python reconcile_storage.py [--delete]
+"""
+import os
+import sys
+import json
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
+
+from app.core.database import SessionLocal
+from app.services.storage_reconciler import storage_reconciler
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconciliar storage de imágenes con la BD")
+    parser.add_argument("--delete", action="store_true", help="Borrar los archivos huérfanos (por defecto solo reporta)")
+    parser.add_argument("--include-inactive", action="store_true", help="Tratar imágenes de vehículos dados de baja como huérfanas")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--max-batches", type=int, default=None, help="Cortar después de N lotes (se retoma en la próxima ejecución)")
+    parser.add_argument("--min-age", type=int, default=None, help="Ignorar archivos más nuevos que N segundos")
+    parser.add_argument("--reset", action="store_true", help="Empezar desde el principio en vez del cursor guardado")
+    parser.add_argument("--json", action="store_true", help="Imprimir el reporte completo en JSON")
+    args = parser.parse_args()
+    
+    if args.batch_size:
+        storage_reconciler.batch_size = args.batch_size
+    if args.min_age is not None:
+        storage_reconciler.min_age_seconds = args.min_age
+    print("🧹 Reconciliando storage...")
+    
+    db = SessionLocal()
+    try:
+        if args.reset:
+            storage_reconciler.reset_state(db)
+        report = storage_reconciler.run_full_pass(
+            db,
+            delete=args.delete,
+            include_inactive=args.include_inactive,
+            max_batches=args.max_batches
+        )
+    finally:
+        db.close()
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    
+    print(f"📂 Objetos revisados: {report['scanned']}")
+    print(f"👻 Huérfanos: {len(report['orphans'])} ({report['orphan_bytes']} bytes)")
+    for orphan in report["orphans"][:20]:
+        print(f"   • {orphan['key']} ({orphan['size']} bytes)")
+    if args.delete:
+        print(f"🗑️ Recuperados: {report['reclaimed_bytes']} bytes")
+    else:
+        print("ℹ️ Modo reporte: usar --delete para borrar")
+    
+    print(f"🗄️ Filas revisadas: {report['checked']}")
+    print(f"❌ Filas con archivos faltantes: {len(report['missing'])}")
+    for row in report["missing"][:20]:
+        print(f"   • imagen {row['image_id']} (vehículo {row['vehicle_id']}): {row['file_path']}")
+    
+    sprites = report["sprites"]
+    print(f"🧩 Sprites: {sprites['sprites']}, vencidos: {sprites['expired']} ({sprites['expired_bytes']} bytes)")
+
+if __name__ == "__main__":
+    main()
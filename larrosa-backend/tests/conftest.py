@@ -0,0 +1,12 @@
+# tests/conftest.py - CONFIGURACIÓN DE PYTEST
+
+import os
+import tempfile
+
+# La configuración se lee al importar app.core.config: definirla antes
+_TMP = tempfile.mkdtemp(prefix="larrosa-tests-")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP}/test.db")
+os.environ.setdefault("ENVIRONMENT", "test")
+# UPLOAD_DIR distinto del default, como en despliegues con volumen propio
+os.environ.setdefault("UPLOAD_DIR", f"{_TMP}/media")
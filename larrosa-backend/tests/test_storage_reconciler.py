@@ -0,0 +1,81 @@
+# tests/test_storage_reconciler.py - RECONCILIACIÓN CON UPLOAD_DIR NO DEFAULT
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.models.vehicle import VehicleImage
+from app.services.image_service import ImageService, LEGACY_UPLOAD_DIR
+from app.services.storage import LocalStorage
+from app.services.storage_reconciler import StorageReconciler
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def images(tmp_path):
+    service = ImageService()
+    service.upload_dir = str(tmp_path / "media")
+    service.storage = LocalStorage(root=service.upload_dir, public_url="/static/uploads")
+    return service
+
+
+def add_image(db, file_path: str) -> None:
+    db.add(VehicleImage(
+        vehicle_id=1,
+        filename=file_path.rsplit("/", 1)[-1],
+        original_filename="foto.jpg",
+        file_path=file_path
+    ))
+    db.commit()
+
+
+def test_legacy_rows_are_not_orphans_with_custom_upload_dir(db, images):
+    assert images.upload_dir != LEGACY_UPLOAD_DIR
+
+    legacy_key = images.legacy_original_key("legacy.jpg")
+    current_key = images.original_key("a1b2c3.jpg")
+    orphan_key = images.original_key("ffffff.jpg")
+    for key in (legacy_key, current_key, orphan_key):
+        images.storage.save(key, b"x")
+        images.storage.save(images.thumbnail_key_for(key), b"x")
+
+    add_image(db, f"{LEGACY_UPLOAD_DIR}/{legacy_key}")
+    add_image(db, images.file_path_for_key(current_key))
+
+    reconciler = StorageReconciler(storage=images.storage, images=images, min_age_seconds=0)
+    report = reconciler.run_orphan_batch(db, delete=True, state={})
+
+    orphans = {orphan["key"] for orphan in report["orphans"]}
+    assert orphans == {orphan_key, images.thumbnail_key_for(orphan_key)}
+    for key in (legacy_key, current_key):
+        assert images.storage.exists(key)
+        assert images.storage.exists(images.thumbnail_key_for(key))
+    assert not images.storage.exists(orphan_key)
+
+
+def test_key_from_file_path_accepts_both_prefixes(images):
+    key = images.original_key("a1b2c3.jpg")
+    assert images.key_from_file_path(images.file_path_for_key(key)) == key
+    assert images.key_from_file_path(f"{LEGACY_UPLOAD_DIR}/{key}") == key
+    assert images.key_from_file_path(f"/{LEGACY_UPLOAD_DIR}/{key}") == key
+
+
+def test_state_is_kept_in_the_database_not_in_storage(db, images):
+    reconciler = StorageReconciler(storage=images.storage, images=images, min_age_seconds=0)
+    reconciler.run_batch(db)
+
+    assert reconciler.load_state(db)["passes"] == 1
+    assert list(images.storage.iter_objects("")) == []
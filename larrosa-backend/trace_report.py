@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Script para ver trazas exportadas a archivo (TRACING_EXPORTER=file)
+Ejecutar: docker-compose exec backend python trace_report.py [--file traces/traces.jsonl] [--trace-id ID] [--slowest 5]
+
+Imprime el árbol de spans de cada traza con duración y desfase desde el
+inicio; los marcados con * forman el camino crítico (lo que hubo que esperar
+para que termine la request).
+"""
+import json
+import argparse
+from collections import defaultdict
+
+
+def load_spans(path: str) -> dict:
+    """Spans agrupados por trace id"""
+    traces = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    for span in scope["spans"]:
+                        span["start"] = int(span["startTimeUnixNano"])
+                        span["end"] = int(span["endTimeUnixNano"])
+                        traces[span["traceId"]].append(span)
+    return traces
+
+
+def critical_path(span: dict, children: dict) -> set:
+    """Desde el final hacia atrás: el hijo que termina último y, antes de
+    que empiece, el anterior que termina último, y así (hijos en serie)"""
+    path = {span["spanId"]}
+    limit = span["end"]
+    for child in sorted(children.get(span["spanId"], []), key=lambda s: s["end"], reverse=True):
+        if child["end"] <= limit:
+            path |= critical_path(child, children)
+            limit = child["start"]
+    return path
+
+
+def print_trace(spans: list):
+    ids = {span["spanId"] for span in spans}
+    children = defaultdict(list)
+    roots = []
+    for span in spans:
+        if span.get("parentSpanId") in ids:
+            children[span["parentSpanId"]].append(span)
+        else:
+            roots.append(span)
+
+    for root in sorted(roots, key=lambda s: s["start"]):
+        critical = critical_path(root, children)
+        print(f"🛰️ {root['traceId']}  {root['name']}  {(root['end'] - root['start']) / 1e6:.1f} ms")
+
+        def show(span, depth):
+            marker = "*" if span["spanId"] in critical else " "
+            error = "  ❌" if span.get("status", {}).get("code") == 2 else ""
+            print(
+                f"  {marker} {(span['start'] - root['start']) / 1e6:>9.1f} "
+                f"{(span['end'] - span['start']) / 1e6:>9.1f} ms  {'  ' * depth}{span['name']}{error}"
+            )
+            for child in sorted(children.get(span["spanId"], []), key=lambda s: s["start"]):
+                show(child, depth + 1)
+
+        print(f"  {'':1} {'inicio':>9} {'duración':>12}")
+        show(root, 0)
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ver trazas exportadas a archivo")
+    parser.add_argument("--file", default="traces/traces.jsonl")
+    parser.add_argument("--trace-id", help="Mostrar solo esta traza (X-Trace-Id de la respuesta)")
+    parser.add_argument("--slowest", type=int, default=5, help="Mostrar las N trazas más lentas")
+    parser.add_argument("--name", help="Filtrar por nombre del span raíz (ej: 'POST /api/v1/vehicles/')")
+    args = parser.parse_args()
+
+    traces = load_spans(args.file)
+    if args.trace_id:
+        if args.trace_id not in traces:
+            print(f"❌ Traza {args.trace_id} no encontrada en {args.file}")
+            return
+        print_trace(traces[args.trace_id])
+        return
+
+    def duration(spans):
+        return max(s["end"] for s in spans) - min(s["start"] for s in spans)
+
+    candidates = [
+        spans for spans in traces.values()
+        if not args.name or any(s["name"] == args.name and not s.get("parentSpanId") for s in spans)
+    ]
+    print(f"📊 {len(traces)} trazas en {args.file}\n")
+    for spans in sorted(candidates, key=duration, reverse=True)[:args.slowest]:
+        print_trace(spans)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ const API_CONFIG = {
         login: '/auth/login-json',
         verify: '/auth/verify-token',
         refresh: '/auth/refresh',
+        logout: '/auth/logout',
         me: '/auth/me'
     }
 };
@@ -46,6 +47,20 @@ class AuthManager {
         console.log('💾 Token stored successfully');
     }
 
+    getStoredRefreshToken() {
+        return localStorage.getItem('admin_refresh_token') || 
+               sessionStorage.getItem('admin_refresh_token');
+    }
+
+    storeRefreshToken(refreshToken, remember = false) {
+        if (!refreshToken) return;
+        if (remember) {
+            localStorage.setItem('admin_refresh_token', refreshToken);
+        } else {
+            sessionStorage.setItem('admin_refresh_token', refreshToken);
+        }
+    }
+
     storeUser(user, remember = false) {
         const userData = JSON.stringify(user);
         if (remember) {
@@ -61,7 +76,9 @@ class AuthManager {
         localStorage.removeItem('admin_token');
         localStorage.removeItem('admin_user');
         localStorage.removeItem('admin_remember');
+        localStorage.removeItem('admin_refresh_token');
         sessionStorage.removeItem('admin_token');
+        sessionStorage.removeItem('admin_refresh_token');
         sessionStorage.removeItem('admin_user');
         this.token = null;
         this.user = null;
@@ -140,6 +157,7 @@ class AuthManager {
                 console.log('✅ Login successful:', response.user);
                 
                 this.storeToken(response.access_token, remember);
+                this.storeRefreshToken(response.refresh_token, remember);
                 this.storeUser(response.user, remember);
                 this.setupTokenRefresh();
                 
@@ -239,16 +257,20 @@ class AuthManager {
     }
 
     async refreshToken() {
-        if (!this.token) return false;
+        const refreshToken = this.getStoredRefreshToken();
+        if (!refreshToken) return false;
 
         try {
+            // El refresh token es de un solo uso: el backend devuelve uno nuevo
             const response = await this.makeRequest(API_CONFIG.endpoints.refresh, {
-                method: 'POST'
+                method: 'POST',
+                body: JSON.stringify({ refresh_token: refreshToken })
             });
 
             if (response.access_token) {
                 const remember = localStorage.getItem('admin_remember') === 'true';
                 this.storeToken(response.access_token, remember);
+                this.storeRefreshToken(response.refresh_token, remember);
                 this.setupTokenRefresh();
                 console.log('✅ Token refreshed successfully');
                 return true;
@@ -266,6 +288,15 @@ class AuthManager {
         if (this.refreshTimer) {
             clearTimeout(this.refreshTimer);
         }
+
+        // Revocar los tokens en el backend (best effort, no bloquea la salida)
+        if (this.token) {
+            this.makeRequest(API_CONFIG.endpoints.logout, {
+                method: 'POST',
+                body: JSON.stringify({ refresh_token: this.getStoredRefreshToken() })
+            }).catch(error => console.warn('⚠️ Logout request failed:', error));
+        }
+
         this.clearStorage();
         
         // Redirect solo si no estamos ya en login
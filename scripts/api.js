@@ -131,7 +131,7 @@ getImageUrl(imageData) {
         console.log('📦 Image object detected:', imageData);
         
         // Buscar diferentes propiedades posibles
-        const imagePath = imageData.file_path || 
+        const imagePath = imageData.url || imageData.file_path || 
                          imageData.filename || 
                          imageData.url || 
                          imageData.path ||
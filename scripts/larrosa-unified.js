@@ -67,7 +67,7 @@ class LarrosaAPIClient {
 
         // Si es objeto
         if (typeof imageData === 'object' && imageData !== null) {
-            const path = imageData.file_path || imageData.filename || imageData.url || imageData.path;
+            const path = imageData.url || imageData.file_path || imageData.filename || imageData.path;
             if (path) return this.getImageUrl(path);
         }
 